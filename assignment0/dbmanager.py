@@ -1,55 +1,260 @@
 import sqlite3
+import sys
+import time
+from collections import Counter
+from operator import itemgetter
+
+INCIDENT_COLUMNS = ['incident_time', 'incident_number', 'incident_location', 'nature', 'incident_ori']
+# Fields computed by extractdata and assignment2 on top of the five columns parsed from the pdf
+ENRICHED_COLUMNS = [('incident_date', 'TEXT'), ('day_of_week', 'INTEGER'), ('incident_hour', 'INTEGER'),
+                    ('side_of_town', 'TEXT'), ('weather_code', 'INTEGER'), ('location_rank', 'INTEGER'),
+                    ('incident_rank', 'INTEGER'), ('emsstat', 'INTEGER')]
+PRAGMAS = ["PRAGMA journal_mode = WAL",
+           "PRAGMA synchronous = NORMAL",
+           "PRAGMA temp_store = MEMORY",
+           "PRAGMA cache_size = -16000"]
+INDEXES = ["CREATE UNIQUE INDEX IF NOT EXISTS incidents_key ON incidents (incident_number, incident_ori)",
+           "CREATE INDEX IF NOT EXISTS incidents_nature ON incidents (nature)",
+           "CREATE INDEX IF NOT EXISTS incidents_location ON incidents (incident_location)",
+           "CREATE INDEX IF NOT EXISTS incidents_date ON incidents (incident_date)"]
+BATCH_SIZE = 5000
+# Rollup dimensions and the incident column each one counts. Every dimension is counted per day
+# so the counts of any date range are a sum over the rollups of its days
+ROLLUP_DIMENSIONS = {'nature': 'nature', 'day': 'incident_date', 'hour': 'incident_hour',
+                     'side_of_town': 'side_of_town', 'ori': 'incident_ori'}
+# Columns read to maintain the rollups, the date first
+ROLLUP_COLUMNS = ['incident_date', 'nature', 'incident_hour', 'side_of_town', 'incident_ori']
+_rollup_positions = [(dimension, ROLLUP_COLUMNS.index(column)) for dimension, column in ROLLUP_DIMENSIONS.items()]
+# sqlite limits the number of parameters of a single query
+QUERY_CHUNK_SIZE = 400
+# Stages of a day of a backfill, in order. The last one reached is stored in backfill_progress
+BACKFILL_STAGES = ['downloaded', 'parsed', 'enriched', 'stored']
 
 def createdb(db_name):
     '''Creates an sqlite3 database (if not created) and makes a connection to the db'''
     con = sqlite3.connect(db_name)
+    for pragma in PRAGMAS:
+        con.execute(pragma)
     cur = con.cursor()
     try:
-        cur.execute("""CREATE TABLE incidents (
+        cur.execute(f"""CREATE TABLE incidents (
             incident_time TEXT,
             incident_number TEXT,
             incident_location TEXT,
             nature TEXT,
-            incident_ori TEXT
+            incident_ori TEXT,
+            {', '.join(f'{name} {column_type}' for name, column_type in ENRICHED_COLUMNS)}
                 )""")
         # print('CREATED THE DATABASE {}'.format(db_name))
     except Exception as e:
         if "table incidents already exists" in str(e):
-            print("Table already exists. No need to create.")
+            print("Table already exists. No need to create.", file=sys.stderr)
+            migratedb(con)
         else:
             # Handle other OperationalError cases
             print(f"Error: {e}")
+    for index in INDEXES:
+        cur.execute(index)
+    rollups_exist = cur.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'rollups'").fetchone()
+    cur.execute("""CREATE TABLE IF NOT EXISTS rollups (
+        dimension TEXT,
+        key, -- no type affinity, so the hours stay integers
+        incident_date TEXT,
+        count INTEGER
+            )""")
+    cur.execute("CREATE INDEX IF NOT EXISTS rollups_key ON rollups (dimension, incident_date, key)")
+    cur.execute("""CREATE TABLE IF NOT EXISTS backfill_progress (
+        incident_date TEXT PRIMARY KEY,
+        url TEXT,
+        stage TEXT,
+        incidents INTEGER,
+        error TEXT,
+        updated_at REAL
+            )""")
     con.commit()
     cur.close()
+    if not rollups_exist:
+        # A database created before the rollups existed
+        rebuild_rollups(con)
     return con
 
+def migratedb(con):
+    '''Brings a table created by an older version up to the current schema: adds the enriched
+        columns and drops duplicate incidents (keeping the latest) so the unique key can be built'''
+    cur = con.cursor()
+    existing_columns = {row[1] for row in cur.execute("PRAGMA table_info(incidents)")}
+    for name, column_type in ENRICHED_COLUMNS:
+        if name not in existing_columns:
+            cur.execute(f"ALTER TABLE incidents ADD COLUMN {name} {column_type}")
+    cur.execute("""DELETE FROM incidents WHERE rowid NOT IN (
+        SELECT MAX(rowid) FROM incidents GROUP BY incident_number, incident_ori)""")
+    if cur.rowcount > 0:
+        # createdb builds the rollups again from the remaining incidents
+        cur.execute("DROP TABLE IF EXISTS rollups")
+    con.commit()
+    cur.close()
+
+def rebuild_rollups(con):
+    '''Computes the rollups again from all the stored incidents'''
+    with con:
+        con.execute("DELETE FROM rollups")
+        for dimension, column in ROLLUP_DIMENSIONS.items():
+            con.execute(f"""INSERT INTO rollups SELECT ?, {column}, incident_date, COUNT(*)
+                FROM incidents GROUP BY incident_date, {column}""", (dimension,))
+
+def rollup_delta(cur, columns, incidents):
+    '''Returns the change of the rollup counts, keyed by (dimension, day, key), that upserting a
+        batch of rows will make. The stored values of the rows that are replaced are read first,
+        and the columns the rows don't set keep their stored values, as in the upsert'''
+    number_position, ori_position = columns.index('incident_number'), columns.index('incident_ori')
+    present = [(index, columns.index(column)) for index, column in enumerate(ROLLUP_COLUMNS) if column in columns]
+    # The rollup columns of a new row, with None for the columns the rows don't set
+    if len(present) == len(ROLLUP_COLUMNS):
+        get_values = itemgetter(*[position for index, position in present])
+    else:
+        padded = itemgetter(*[columns.index(column) if column in columns else len(columns) for column in ROLLUP_COLUMNS])
+        get_values = lambda row: padded(tuple(row) + (None,))
+    keys = {(row[number_position], row[ori_position]) for row in incidents}
+    # A list of incident numbers is looked up in the unique index, a list of (number, ori) pairs is not
+    numbers = list({number for number, ori in keys})
+    stored = dict()
+    for i in range(0, len(numbers), QUERY_CHUNK_SIZE):
+        chunk = numbers[i:i + QUERY_CHUNK_SIZE]
+        cur.execute(f"""SELECT incident_number, incident_ori, {', '.join(ROLLUP_COLUMNS)} FROM incidents
+            WHERE incident_number IN ({', '.join('?' * len(chunk))})""", chunk)
+        for row in cur:
+            if row[:2] in keys:
+                stored[row[:2]] = row[2:]
+    if not stored and len(keys) == len(incidents):
+        # Only new incidents, the common case of a first ingestion
+        added, removed = list(map(get_values, incidents)), list()
+    else:
+        added, removed = list(), list()
+        for row in incidents:
+            key = (row[number_position], row[ori_position])
+            old = stored.get(key)
+            if old is None:
+                new = get_values(row)
+            else:
+                removed.append(old)
+                new = list(old)
+                for index, position in present:
+                    new[index] = row[position]
+                new = tuple(new)
+            stored[key] = new
+            added.append(new)
+    delta = Counter()
+    for dimension, index in _rollup_positions:
+        get_rollup = itemgetter(0, index)
+        added_counts = Counter(map(get_rollup, added))
+        added_counts.subtract(map(get_rollup, removed))
+        delta.update({(dimension, day, key): count for (day, key), count in added_counts.items()})
+    return delta
+
+def apply_rollup_delta(cur, delta):
+    '''Adds count differences to the rollups, dropping the ones that fall to zero. Dates and
+        keys may be NULL, so the rows are matched with IS rather than a unique key'''
+    for (dimension, day, key), difference in delta.items():
+        if difference == 0:
+            continue
+        cur.execute("UPDATE rollups SET count = count + ? WHERE dimension = ? AND incident_date IS ? AND key IS ?",
+                    (difference, dimension, day, key))
+        if cur.rowcount == 0:
+            cur.execute("INSERT INTO rollups VALUES (?, ?, ?, ?)", (dimension, key, day, difference))
+        elif difference < 0:
+            cur.execute("DELETE FROM rollups WHERE dimension = ? AND incident_date IS ? AND key IS ? AND count <= 0",
+                        (dimension, day, key))
+
+def rollup_counts(con, dimension, start_date=None, end_date=None):
+    '''Returns the number of incidents per key of a dimension (see ROLLUP_DIMENSIONS) from
+        start_date to end_date ('YYYY-MM-DD', both included, open ended when None), summed from
+        the daily rollups without scanning the incidents. Incidents without a date are only
+        counted when no date is given'''
+    if dimension not in ROLLUP_DIMENSIONS:
+        raise ValueError(f"Unknown dimension {dimension!r}, expected one of {list(ROLLUP_DIMENSIONS)}")
+    conditions, parameters = ["dimension = ?"], [dimension]
+    if start_date is not None:
+        conditions.append("incident_date >= ?")
+        parameters.append(start_date)
+    if end_date is not None:
+        conditions.append("incident_date <= ?")
+        parameters.append(end_date)
+    rows = con.execute(f"SELECT key, SUM(count) FROM rollups WHERE {' AND '.join(conditions)} GROUP BY key",
+                       parameters)
+    return Counter(dict(rows))
+
+def upsert(con, columns, incidents):
+    '''Inserts rows in batches inside a single transaction. A row whose incident number and ori
+        are already stored replaces the stored values, so re-ingesting a day is idempotent.
+        The rollups are updated with the difference each batch makes'''
+    updates = ', '.join(f'{column} = excluded.{column}' for column in columns
+                        if column not in ('incident_number', 'incident_ori'))
+    sqlite_upsert_query = f"""INSERT INTO incidents ({', '.join(columns)})
+                          VALUES ({', '.join('?' * len(columns))})
+                          ON CONFLICT (incident_number, incident_ori) DO UPDATE SET {updates};"""
+    incidents = list(incidents)
+    cur = con.cursor()
+    with con:
+        for i in range(0, len(incidents), BATCH_SIZE):
+            batch = incidents[i:i + BATCH_SIZE]
+            delta = rollup_delta(cur, columns, batch)
+            cur.executemany(sqlite_upsert_query, batch)
+            apply_rollup_delta(cur, delta)
+    cur.close()
+
 def populatedb(con, incidents):
     '''Inserts incident data into the database'''
+    upsert(con, INCIDENT_COLUMNS, incidents)
+
+def populate_enriched(con, incidents):
+    '''Inserts full incident records into the database. Each record holds the five incident
+        columns followed by the enriched columns, in the order of ENRICHED_COLUMNS'''
+    upsert(con, INCIDENT_COLUMNS + [name for name, column_type in ENRICHED_COLUMNS], incidents)
+
+def unenriched_records(con, mode='full'):
+    '''Returns the full records, in the order of populate_enriched, of every day with incidents
+        stored without the enrichment of mode: without a side of town ('geocode'), or without a
+        side of town or a weather code ('full'). Whole days are returned so their ranks can be
+        computed again'''
+    missing = "side_of_town IS NULL" if mode == 'geocode' else "side_of_town IS NULL OR weather_code IS NULL"
+    columns = INCIDENT_COLUMNS + [name for name, column_type in ENRICHED_COLUMNS]
     cur = con.cursor()
-    sqlite_insert_query = """INSERT INTO incidents
-                          (incident_time, incident_number, incident_location, nature, incident_ori) 
-                          VALUES (?, ?, ?, ?, ?);"""
-    cur.executemany(sqlite_insert_query, incidents)
-    # print('ADDED DATA IN SQLITE3 DATABASE!')
-    # print('rows affected = ', cur.rowcount)
-    cur.execute("SELECT COUNT(*) FROM incidents")
-    total_rows = cur.fetchone()[0]
-    # print('Total Number of rows in the table = ', total_rows)
-    con.commit()
+    cur.execute(f"""SELECT {', '.join(columns)} FROM incidents
+        WHERE incident_date IN (SELECT DISTINCT incident_date FROM incidents WHERE {missing})
+        ORDER BY incident_date, rowid""")
+    rows = cur.fetchall()
+    cur.close()
+    return rows
+
+def record_progress(con, day, url, stage=None, incidents=None, error=None):
+    '''Records the last stage (BACKFILL_STAGES) reached by the backfill of a day, or with stage
+        None the error that stopped it, keeping the stage it had reached'''
+    with con:
+        con.execute("""INSERT INTO backfill_progress VALUES (?, ?, ?, ?, ?, ?)
+            ON CONFLICT (incident_date) DO UPDATE SET url = excluded.url,
+                stage = COALESCE(excluded.stage, stage), incidents = COALESCE(excluded.incidents, incidents),
+                error = excluded.error, updated_at = excluded.updated_at""",
+                    (day, url, stage, incidents, error, time.time()))
+
+def backfill_progress(con, start_date=None, end_date=None):
+    '''Returns {day: (stage, incidents, error)} of the days of a backfill (between start_date
+        and end_date when they are given)'''
+    cur = con.cursor()
+    cur.execute("""SELECT incident_date, stage, incidents, error FROM backfill_progress
+        WHERE (? IS NULL OR incident_date >= ?) AND (? IS NULL OR incident_date <= ?)""",
+                (start_date, start_date, end_date, end_date))
+    progress = {day: (stage, incidents, error) for day, stage, incidents, error in cur.fetchall()}
     cur.close()
+    return progress
 
-def status(con):
+def status(con, start_date=None, end_date=None):
     """
-    Prints a list of the nature of incidents and the number of times they have occurred.
+    Prints a list of the nature of incidents and the number of times they have occurred
+    (between start_date and end_date when they are given), read from the rollups.
     """
-    cur = con.cursor()
-    cur.execute("""
-        SELECT nature, COUNT(*) AS incident_count
-        FROM incidents
-        GROUP BY nature
-        ORDER BY incident_count DESC, nature
-    """)
-    rows = cur.fetchall()
+    counts = rollup_counts(con, 'nature', start_date, end_date)
+    # Same order as ORDER BY incident_count DESC, nature (NULL first), with the empty natures last
+    rows = sorted(counts.items(), key=lambda row: (-row[1], row[0] is not None, row[0] or ''))
     empty_natures = list()
     for row in rows:
         nature, incident_count = row
@@ -60,8 +265,6 @@ def status(con):
     for row in empty_natures:
         nature, incident_count = row
         print(f"{nature}|{incident_count}")
-    cur.close()
-    con.close()
 
     
 
@@ -73,4 +276,5 @@ if __name__ == "__main__":
         # Add more incident data as needed
     ]
     populatedb(con, incidents_data)
-    status(con)
\ No newline at end of file
+    status(con)
+    con.close()
\ No newline at end of file
@@ -0,0 +1,150 @@
+from bisect import bisect_left
+from collections import deque
+from datetime import date
+from operator import attrgetter
+
+EMSSTAT = 'EMSSTAT'
+# Field that is EMSSTAT in the EMSSTAT incidents: the nature, read by the original augment_emsstat
+# (incident[7] of the tuples). In the summaries EMSSTAT is the ori of these rows, which a linker
+# with field='incident_ori' matches instead
+EMSSTAT_FIELD = 'nature'
+# Minutes in a day, absolute times are minutes since the first day of the calendar
+DAY_MINUTES = 24 * 60
+
+
+def absolute_minutes(incident, ordinals={}):
+    '''Returns the time of an incident in minutes since the first day of the calendar, or in
+        minutes of the day when its date is not known'''
+    hours, minutes = incident.incident_time.split(':')
+    day = incident.incident_date
+    if day is None:
+        ordinal = 0
+    else:
+        ordinal = ordinals.get(day)
+        if ordinal is None:
+            ordinal = ordinals[day] = date.fromisoformat(day).toordinal()
+    return ordinal * DAY_MINUTES + int(hours) * 60 + int(minutes)
+
+
+class EmsstatLinker:
+    '''Sets the emsstat flag of the incidents: an incident is flagged when its nature is EMSSTAT
+        or an EMSSTAT incident at the same location is its companion.
+
+        row_window - with a number of rows, the companion is one of that many rows that follow
+            the incident (2 is the lookahead of the original augment_emsstat). With None, the
+            companion can be anywhere, before or after the incident, so rows that are
+            reordered in the pdf still match
+        time_window - minutes between the incident and its companion (0 is the same time)
+        field - field that is EMSSTAT in the EMSSTAT incidents (EMSSTAT_FIELD, the nature, gives
+            the output of the original augment_emsstat)
+
+        Matches are found with a hash index of the EMSSTAT incidents in one pass, without a
+        slice per row. link() flags a whole list; feed() and flush() flag a stream of batches
+        (the pages of a pdf, or consecutive days) and hold back the incidents whose companion
+        may still be in the next batch. With row_window None, streaming assumes the batches
+        arrive in time order, as the daily summaries do.'''
+
+    def __init__(self, row_window=2, time_window=0, field=EMSSTAT_FIELD):
+        self.row_window = row_window
+        self.time_window = time_window
+        self.field = field
+        self.key = attrgetter(field)
+        # Incidents flagged but not returned by feed() yet, and returned EMSSTAT incidents that
+        # may still be the companion of a coming incident (row_window None)
+        self.pending = list()
+        self.context = list()
+
+    def link(self, all_incidents):
+        '''Flags every incident of a list and returns the list'''
+        self._mark(all_incidents)
+        return all_incidents
+
+    def feed(self, incidents):
+        '''Adds a batch of incidents to the stream. Returns the incidents, in order, whose flag
+            can't change any more'''
+        batch = self.pending + list(incidents)
+        self._mark(batch, self.context)
+        if self.row_window is not None:
+            held = min(self.row_window, len(batch))
+            final, self.pending = batch[:len(batch) - held], batch[len(batch) - held:]
+            return final
+        times = [absolute_minutes(incident) for incident in batch]
+        watermark = max(times, default=0)
+        # A coming incident is no earlier than the latest one, so only the incidents within
+        # time_window of it can still find a companion. They are held from the first one on,
+        # to return the incidents in order
+        held = next((position for position, time in enumerate(times) if time + self.time_window >= watermark),
+                    len(batch))
+        final, self.pending = batch[:held], batch[held:]
+        # The EMSSTAT incidents returned are kept while a held or coming incident is within time_window
+        earliest = min(times[held:], default=watermark)
+        self.context = [incident for incident in self.context + final
+                        if self.key(incident) == EMSSTAT and absolute_minutes(incident) + self.time_window >= earliest]
+        return final
+
+    def flush(self):
+        '''Ends the stream and returns the incidents that were held back'''
+        final, self.pending, self.context = self.pending, list(), list()
+        return final
+
+    def _mark(self, incidents, context=()):
+        if self.row_window is None:
+            self._mark_anywhere(incidents, context)
+        elif self.time_window == 0:
+            self._mark_following(incidents)
+        else:
+            self._mark_following_within(incidents)
+
+    def _mark_following(self, incidents):
+        # Walking backwards, the nearest EMSSTAT incident after a row is the last one seen with its key
+        nearest = dict()
+        row_window, key_of = self.row_window, self.key
+        for position in range(len(incidents) - 1, -1, -1):
+            incident = incidents[position]
+            key = (incident.incident_time, incident.incident_location)
+            companion = nearest.get(key)
+            if key_of(incident) == EMSSTAT:
+                incident.emsstat = True
+                nearest[key] = position
+            else:
+                incident.emsstat = companion is not None and companion - position <= row_window
+
+    def _mark_following_within(self, incidents):
+        # The EMSSTAT incidents of each location among the next row_window rows, nearest first
+        following = dict()
+        row_window, time_window, key_of = self.row_window, self.time_window, self.key
+        for position in range(len(incidents) - 1, -1, -1):
+            incident = incidents[position]
+            time = absolute_minutes(incident)
+            companions = following.get(incident.incident_location)
+            if companions is not None:
+                while companions and companions[-1][0] - position > row_window:
+                    companions.pop()
+            if key_of(incident) == EMSSTAT:
+                incident.emsstat = True
+                following.setdefault(incident.incident_location, deque()).appendleft((position, time))
+            else:
+                incident.emsstat = bool(companions) and any(abs(companion_time - time) <= time_window
+                                                            for companion_position, companion_time in companions)
+
+    def _mark_anywhere(self, incidents, context=()):
+        # Sorted times of the EMSSTAT incidents of each location
+        times = dict()
+        key_of = self.key
+        for incident in list(context) + list(incidents):
+            if key_of(incident) == EMSSTAT:
+                times.setdefault(incident.incident_location, list()).append(absolute_minutes(incident))
+        for location_times in times.values():
+            location_times.sort()
+        time_window = self.time_window
+        for incident in incidents:
+            if key_of(incident) == EMSSTAT:
+                incident.emsstat = True
+                continue
+            location_times = times.get(incident.incident_location)
+            if location_times is None:
+                incident.emsstat = False
+                continue
+            time = absolute_minutes(incident)
+            index = bisect_left(location_times, time - time_window)
+            incident.emsstat = index < len(location_times) and location_times[index] <= time + time_window
@@ -0,0 +1,110 @@
+import os
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+# Requests per second allowed by each provider: the Nominatim usage policy allows one request
+# per second and the free Open-Meteo api 600 per minute. Other providers are not throttled
+RATE_LIMITS = {'nominatim': 1.0, 'open-meteo': 10.0}
+MAX_WORKERS = 8
+
+
+class TokenBucket:
+    '''Thread safe token bucket refilled with rate tokens per second, holding at most capacity
+        tokens so that bursts stay within the limit of the provider'''
+
+    def __init__(self, rate, capacity=1):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        '''Takes a token, waiting until one is available'''
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+class EnrichmentStage:
+    '''Runs the lookups of the enrichment providers (the geocoder and the weather api)
+        concurrently in a bounded thread pool. Every provider is throttled by its own token
+        bucket, and a lookup whose key is already in flight shares that request instead of
+        sending another one. Callers collect the futures in their own order, so the results
+        are reassembled deterministically whatever order the requests complete in.'''
+
+    def __init__(self, max_workers=MAX_WORKERS, rate_limits=RATE_LIMITS):
+        self.max_workers = max_workers
+        self.rate_limits = dict(rate_limits)
+        self.requests = Counter()
+        self.coalesced = 0
+        self.pid = None
+        self.reset()
+
+    def reset(self):
+        '''Creates the thread pool, the rate limiters and the table of in-flight requests. It is
+            called again in forked worker processes, which do not inherit the threads'''
+        self.pid = os.getpid()
+        self.executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='enrichment')
+        self.limiters = {provider: TokenBucket(rate) for provider, rate in self.rate_limits.items()}
+        self.in_flight = dict()
+        self.lock = threading.Lock()
+
+    def stats(self):
+        '''Returns the number of requests sent per provider and of coalesced lookups'''
+        return {'requests': dict(self.requests), 'coalesced': self.coalesced}
+
+    def submit(self, provider, key, function, *args):
+        '''Schedules function(*args) as the lookup of key from provider and returns its future'''
+        if self.pid != os.getpid():
+            self.reset()
+        with self.lock:
+            future = self.in_flight.get((provider, key))
+            if future is not None:
+                self.coalesced += 1
+                return future
+            self.requests[provider] += 1
+            future = self.executor.submit(self._run, provider, function, *args)
+            self.in_flight[(provider, key)] = future
+        future.add_done_callback(lambda done: self._done(provider, key, done))
+        return future
+
+    def map(self, provider, function, keys):
+        '''Looks up function(key) for every key concurrently and returns the results in the order of keys'''
+        futures = [self.submit(provider, key, function, key) for key in keys]
+        return [future.result() for future in futures]
+
+    def _run(self, provider, function, *args):
+        limiter = self.limiters.get(provider)
+        if limiter is not None:
+            limiter.acquire()
+        return function(*args)
+
+    def _done(self, provider, key, future):
+        with self.lock:
+            if self.in_flight.get((provider, key)) is future:
+                del self.in_flight[(provider, key)]
+
+
+_enrichment_stage = None
+
+def get_enrichment_stage():
+    '''Returns the stage running the geocoder and weather lookups, creating the default one on first use'''
+    global _enrichment_stage
+    if _enrichment_stage is None:
+        _enrichment_stage = EnrichmentStage()
+    return _enrichment_stage
+
+def set_enrichment_stage(stage):
+    '''Replaces the stage running the geocoder and weather lookups, e.g. with other rate limits'''
+    global _enrichment_stage
+    _enrichment_stage = stage
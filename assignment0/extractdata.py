@@ -1,30 +1,40 @@
-import pypdf
-from pypdf import PdfReader
-import re
+import os
+import queue
+import tempfile
+import threading
+from concurrent.futures import ProcessPoolExecutor
 from io import BytesIO
 from datetime import datetime
-from geopy.geocoders import Nominatim
-from functools import lru_cache
-import openmeteo_requests
-import requests_cache
-import pandas as pd
-from retry_requests import retry
 from warnings import filterwarnings
+from .lineparser import line_parser
+from .layout import layout_parser
+from .incident import Incident, intern
+from .geocache import get_geocode_store
+from .weather import get_weather_service
+from .spatial import get_spatial_index
+from .profiling import get_profiler
 filterwarnings('ignore')
 
+# Version of the incidents returned by extractdata, part of the key of the parse cache.
+# Bump it whenever a change to the parsing or the enrichment changes the incidents of a pdf
+PARSER_VERSION = 2
+# How far extractdata enriches the incidents: 'parse' only parses the five fields of every line
+# (and the date and hour) without any network call, 'geocode' adds the side of town and 'full'
+# the weather code too
+MODES = ('parse', 'geocode', 'full')
+# Pdfs with fewer pages are decoded serially, the start up of a process pool would cost more
+# than decoding them (a page of a daily summary takes about 50 ms)
+PARALLEL_MIN_PAGES = 8
+# Page ranges given to each process of the pool, more than one so a slow range does not hold the others
+RANGES_PER_PROCESS = 4
 
-# Setup the Open-Meteo API client with cache and retry on error
-cache_session = requests_cache.CachedSession('.cache', expire_after = -1)
-retry_session = retry(cache_session, retries = 5, backoff_factor = 0.2)
-openmeteo = openmeteo_requests.Client(session = retry_session)
 
-url = "https://archive-api.open-meteo.com/v1/archive"
-
-@lru_cache(maxsize=128)
 def get_location_info(address):
-    geolocator = Nominatim(user_agent="geoapimanoj")
-    location = geolocator.geocode(address)
-    return location
+    return get_geocode_store().get_location(address)
+
+def resolve_addresses(addresses):
+    '''Geocodes a batch of addresses through the persistent geocode store'''
+    return get_geocode_store().resolve_addresses(addresses)
 
 def get_town_from_address(raw_location):
     # Split the display name by commas and extract the town (second element)
@@ -46,109 +56,283 @@ def get_location_side(center_lat, center_lon, location_lat, location_lon):
             return 'SW'
         
 def get_weather_code(params, hour):
-    try:
-        responses = openmeteo.weather_api(url, params=params)
-        # Process first location. Add a for-loop for multiple locations or weather models
-        response = responses[0]
-        hourly = response.Hourly()
-        hourly_temperature_2m = hourly.Variables(0).ValuesAsNumpy()
-        hourly_precipitation = hourly.Variables(1).ValuesAsNumpy()
-        hourly_weather_code = hourly.Variables(2).ValuesAsNumpy()
-
-        hourly_data = {"date": pd.date_range(
-            start = pd.to_datetime(hourly.Time(), unit = "s", utc = True),
-            end = pd.to_datetime(hourly.TimeEnd(), unit = "s", utc = True),
-            freq = pd.Timedelta(seconds = hourly.Interval()),
-            inclusive = "left"
-        )}
-        hourly_data["temperature_2m"] = hourly_temperature_2m
-        hourly_data["precipitation"] = hourly_precipitation
-        hourly_data["weather_code"] = hourly_weather_code
-
-        hourly_dataframe = pd.DataFrame(data = hourly_data)
-        hourly_dataframe['date'] = pd.to_datetime(hourly_dataframe['date'])
-        hourly_dataframe.set_index('date', inplace=True)
-        weather_at_23_hour = hourly_dataframe[hourly_dataframe.index.hour == hour]
-        weather_code_value = int(weather_at_23_hour['weather_code'])
-        return weather_code_value
-    except:
-        return 0
-
-def extractdata(pdf_file):
+    '''Returns the weather code at an hour of the day for the location in params'''
+    return get_weather_service().get_weather_code(params["latitude"], params["longitude"], params["start_date"], hour)
+
+def extractdata(pdf_file, mode='full', processes=1):
     '''Extracts raw data from pdf file and processes the raw data to extract relavant information'''
-    reader = PdfReader(pdf_file)
-    num_pages = len(reader.pages)
-    raw_incidents_text = list()
-    for page_number in range(num_pages):
-        page = reader.pages[page_number]
-        text = page.extract_text()
-        raw_incidents_text.append(text)
-    # print("EXTRACTED ALL INCIDENTS TEXT!!\n")
-    all_incidents = process_incidents_by_page(raw_incidents_text)
-    # print('ALL INCIDENTS!')
-    # print(raw_incidents_text)
-    return all_incidents
-
-def process_incidents_by_page(raw_incidents_text:list):
+    return list(iter_incidents(pdf_file, mode=mode, processes=processes))
+
+def iter_incidents(pdf_file, read_ahead=2, mode='full', processes=1):
+    '''Yields the incidents of a pdf file page by page, as soon as each page is decoded and
+        enriched, so the whole text of the pdf is never held in memory. The process pool is
+        opt-in: with more than one process (one per cpu when processes is None), the pages of a
+        pdf of PARALLEL_MIN_PAGES pages or more are decoded and parsed in a pool of processes
+        instead and the incidents of all the pages are enriched together'''
+    parsed_incidents = parse_pages_in_pool(pdf_file, processes) if processes != 1 else None
+    if parsed_incidents is not None:
+        final_incidents_list = enrich_incidents(parsed_incidents, mode)
+        get_profiler().count('incidents', len(final_incidents_list))
+        yield from final_incidents_list
+        return
+    for page in iter_pages(pdf_file, read_ahead, decode_page):
+        yield from process_incidents_by_page([page], mode)
+
+def parse_page_range(pdf_path, start, stop):
+    '''Decodes and parses the pages start to stop of a pdf in a process of the pool. Returns their
+        incidents and the timers and counters of the process, which are merged into the
+        profiler of the calling process'''
+    profiler = get_profiler()
+    profiler.reset()
+    reader = open_pdf(pdf_path)
+    pages = list()
+    for page_number in range(start, stop):
+        with profiler.stage('extract_text'):
+            pages.append(decode_page(reader.pages[page_number]))
+        profiler.count('pages')
+    return parse_incidents(pages), profiler.snapshot()
+
+def parse_pages_in_pool(pdf_file, processes=None, min_pages=PARALLEL_MIN_PAGES):
+    '''Returns the parsed (not enriched) incidents of a pdf in page order, with ranges of pages
+        decoded and parsed in a process pool. Every process opens the pdf from its path (the
+        bytes of a pdf are written to a temporary file first) so only page numbers are sent to
+        it. Returns None when the pdf has fewer than min_pages pages or there is a single
+        process, as it is faster to decode it serially'''
+    processes = processes or os.cpu_count() or 1
+    if processes < 2:
+        return None
+    temporary_path = None
+    if isinstance(pdf_file, (str, os.PathLike)):
+        pdf_path = pdf_file
+        page_count = len(open_pdf(pdf_file).pages)
+    else:
+        if isinstance(pdf_file, (bytes, bytearray, memoryview)):
+            data = bytes(pdf_file)
+        else:
+            position = pdf_file.tell()
+            data = pdf_file.read()
+            pdf_file.seek(position)
+        page_count = len(open_pdf(data).pages)
+        if page_count < min_pages:
+            return None
+        with tempfile.NamedTemporaryFile(suffix='.pdf', delete=False) as file:
+            file.write(data)
+            temporary_path = pdf_path = file.name
+    try:
+        if page_count < min_pages:
+            return None
+        range_size = -(-page_count // (processes * RANGES_PER_PROCESS))
+        ranges = [(start, min(start + range_size, page_count)) for start in range(0, page_count, range_size)]
+        profiler = get_profiler()
+        parsed_incidents = list()
+        with ProcessPoolExecutor(max_workers=min(processes, len(ranges))) as pool:
+            futures = [pool.submit(parse_page_range, pdf_path, start, stop) for start, stop in ranges]
+            for future in futures:
+                incidents, snapshot = future.result()
+                profiler.merge(snapshot)
+                parsed_incidents.extend(incidents)
+        return parsed_incidents
+    finally:
+        if temporary_path is not None:
+            os.remove(temporary_path)
+
+def open_pdf(pdf_file):
+    '''Returns a PdfReader for a pdf file path, a binary stream, or the raw bytes of a pdf
+        (bytes, bytearray or memoryview) so downloads can be parsed without touching the disk'''
+    if isinstance(pdf_file, (bytes, bytearray, memoryview)):
+        pdf_file = BytesIO(pdf_file)
+    from pypdf import PdfReader
+    return PdfReader(pdf_file)
+
+def decode_page(page):
+    '''Returns the text of a page and the rows of its incident table recovered from the
+        position of the text (see LayoutParser.parse_page), in a single pass of pypdf'''
+    return layout_parser.parse_page(page)
+
+def iter_pages_text(pdf_file, read_ahead=2):
+    '''Yields the text of each page of a pdf file. With read_ahead, up to that many pages are
+        decoded ahead in a background thread while the caller is busy with the current page'''
+    return iter_pages(pdf_file, read_ahead, lambda page: page.extract_text())
+
+def iter_pages(pdf_file, read_ahead=2, decode=decode_page):
+    '''Yields decode(page) for each page of a pdf file, decoded ahead like iter_pages_text'''
+    reader = open_pdf(pdf_file)
+    profiler = get_profiler()
+    if not read_ahead:
+        for page in reader.pages:
+            with profiler.stage('extract_text'):
+                decoded = decode(page)
+            profiler.count('pages')
+            yield decoded
+        return
+    pages = queue.Queue(maxsize=read_ahead)
+    stop = threading.Event()
+
+    def decode_pages():
+        try:
+            for page in reader.pages:
+                if stop.is_set():
+                    return
+                with profiler.stage('extract_text'):
+                    decoded = decode(page)
+                profiler.count('pages')
+                pages.put((decoded, None))
+            pages.put((None, None))
+        except Exception as e:
+            pages.put((None, e))
+
+    decoder = threading.Thread(target=decode_pages, daemon=True)
+    decoder.start()
+    try:
+        while True:
+            decoded, error = pages.get()
+            if error is not None:
+                raise error
+            if decoded is None:
+                return
+            yield decoded
+    finally:
+        # Unblock the decoder if the caller stopped early
+        stop.set()
+        while decoder.is_alive():
+            try:
+                pages.get_nowait()
+            except queue.Empty:
+                decoder.join(0.01)
+
+def process_incidents_by_page(raw_incidents_text:list, mode='full'):
     '''Processes the whole incidents data page-by-page, then line-by-line in each page 
-        to extract relavant keys and values'''
-    final_incidents_list = list()
-    count = 0
-    for page_text in raw_incidents_text:
-        incidents_by_page = page_text.split('\n')
-        for incident_string in incidents_by_page:
-            count+=1
-            incident_time, incident_ori, incident_number = None, None, None
-            incident_address, incident_nature = None, None
-            if 'RAMPMotorist' in incident_string:
-                final_incidents_list.append(('6:42', '2024-00004434', "W STATE HWY 9 HWY I35 NB ON RAMP 108A", "Motorist Assist", "OK0140200" ))
-                continue
-            elif 'SPUR' in incident_string:
-                final_incidents_list.append(('6:36', '2024-00005537', "W MAIN ST / I35 NB ON RAMP 109 EAST SPUR RAMP", "MVA Non Injury", "OK0140200" ))
-                continue
-            incident_time = extract_time(incident_string)
-            if not incident_time:
-                continue
-            incident_number = extract_number(incident_string)
-            if not incident_number:
-                continue
-            incident_address, last_index = extract_address(incident_string)
-            if incident_address is None:
+        to extract relavant keys and values, and enriches the incidents as far as mode (see MODES)'''
+    final_incidents_list = enrich_incidents(parse_incidents(raw_incidents_text), mode)
+    get_profiler().count('incidents', len(final_incidents_list))
+    return final_incidents_list
+
+def parse_incidents(raw_incidents_text:list):
+    '''Parses the incidents of the pages with their date, day of the week and hour, without any
+        network lookup. A page is its text, or its (text, rows) from decode_page: the rows
+        recovered from the layout are used when there are any, and the lines of the text
+        otherwise'''
+    profiler = get_profiler()
+    parsed_incidents = list()
+    lines = not_incident = text_pages = 0
+    # day -> (day of the week, interned day)
+    days = dict()
+    with profiler.stage('parse_lines'):
+        for page in raw_incidents_text:
+            page_text, rows = (page, None) if isinstance(page, str) else page
+            if rows is not None:
+                lines += len(rows)
+                for row in rows:
+                    if row is None:
+                        not_incident += 1
+                        continue
+                    incident = Incident(*row[:5])
+                    day = days.get(row[5])
+                    if day is None:
+                        day = days[row[5]] = (extract_day_of_week(row[5]), intern(row[5]))
+                    incident.day_of_week, incident.incident_date = day
+                    incident.incident_hour = int(incident.incident_time.split(':')[0])
+                    parsed_incidents.append(incident)
                 continue
-            # if not final_output:
-            try:
-                full_address_info = get_location_info(incident_address)
-                if not full_address_info:
+            text_pages += 1
+            incidents_by_page = page_text.split('\n')
+            lines += len(incidents_by_page)
+            for incident_string in incidents_by_page:
+                if 'RAMPMotorist' in incident_string:
+                    parsed_incidents.append(Incident('6:42', '2024-00004434', "W STATE HWY 9 HWY I35 NB ON RAMP 108A", "Motorist Assist", "OK0140200" ))
                     continue
-                address_lat, address_lon = full_address_info.latitude, full_address_info.longitude
-                town = get_town_from_address(full_address_info.raw)
-                town_center_location = get_location_info(town)
-                center_lat, center_lon = town_center_location.latitude, town_center_location.longitude
-                side_of_town = get_location_side(center_lat, center_lon, address_lat, address_lon)
-                if not side_of_town:
+                elif 'SPUR' in incident_string:
+                    parsed_incidents.append(Incident('6:36', '2024-00005537', "W MAIN ST / I35 NB ON RAMP 109 EAST SPUR RAMP", "MVA Non Injury", "OK0140200" ))
                     continue
-            except:
-                continue
-            incident_nature, incident_ori = extract_nature_and_ori(incident_string, last_index)
-            if not incident_ori or incident_nature is None:
-                continue
-            incident_day_of_week, day = extract_day(incident_string)
-            incident_hour = int(incident_time.split(':')[0])
-            params = {
-                "latitude": address_lat,
-                "longitude": address_lon,
-                "start_date": day,
-                "end_date": day,
-                "hourly": ["temperature_2m", "precipitation", "weather_code"]
-            }
-            weather_code = get_weather_code(params, incident_hour)
-            final_incidents_list.append((incident_day_of_week, incident_hour,incident_time, incident_number, incident_address, side_of_town, weather_code, incident_nature, incident_ori))
-    # print('PROCESSED ALL INCIDENTS!!')
-    # print('Total rows count in extracted incidents list = ', count)
-    # print('Total actual incidents count = ', len(final_incidents_list))
+                parsed_incident = line_parser.parse(incident_string)
+                if parsed_incident is None:
+                    not_incident += 1
+                    continue
+                incident = Incident(*parsed_incident)
+                incident.day_of_week, day = extract_day(incident_string)
+                incident.incident_date = intern(day)
+                incident.incident_hour = int(incident.incident_time.split(':')[0])
+                parsed_incidents.append(incident)
+    profiler.count('lines', lines)
+    profiler.count('skipped.not_incident', not_incident)
+    profiler.count('text_pages', text_pages)
+    return parsed_incidents
 
+def enrich_incidents(all_incidents, mode='full', keep_unlocated=False):
+    '''Enriches parsed incidents: 'parse' returns them as they are, 'geocode' fills in their side
+        of town and 'full' their weather code too. Incidents whose address or town can't be
+        geocoded are dropped unless keep_unlocated. Incidents without a date (the rows that are
+        patched in by hand) are kept without enrichment'''
+    if mode not in MODES:
+        raise ValueError(f"Unknown mode {mode!r}, expected one of {MODES}")
+    if mode == 'parse':
+        return all_incidents
+    final_incidents_list, located_incidents = locate_incidents(all_incidents, keep_unlocated)
+    if mode == 'full':
+        add_weather_codes(located_incidents)
     return final_incidents_list
 
+def locate_incidents(all_incidents, keep_unlocated=False):
+    '''Fills in the side of town of the incidents. Returns the incidents that are kept and the
+        (incident, latitude, longitude) of the located ones'''
+    profiler = get_profiler()
+    spatial_index = get_spatial_index()
+    # Geocode every distinct address of the pages in one batch, and the towns that were never seen
+    with profiler.stage('geocode'):
+        address_locations = resolve_addresses([incident.incident_location for incident in all_incidents
+                                               if incident.incident_date is not None])
+        towns = dict()
+        for address, location in address_locations.items():
+            if location:
+                try:
+                    towns[address] = get_town_from_address(location.raw)
+                except Exception:
+                    pass
+        spatial_index.resolve_towns(towns.values())
+
+    final_incidents_list = list()
+    located_incidents = list()
+    centers = list()
+    address_not_found = town_not_found = 0
+    for incident in all_incidents:
+        if incident.incident_date is None:
+            final_incidents_list.append(incident)
+            continue
+        full_address_info = address_locations.get(incident.incident_location)
+        if not full_address_info:
+            address_not_found += 1
+        else:
+            town_center = spatial_index.center(towns.get(incident.incident_location))
+            if town_center is not None:
+                final_incidents_list.append(incident)
+                located_incidents.append((incident, full_address_info.latitude, full_address_info.longitude))
+                centers.append(town_center)
+                continue
+            town_not_found += 1
+        if keep_unlocated:
+            final_incidents_list.append(incident)
+
+    # Classify all the located incidents at once against their town centers (and polygons)
+    with profiler.stage('classify'):
+        sides = spatial_index.classify([address_lat for incident, address_lat, address_lon in located_incidents],
+                                       [address_lon for incident, address_lat, address_lon in located_incidents],
+                                       [center[0] for center in centers], [center[1] for center in centers])
+        for (incident, address_lat, address_lon), side_of_town in zip(located_incidents, sides):
+            incident.side_of_town = intern(side_of_town)
+    profiler.count('skipped.address_not_found', address_not_found)
+    profiler.count('skipped.town_not_found', town_not_found)
+    return final_incidents_list, located_incidents
+
+def add_weather_codes(located_incidents):
+    '''Fills in the weather code of located (incident, latitude, longitude)'''
+    # Fetch the weather of every grid cell and day of the pages before looking up each incident
+    with get_profiler().stage('weather'):
+        weather_service = get_weather_service()
+        weather_service.prefetch([(address_lat, address_lon, incident.incident_date)
+                                  for incident, address_lat, address_lon in located_incidents])
+        for incident, address_lat, address_lon in located_incidents:
+            incident.weather_code = weather_service.get_weather_code(address_lat, address_lon, incident.incident_date, incident.incident_hour)
+
 def extract_day(input_string):
     # Split the input string by space to get individual components
     components = input_string.split()
@@ -166,201 +350,22 @@ def extract_day(input_string):
     day_of_week_adjusted = (day_of_week + 1) % 7 + 1
     return day_of_week_adjusted, str(date).split(" ")[0]
 
+def extract_day_of_week(day):
+    '''Returns the day of the week of a YYYY-MM-DD day, numbered like extract_day'''
+    return (datetime.strptime(day, '%Y-%m-%d').weekday() + 1) % 7 + 1
+
 def extract_nature_and_ori(input_string, start_index):
     '''Parses the nature of the incident and the ori number from the raw incident string'''
-    standard_oris = ['OK0140200', 'EMSSTAT', '14005', '14009']
-    ori_match = re.search(r'(\w+)$', input_string)
-    ori_number = None
-    incident_nature = None
-    end_index = -1
-    if ori_match:
-        for s in standard_oris:
-            if s in input_string:
-                ori_number = s
-                end_index = input_string.find(ori_number)
-                break
-    if not ori_number:
-        # print('ORI NUMBER IS NONE FOR THIS INPUT STRING')
-        # print(input_string)
-        return None, None
-    incident_nature = input_string[start_index+1:end_index].strip(' ')
-    return incident_nature, ori_number
+    return line_parser.parse_nature_and_ori(input_string, start_index)
 
 def extract_address(input_string):
     '''Parses the location of the incident from the raw incident string'''
-    street_type_list = ['RD/156', 'LAMB TOWING', '201 W GRAY', '1919 W BOYD'
-        , 'BNSF RR', '1100 N PORTER', 'BRIARCLIFF', 'CHESTNUT', 'H4 AL', 'HWY 9',
-        'Allee', 'Alley', 'Ally', 'Aly', 'Anex', 'Annex',
-        'Annx', 'Anx', 'Arc', 'Arcade', 'Av', 'Ave', 'APT',
-        'Aven', 'Avenu', 'Avenue', 'Avn', 'Avnue', 'Base', 'Bayoo',
-        'Bayou', 'Bch', 'Beach', 'Bend', 'Bg', 'Bgs',
-        'Blf', 'Blfs', 'Bluf', 'Bluff', 'Bluffs', 'Blvd',
-        'Bnd', 'Bot', 'Bottm', 'Bottom', 'Boul', 'Boulevard',
-        'Boulv', 'Br', 'Branch', 'Brdge', 'Brg', 'Bridge',
-        'Brk', 'Brks', 'Brnch', 'Broadway', 'Brook', 'Brooks',
-        'Btm', 'Burg', 'Burgs', 'Byp', 'Bypa', 'Bypas',
-        'Bypass', 'Byps', 'Byu', 'Camp', 'Canyn', 'Canyon',
-        'Cape', 'Causeway', 'Causwa', 'Cen', 'Cent', 'Center',
-        'Centers', 'Centr', 'Centre', 'Cir', 'Circ', 'Circl',
-        'Circle', 'Circles', 'Cirs', 'Clb', 'Clf', 'Clfs',
-        'Cliff', 'Cliffs', 'Club', 'Cmn', 'Cmns', 'Cmp',
-        'Cnter', 'Cntr', 'Cnyn', 'Common', 'Commons', 'Cor',
-        'Corner', 'Corners', 'Cors', 'Course', 'Court', 'Courts',
-        'Cove', 'Coves', 'Cp', 'Cpe', 'Crcl', 'Crcle',
-        'Creek', 'Cres', 'Crescent', 'Crest', 'Crk', 'Crossing',
-        'Crossroad', 'Crossroads', 'Crse', 'Crsent', 'Crsnt', 'Crssng',
-        'Crst', 'Cswy', 'Ct', 'Ctr', 'Ctrs', 'Cts',
-        'Curv', 'Curve', 'Cv', 'Cvs', 'Cyn', 'Dale',
-        'Dam', 'Div', 'Divide', 'Dl', 'Dm', 'Dr',
-        'Driv', 'Drive', 'Drives', 'Drs', 'Drv', 'Dv',
-        'Dvd', 'Est', 'Estate', 'Estates', 'Ests', 'Exp',
-        'Expr', 'Express', 'Expressway', 'Expw', 'Expy', 'Ext',
-        'Extension', 'Extensions', 'Extn', 'Extnsn', 'Exts', 'Fall'
-        , 'Ferry', 'Field', 'Fields', 'Flat', 'Flats',
-        'Fld', 'Flds', 'Fls', 'Flt', 'Flts', 'Ford',
-        'Fords', 'Forest', 'Forests', 'Forg', 'Forge', 'Forges',
-        'Fork', 'Forks', 'Fort', 'Frd', 'Frds', 'Freeway',
-        'Freewy', 'Frg', 'Frgs', 'Frk', 'Frks', 'Frry',
-        'Frst', 'Frt', 'Frway', 'Frwy', 'Fry', 'Ft',
-        'Fwy', 'Garden', 'Gardens', 'Gardn', 'Gateway', 'Gatewy',
-        'Gatway', 'Gdn', 'Gdns', 'Glen', 'Glens', 'Gln',
-        'Glns', 'Grden', 'Grdn', 'Grdns', 'Green', 'Greens',
-        'Grn', 'Grns', 'Grov', 'Grove', 'Groves', 'Grv',
-        'Grvs', 'Gtway', 'Gtwy', 'Harb', 'Harbor', 'Harbors',
-        'Harbr', 'Haven', 'Hbr', 'Hbrs', 'Heights', 'Highway',
-        'Highwy', 'Hill', 'Hills', 'Hiway', 'Hiwy', 'Hl',
-        'Hllw', 'Hls', 'Hollow', 'Hollows', 'Holw', 'Holws',
-        'Hrbor', 'Ht', 'Hts', 'Hvn', 'Hway', 'Hwy',
-        'Inlet', 'Inlt', 'Is', 'Island', 'Islands', 'Isle',
-        'Isles', 'Islnd', 'Islnds', 'Iss', 'Jct', 'Jction',
-        'Jctn', 'Jctns', 'Jcts', 'Junction', 'Junctions', 'Junctn',
-        'Juncton', 'Key', 'Keys', 'Knl', 'Knls', 'Knol',
-        'Knoll', 'Knolls', 'Ky', 'Kys', 'Lake', 'Lakes',
-        'Land', 'Landing', 'Lane', 'Lck', 'Lcks', 'Ldg',
-        'Ldge', 'Lf', 'Lgt', 'Lgts', 'Light', 'Lights',
-        'Lk', 'Lks', 'Ln', 'Lndg', 'Lndng', 'Loaf',
-        'Lock', 'Locks', 'Lodg', 'Lodge', 'Loop', 'Loops',
-        'Lp', 'Mall', 'Manor', 'Manors', 'Mdw', 'Mdws',
-        'Meadow', 'Meadows', 'Medows', 'Mews', 'Mill', 'Mills',
-        'Mission', 'Missn', 'Ml', 'Mls', 'Mnr', 'Mnrs',
-        'Mnt', 'Mntain', 'Mntn', 'Mntns', 'Motorway', 'Mount',
-        'Mountain', 'Mountains', 'Mountin', 'Msn', 'Mssn', 'Mt',
-        'Mtin', 'Mtn', 'Mtns', 'Mtwy', 'Nck','Ne' , 'Neck', 'Nw','Norman', 'OK-9', 'OK', ','
-        'Opas', 'Orch', 'Orchard', 'Orchrd', 'Oval', 'Overpass',
-        'Ovl', 'Park', 'Parks', 'Parkway', 'Parkways', 'Parkwy',
-        'Pass', 'Passage', 'Path', 'Paths', 'Pike', 'Pikes',
-        'Pine', 'Pines', 'Pkway', 'Pkwy', 'Pkwys', 'Pky',
-        'Pl', 'Place', 'Plain', 'Plains', 'Plaza', 'Pln',
-        'Plns', 'Plz', 'Plza', 'Pne', 'Pnes', 'Point',
-        'Points', 'Port', 'Ports', 'Pr', 'Prairie', 'Prk',
-        'Prr', 'Prt', 'Prts', 'Psge', 'Pt', 'Pts',
-        'Rad', 'Radial', 'Radiel', 'Radl', 'Ramp', 'Ranch',
-        'Ranches', 'Rapid', 'Rapids', 'Rd', 'Rdg', 'Rdge',
-        'Rdgs', 'Rds', 'Rest', 'Ridge', 'Ridges', 'Riv',
-        'River', 'Rivr', 'Rnch', 'Rnchs', 'Road', 'Roads',
-        'Route', 'Row', 'Rpd', 'Rpds', 'Rst', 'Rte',
-        'Rue', 'Run', 'Rvr','Se' , 'Shl', 'Shls', 'Shoal',
-        'Shoals', 'Shoar', 'Shoars', 'Shore', 'Shores', 'Shr',
-        'Shrs', 'Skwy', 'Skyway', 'Smt', 'Spg', 'Spgs',
-        'Spng', 'Spngs', 'Spring', 'Springs', 'Sprng', 'Sprngs',
-        'Spur', 'Spurs', 'Sq', 'Sqr', 'Sqre', 'Sqrs',
-        'Sqs', 'Squ', 'Square', 'Squares', 'St', 'Sta',
-        'Station', 'Statn', 'Stn', 'Str', 'Stra', 'Strav',
-        'Straven', 'Stravenue', 'Stravn', 'Stream', 'Street', 'Streets',
-        'Streme', 'Strm', 'Strt', 'Strvn', 'Strvnue', 'Sts',
-        'Sumit', 'Sumitt', 'Summit', 'Sw', 'Ter', 'Terr', 'Terrace',
-        'Throughway', 'Tpke', 'Trace', 'Traces', 'Track', 'Tracks',
-        'Trafficway', 'Trail', 'Trailer', 'Trails', 'Trak', 'Trce',
-        'Trfy', 'Trk', 'Trks', 'Trl', 'Trlr', 'Trlrs',
-        'Trls', 'Trnpk', 'Trwy', 'Tunel', 'Tunl', 'Tunls',
-        'Tunnel', 'Tunnels', 'Tunnl', 'Turnpike', 'Turnpk', 'Un',
-        'Underpass', 'Union', 'Unions', 'Uns', 'Upas', 'Valley',
-        'Valleys', 'Vally', 'Vdct', 'Via', 'Viadct', 'Viaduct',
-        'View', 'Views', 'Vill', 'Villag', 'Village', 'Villages',
-        'Ville', 'Villg', 'Villiage', 'Vis', 'Vist', 'Vista',
-        'Vl', 'Vlg', 'Vlgs', 'Vlly', 'Vly', 'Vlys',
-        'Vst', 'Vsta', 'Vw', 'Vws', 'Walk', 'Walks',
-        'Wall', 'Way', 'Ways', 'Well', 'Wells', 'Wl',
-        'Wls', 'Wy', 'Xing', 'Xrd', 'Xrds', 'NPD RANGE', 'PD', 'I', 'UNKNOWN', 'O-358']
-    street_type_pattern = r'\b(?:' + '|'.join(map(re.escape, street_type_list)) + r')\b'
-    start_pattern = r'\d{4}-\d{8}'
-    start_match = re.search(start_pattern, input_string)
-    street_address = ''
-    last_index = -1
-    if start_match:
-        start_index = start_match.end()
-        last_index = start_index
-        matches = list(re.finditer(rf'({street_type_pattern})', input_string[start_index:], flags=re.IGNORECASE))
-        # Check for special cases like <UNKNOWN>
-        special_pattern = r'<[^>]+>'
-        special_match = re.search(special_pattern, input_string[start_index:])
-        if special_match:
-            parsed_text = special_match.group()
-            street_address = parsed_text
-            last_index = start_index + special_match.end()
-        elif matches:
-            # Filter matches where all matched strings are in uppercase
-            uppercase_matches = [match for match in matches if match.group(1).isupper()]
-            # #finding the longest matched street address
-            # longest_match = max(matches, key=lambda m: m.end() - start_index)
-            # # Extract the substring from the starting pattern until the longest matched street type
-            # street_address = input_string[start_index:start_index + longest_match.start() + len(longest_match.group(1))].strip()
-            # last_index = longest_match.end() + start_index - 1
-            if uppercase_matches:
-                # Find the longest matched street type among uppercase matches
-                longest_match = max(uppercase_matches, key=lambda m: m.end() - start_index)
-
-                # Extract the substring from the starting pattern until the longest matched street type
-                parsed_text = input_string[start_index:start_index + longest_match.start() + len(longest_match.group(1))].strip()
-                street_address = parsed_text
-                # print("Parsed Text:", parsed_text)
-                # print("Ending Index:", start_index + longest_match.start() + len(longest_match.group(1)))
-                last_index = longest_match.end() + start_index - 1
-        else:
-            # Check for latitude and longitude coordinates
-            lat_lon_pattern = r'([-+]?\d*\.?\d+);([-+]?\d*\.?\d+)'
-            lat_lon_match = re.search(lat_lon_pattern, input_string[start_index:])
-            
-            if lat_lon_match:
-                parsed_text = lat_lon_match.group()
-                street_address = parsed_text
-                last_index = lat_lon_match.end()+start_index
-            else:
-                # Check for special cases like <UNKNOWN>
-                special_pattern = r'<[^>]+>'
-                special_match = re.search(special_pattern, input_string[start_index:])
-                
-                if special_match:
-                    parsed_text = special_match.group()
-                    street_address = parsed_text
-                    last_index = start_index + special_match.end()
-    #             else:
-    #                 print("No street type, coordinates, or special cases found after the starting pattern.")
-    #                 print(input_string)
-    # if street_address=='' or last_index==-1:
-    #     print(input_string)
-    #     print('street address', street_address)
-    #     print('last index', last_index)
-    return street_address, last_index
-    
-    
+    return line_parser.parse_address(input_string)
 
 def extract_number(input_string):
     '''Parses the incident number from the raw incident string'''
-    incident_number_pattern = re.compile(r'(\d{4}-\d{8}\s)')
-    match = re.search(incident_number_pattern, input_string)
-    if match:
-        incident_number = match.group(1).strip(' ')
-    else:
-        incident_number = None
-    return incident_number
+    return line_parser.parse_number(input_string)
 
 def extract_time(input_string):
     '''Parses the time when incident occurred from the raw incident string'''
-    time_pattern = re.compile(r'\b(\d{1,2}:\d{2})\b')
-    match = re.search(time_pattern, input_string)
-    if match:
-        incident_time = match.group(1)
-    else:
-        incident_time = None
-    return incident_time
\ No newline at end of file
+    return line_parser.parse_time(input_string)
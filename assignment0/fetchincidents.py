@@ -1,20 +1,224 @@
-import urllib
-import ssl
-import urllib.request
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
 
 # url = ("https://www.normanok.gov/sites/default/files/documents/"
 #        "2024-01/2024-01-01_daily_incident_summary.pdf")
 
+# Url of the daily incident summary of a day (a datetime.date)
+SUMMARY_URL = ("https://www.normanok.gov/sites/default/files/documents/"
+               "{day:%Y-%m}/{day:%Y-%m-%d}_daily_incident_summary.pdf")
+
+USER_AGENT = "Mozilla/5.0 (X11; Linux i686) AppleWebKit/537.17 (KHTML, like Gecko) Chrome/24.0.1312.27 Safari/537.17"
+PDF_STORE = '.pdfstore'
+CHUNK_SIZE = 64 * 1024
+# (connect, read) timeouts in seconds
+TIMEOUT = (10, 60)
+
+
+def create_session(retries=3, backoff_factor=0.5, pool_size=10):
+    '''Creates an http session that keeps up to pool_size connections alive per host and
+        retries failed connections and 5xx responses with exponential backoff'''
+    # requests is imported here so that importing the package does not pay for it
+    import requests
+    import urllib3
+    from requests.adapters import HTTPAdapter
+    from urllib3.util.retry import Retry
+    # The summaries were always fetched without certificate verification
+    urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
+    session = requests.Session()
+    session.headers['User-Agent'] = USER_AGENT
+    retry = Retry(total=retries, backoff_factor=backoff_factor, status_forcelist=(500, 502, 503, 504),
+                  allowed_methods=('GET',), raise_on_status=False)
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+
+class PdfStore:
+    '''Content addressed store of the downloaded pdfs. Every pdf is saved once under its sha256
+        digest and an sqlite index maps each url to the digest and the validators (ETag and
+        Last-Modified) of its last download. Interrupted downloads are kept under partial/
+        so they can be resumed.'''
+
+    def __init__(self, root=PDF_STORE):
+        self.root = root
+        os.makedirs(os.path.join(root, 'objects'), exist_ok=True)
+        os.makedirs(os.path.join(root, 'partial'), exist_ok=True)
+        self.lock = threading.Lock()
+        self.con = sqlite3.connect(os.path.join(root, 'index.sqlite'), timeout=30, check_same_thread=False)
+        self.con.execute("""CREATE TABLE IF NOT EXISTS downloads (
+            url TEXT PRIMARY KEY,
+            sha256 TEXT,
+            etag TEXT,
+            last_modified TEXT,
+            size INTEGER,
+            fetched_at REAL
+                )""")
+        self.con.commit()
+
+    def object_path(self, digest):
+        '''Returns the path of the pdf with a sha256 digest'''
+        return os.path.join(self.root, 'objects', digest[:2], digest + '.pdf')
+
+    def partial_path(self, url):
+        '''Returns the path where the download of a url is written until it is complete'''
+        return os.path.join(self.root, 'partial', hashlib.sha256(url.encode()).hexdigest())
+
+    def lookup(self, url):
+        '''Returns the index entry of a url as a dict, or None if its pdf is not stored'''
+        with self.lock:
+            row = self.con.execute("SELECT sha256, etag, last_modified, size FROM downloads WHERE url = ?",
+                                   (url,)).fetchone()
+        if row is None or not os.path.exists(self.object_path(row[0])):
+            return None
+        return dict(zip(('sha256', 'etag', 'last_modified', 'size'), row))
+
+    def add(self, url, partial_path, digest, etag=None, last_modified=None):
+        '''Moves a complete download into the store and indexes it under its url. Returns its path'''
+        path = self.object_path(digest)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        size = os.path.getsize(partial_path)
+        os.replace(partial_path, path)
+        with self.lock, self.con:
+            self.con.execute("INSERT OR REPLACE INTO downloads VALUES (?, ?, ?, ?, ?, ?)",
+                             (url, digest, etag, last_modified, size, time.time()))
+        return path
+
+    def close(self):
+        self.con.close()
 
-def fetchincidents(url):
-    '''This function takes the url and gets the binary data from the url'''
-    headers = {}
-    headers['User-Agent'] = "Mozilla/5.0 (X11; Linux i686) AppleWebKit/537.17 (KHTML, like Gecko) Chrome/24.0.1312.27 Safari/537.17"                          
-    context = ssl.SSLContext(ssl.PROTOCOL_TLS)
-    context.verify_mode = ssl.CERT_NONE
 
-    data = urllib.request.urlopen(urllib.request.Request(url, headers=headers), context=context).read() 
-    return data
+class Downloader:
+    '''Downloads pdfs into a PdfStore over a pooled http session.
 
+        A url that is already stored is requested with If-None-Match/If-Modified-Since and
+        not downloaded again when the server answers 304 Not Modified. Bodies are streamed to
+        disk in chunks, and a download that fails midway is resumed with a Range request
+        (guarded by If-Range) on the next attempt. Failed connections and 5xx responses are
+        retried by the Retry of the session, the attempts of fetch() only retry bodies cut in
+        the middle. The counters are shared by the threads that fetch through the downloader.'''
 
+    def __init__(self, store=None, session=None, timeout=TIMEOUT, retries=3, backoff_factor=0.5, verify=False):
+        self.store = store if store is not None else PdfStore()
+        self.session = session if session is not None else create_session(retries, backoff_factor)
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff_factor = backoff_factor
+        self.verify = verify
+        self.lock = threading.Lock()
+        self.downloads = 0
+        self.not_modified = 0
+        self.resumed = 0
+        self.bytes = 0
 
+    def stats(self):
+        '''Returns the download, not modified, resumed download and downloaded bytes counters'''
+        with self.lock:
+            return {'downloads': self.downloads, 'not_modified': self.not_modified, 'resumed': self.resumed,
+                    'bytes': self.bytes}
+
+    def fetch(self, url):
+        '''Returns the path of the stored pdf of a url, downloading it only if it changed.
+            A body cut while it is streamed is resumed with exponential backoff, connection errors
+            are raised once the session gave up on them'''
+        import requests
+        for attempt in range(self.retries + 1):
+            try:
+                return self._fetch(url)
+            except requests.exceptions.ChunkedEncodingError:
+                if attempt == self.retries:
+                    raise
+                time.sleep(self.backoff_factor * 2 ** attempt)
+
+    def _fetch(self, url):
+        import requests
+        entry = self.store.lookup(url)
+        headers = dict()
+        if entry is not None:
+            if entry['etag']:
+                headers['If-None-Match'] = entry['etag']
+            if entry['last_modified']:
+                headers['If-Modified-Since'] = entry['last_modified']
+        partial_path = self.store.partial_path(url)
+        validators_path = partial_path + '.json'
+        offset = 0
+        if os.path.exists(partial_path) and os.path.exists(validators_path):
+            with open(validators_path, 'r') as file:
+                validator = json.load(file).get('validator')
+            if validator:
+                offset = os.path.getsize(partial_path)
+                headers['Range'] = f'bytes={offset}-'
+                headers['If-Range'] = validator
+
+        with self.session.get(url, headers=headers, stream=True, timeout=self.timeout, verify=self.verify) as response:
+            if response.status_code == 304 and entry is not None:
+                with self.lock:
+                    self.not_modified += 1
+                return self.store.object_path(entry['sha256'])
+            if response.status_code == 416:
+                # The partial download does not match the document any more, start over
+                os.remove(partial_path)
+                return self._fetch(url)
+            response.raise_for_status()
+            etag = response.headers.get('ETag')
+            last_modified = response.headers.get('Last-Modified')
+            digest = hashlib.sha256()
+            if response.status_code == 206:
+                with self.lock:
+                    self.resumed += 1
+                with open(partial_path, 'rb') as file:
+                    for chunk in iter(lambda: file.read(CHUNK_SIZE), b''):
+                        digest.update(chunk)
+                mode = 'ab'
+            else:
+                mode = 'wb'
+                with open(validators_path, 'w') as file:
+                    json.dump({'validator': etag or last_modified}, file)
+            received = 0
+            try:
+                with open(partial_path, mode) as file:
+                    for chunk in response.iter_content(CHUNK_SIZE):
+                        digest.update(chunk)
+                        file.write(chunk)
+                        received += len(chunk)
+            except requests.ConnectionError as error:
+                # A read timeout in the middle of the body is resumed like a cut body
+                raise requests.exceptions.ChunkedEncodingError(error) from error
+            finally:
+                with self.lock:
+                    self.bytes += received
+        with self.lock:
+            self.downloads += 1
+        path = self.store.add(url, partial_path, digest.hexdigest(), etag, last_modified)
+        os.remove(validators_path)
+        return path
+
+
+_downloader = None
+
+def get_downloader():
+    '''Returns the downloader used by fetchincidents, creating the default one on first use'''
+    global _downloader
+    if _downloader is None:
+        _downloader = Downloader()
+    return _downloader
+
+def set_downloader(downloader):
+    '''Replaces the downloader used by fetchincidents, e.g. with one using a temporary store'''
+    global _downloader
+    _downloader = downloader
+
+
+def daily_summary_url(day, template=SUMMARY_URL):
+    '''Returns the url of the daily incident summary of a day (a datetime.date)'''
+    return template.format(day=day)
+
+def fetchincidents(url):
+    '''This function takes the url and gets the binary data from the url'''
+    with open(get_downloader().fetch(url), 'rb') as file:
+        return file.read()
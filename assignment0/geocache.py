@@ -0,0 +1,184 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from .enrichment import get_enrichment_stage
+from . import providers
+
+GEOCODE_DB = '.geocode.sqlite'
+# sqlite limits the number of parameters of a single query
+QUERY_CHUNK_SIZE = 500
+
+
+def normalize_address(address):
+    '''Returns the key under which an address is cached'''
+    return ' '.join(str(address).upper().split())
+
+
+class LocalGeocoder:
+    '''Offline stand-in for Nominatim that answers from a dict of
+        address -> (latitude, longitude, display_name)'''
+
+    def __init__(self, locations=None):
+        self.locations = {normalize_address(address): value for address, value in (locations or {}).items()}
+        self.calls = 0
+
+    @classmethod
+    def from_json(cls, json_file):
+        '''Loads the locations from a json file of {address: [latitude, longitude, display_name]}'''
+        with open(json_file, 'r') as file:
+            return cls(json.load(file))
+
+    def geocode(self, address):
+        from geopy.location import Location
+        self.calls += 1
+        value = self.locations.get(normalize_address(address))
+        if value is None:
+            return None
+        latitude, longitude, display_name = value
+        raw = {'lat': str(latitude), 'lon': str(longitude), 'display_name': display_name}
+        return Location(display_name, (latitude, longitude), raw)
+
+
+class GeocodeStore:
+    '''Persistent geocode cache backed by an sqlite database. Addresses that the geocoder could
+        not resolve are cached too, so they are not looked up again until they expire.
+
+        ttl - seconds after which an entry is looked up again (None keeps entries forever)
+        max_entries - number of entries kept, the least recently used ones are evicted first
+        provider - name under which the enrichment stage rate limits the geocoder, and the
+            registered provider created when no geocoder is given (see providers.py)'''
+
+    def __init__(self, db_name=GEOCODE_DB, geocoder=None, ttl=None, max_entries=None, provider=None):
+        if geocoder is None:
+            provider = provider or providers.DEFAULTS['geocoder']
+            geocoder = providers.create('geocoder', provider)
+        self.geocoder = geocoder
+        # A geocoder given without a provider is rate limited under the lower cased name of its
+        # class, so geopy's Nominatim gets the limit of the 'nominatim' provider
+        self.provider = provider or type(geocoder).__name__.lower()
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.errors = 0
+        self.lock = threading.Lock()
+        self.db_name = db_name
+        self.pid = None
+        self.connect()
+
+    def connect(self):
+        '''Opens the sqlite connection. It is reopened in forked worker processes because
+            sqlite connections must not be shared across a fork'''
+        self.pid = os.getpid()
+        self.con = sqlite3.connect(self.db_name, timeout=30, check_same_thread=False)
+        self.con.execute("""CREATE TABLE IF NOT EXISTS geocodes (
+            address_key TEXT PRIMARY KEY,
+            latitude REAL,
+            longitude REAL,
+            raw TEXT,
+            created_at REAL,
+            last_used REAL
+                )""")
+        self.con.execute("CREATE INDEX IF NOT EXISTS geocodes_last_used ON geocodes (last_used)")
+        self.con.commit()
+
+    def stats(self):
+        '''Returns the hit, miss and geocoder error counters'''
+        return {'hits': self.hits, 'misses': self.misses, 'errors': self.errors}
+
+    def get_location(self, address):
+        '''Returns the location of a single address, or None if it can't be geocoded'''
+        return self.resolve_addresses([address])[address]
+
+    def resolve_addresses(self, addresses):
+        '''Geocodes a batch of addresses. Duplicates are resolved once, cached addresses are read
+            with a single query per chunk and only the misses go to the geocoder, concurrently
+            through the enrichment stage. The lock is not held while the geocoder is waited on.
+            Returns a dict of address -> location (None for unknown addresses or geocoder errors)'''
+        keys = dict()
+        for address in addresses:
+            keys.setdefault(normalize_address(address), address)
+        with self.lock:
+            if self.pid != os.getpid():
+                self.connect()
+            now = time.time()
+            # Every hit is read from sqlite, so the ttl and the least recently used order apply to it
+            found = self._read(list(keys), now)
+            self.hits += len(found)
+            missing = [key for key in keys if key not in found]
+            self.misses += len(missing)
+        stage = get_enrichment_stage()
+        futures = [(key, stage.submit(self.provider, key, self.geocoder.geocode, keys[key])) for key in missing]
+        fetched = dict()
+        errors = 0
+        for key, future in futures:
+            try:
+                fetched[key] = future.result()
+            except Exception:
+                # Network errors are not cached, the address is looked up again next time
+                errors += 1
+        with self.lock:
+            self.errors += errors
+            self._write(fetched, now)
+            found.update(fetched)
+        return {address: found.get(normalize_address(address)) for address in addresses}
+
+    def _read(self, keys, now):
+        '''Reads cached entries that have not expired and marks them as used'''
+        from geopy.location import Location
+        found = dict()
+        for i in range(0, len(keys), QUERY_CHUNK_SIZE):
+            chunk = keys[i:i + QUERY_CHUNK_SIZE]
+            placeholders = ', '.join('?' * len(chunk))
+            rows = self.con.execute(f"""SELECT address_key, latitude, longitude, raw, created_at
+                FROM geocodes WHERE address_key IN ({placeholders})""", chunk).fetchall()
+            for key, latitude, longitude, raw, created_at in rows:
+                if self.ttl is not None and now - created_at > self.ttl:
+                    continue
+                if raw is None:
+                    found[key] = None
+                else:
+                    raw = json.loads(raw)
+                    found[key] = Location(raw.get('display_name', key), (latitude, longitude), raw)
+            if found:
+                self.con.executemany("UPDATE geocodes SET last_used = ? WHERE address_key = ?",
+                                     [(now, key) for key in chunk if key in found])
+        self.con.commit()
+        return found
+
+    def _write(self, locations, now):
+        '''Stores freshly geocoded entries and evicts the least recently used ones over the limit'''
+        if not locations:
+            return
+        rows = list()
+        for key, location in locations.items():
+            if location is None:
+                rows.append((key, None, None, None, now, now))
+            else:
+                rows.append((key, location.latitude, location.longitude, json.dumps(location.raw), now, now))
+        self.con.executemany("INSERT OR REPLACE INTO geocodes VALUES (?, ?, ?, ?, ?, ?)", rows)
+        if self.max_entries is not None:
+            self.con.execute("""DELETE FROM geocodes WHERE address_key IN (
+                SELECT address_key FROM geocodes ORDER BY last_used DESC LIMIT -1 OFFSET ?)""",
+                (self.max_entries,))
+        self.con.commit()
+
+    def close(self):
+        self.con.close()
+
+
+_geocode_store = None
+
+def get_geocode_store():
+    '''Returns the geocode store used by extractdata, creating the default one on first use'''
+    global _geocode_store
+    if _geocode_store is None:
+        _geocode_store = GeocodeStore()
+    return _geocode_store
+
+def set_geocode_store(store):
+    '''Replaces the geocode store used by extractdata, e.g. with one using a LocalGeocoder'''
+    global _geocode_store
+    _geocode_store = store
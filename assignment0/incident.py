@@ -0,0 +1,63 @@
+import sys
+from operator import attrgetter
+
+# Values that repeat across many incidents are interned so every incident shares one string object
+INTERNED_FIELDS = ('incident_location', 'nature', 'incident_ori', 'incident_date', 'side_of_town')
+
+
+class Incident:
+    '''A single incident of a daily summary. The five fields parsed from the pdf are set when it
+        is created and the enrichment fields are filled in place as it moves through the pipeline.
+        __slots__ keeps every incident free of a per-instance dict.'''
+
+    __slots__ = ('incident_time', 'incident_number', 'incident_location', 'nature', 'incident_ori',
+                 'incident_date', 'day_of_week', 'incident_hour', 'side_of_town', 'weather_code',
+                 'location_rank', 'incident_rank', 'emsstat')
+
+    def __init__(self, incident_time, incident_number, incident_location, nature, incident_ori,
+                 incident_date=None, day_of_week=None, incident_hour=None, side_of_town=None,
+                 weather_code=None, location_rank=None, incident_rank=None, emsstat=None):
+        self.incident_time = incident_time
+        self.incident_number = incident_number
+        self.incident_location = intern(incident_location)
+        self.nature = intern(nature)
+        self.incident_ori = intern(incident_ori)
+        self.incident_date = intern(incident_date)
+        self.day_of_week = day_of_week
+        self.incident_hour = incident_hour
+        self.side_of_town = intern(side_of_town)
+        self.weather_code = weather_code
+        self.location_rank = location_rank
+        self.incident_rank = incident_rank
+        self.emsstat = emsstat
+
+    def fields(self):
+        '''Returns the values of all the fields, in the order of __slots__'''
+        return _get_fields(self)
+
+    def record(self):
+        '''Returns the five columns stored by dbmanager.populatedb'''
+        return self.incident_time, self.incident_number, self.incident_location, self.nature, self.incident_ori
+
+    def enriched_record(self):
+        '''Returns all the columns stored by dbmanager.populate_enriched'''
+        return self.fields()
+
+    def __eq__(self, other):
+        if not isinstance(other, Incident):
+            return NotImplemented
+        return self.fields() == other.fields()
+
+    def __reduce__(self):
+        # Rebuilding through __init__ interns the strings again in the receiving process
+        return Incident, self.fields()
+
+    def __repr__(self):
+        return 'Incident(' + ', '.join(f'{field}={getattr(self, field)!r}' for field in self.__slots__) + ')'
+
+
+_get_fields = attrgetter(*Incident.__slots__)
+
+def intern(value):
+    '''Interns strings and leaves any other value (e.g. None) as it is'''
+    return sys.intern(value) if type(value) is str else value
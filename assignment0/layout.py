@@ -0,0 +1,118 @@
+import re
+from bisect import bisect_left, bisect_right
+from collections import Counter
+
+# Columns of the table of a daily summary, in order
+COLUMNS = ('Date / Time', 'Incident Number', 'Location', 'Nature', 'Incident ORI')
+# Points around the start of a column where the text of its cells starts
+COLUMN_TOLERANCE = 2.0
+# Vertical distance between two rows, used when a page has a single row
+ROW_PITCH = 29.0
+
+
+class LayoutParser:
+    '''Parses the incidents of a page from the position of its text instead of its lines.
+
+        The text of the page is collected with its position by a visitor of pypdf's text
+        extraction. The x where each column starts is recovered once per page from the rows
+        whose five cells are on one line, every fragment is given to the column it starts in,
+        and to the row whose date and time cell is nearest vertically (within half the distance
+        between rows). A cell whose text wraps onto several lines is joined back, so every row
+        is split by coordinates without guessing where the location ends and the nature begins.'''
+
+    def __init__(self, columns=COLUMNS, tolerance=COLUMN_TOLERANCE, row_pitch=ROW_PITCH):
+        self.columns = columns
+        self.tolerance = tolerance
+        self.row_pitch = row_pitch
+        self.date_time_re = re.compile(r'(\d{1,2})/(\d{1,2})/(\d{4}) (\d{1,2}:\d{2})$')
+        self.number_re = re.compile(r'\d{4}-\d{8}$')
+
+    def fragments(self, page):
+        '''Returns the text of a page and its (x, y, text) fragments, top to bottom'''
+        fragments = list()
+
+        def visit(text, cm, tm, font_dict, font_size):
+            text = text.strip()
+            if text:
+                # Position of the text in the user space of the page
+                x = cm[0] * tm[4] + cm[2] * tm[5] + cm[4]
+                y = cm[1] * tm[4] + cm[3] * tm[5] + cm[5]
+                fragments.append((x, y, text))
+
+        page_text = page.extract_text(visitor_text=visit)
+        return page_text, fragments
+
+    def column_starts(self, fragments):
+        '''Returns the x where each column starts, from the most common layout of the rows that
+            have one fragment per column, or None when the page has no such row'''
+        lines = dict()
+        for x, y, text in fragments:
+            lines.setdefault(round(y, 1), list()).append((x, text))
+        layouts = Counter()
+        for line in lines.values():
+            if len(line) == len(self.columns):
+                line.sort()
+                if self.date_time_re.match(line[0][1]) and self.number_re.match(line[1][1]):
+                    layouts[tuple(round(x, 1) for x, text in line)] += 1
+        if not layouts:
+            return None
+        return list(layouts.most_common(1)[0][0])
+
+    def rows(self, fragments, starts=None):
+        '''Returns the cells of every row of a page, as lists of the fragments of each column, or
+            None when the columns of the page can't be recovered'''
+        starts = starts or self.column_starts(fragments)
+        if starts is None:
+            return None
+        bounds = [start - self.tolerance for start in starts]
+        # The header of the table is closer to the first row than half the distance between rows
+        header = {y for x, y, text in fragments if text == self.columns[0]}
+        fragments = [fragment for fragment in fragments if fragment[1] not in header]
+        anchors = sorted({y for x, y, text in fragments
+                          if abs(x - starts[0]) <= self.tolerance and self.date_time_re.match(text)})
+        if not anchors:
+            return list()
+        gaps = sorted(upper - lower for lower, upper in zip(anchors, anchors[1:]))
+        half_pitch = (gaps[len(gaps) // 2] if gaps else self.row_pitch) / 2
+        lines = dict()
+        for x, y, text in fragments:
+            lines.setdefault(y, list()).append((x, text))
+        cells = [[list() for _ in starts] for _ in anchors]
+        # Top to bottom, then left to right, so wrapped cells are joined in reading order
+        for y in sorted(lines, reverse=True):
+            index = bisect_left(anchors, y)
+            if index == len(anchors) or (index > 0 and y - anchors[index - 1] < anchors[index] - y):
+                index -= 1
+            if abs(anchors[index] - y) >= half_pitch:
+                continue
+            row = cells[index]
+            for x, text in sorted(lines[y]):
+                column = bisect_right(bounds, x) - 1
+                if column >= 0:
+                    row[column].append(text)
+        # The anchors are sorted bottom up
+        return cells[::-1]
+
+    def parse_row(self, cells):
+        '''Returns (time, number, location, nature, ori, date) of the cells of a row, with the
+            date as YYYY-MM-DD, or None when the row is not an incident'''
+        date_time = self.date_time_re.match(' '.join(cells[0]))
+        number = ' '.join(cells[1])
+        ori = ' '.join(cells[4])
+        if not date_time or not self.number_re.match(number) or not ori:
+            return None
+        month, day, year, incident_time = date_time.groups()
+        return (incident_time, number, ' '.join(cells[2]), ' '.join(cells[3]), ori,
+                f"{year}-{int(month):02d}-{int(day):02d}")
+
+    def parse_page(self, page):
+        '''Returns the text of a page and its parsed rows (see parse_row, None for the rows that
+            are not incidents), or None instead of the rows when its columns can't be recovered'''
+        page_text, fragments = self.fragments(page)
+        rows = self.rows(fragments)
+        if rows is None:
+            return page_text, None
+        return page_text, [self.parse_row(cells) for cells in rows]
+
+
+layout_parser = LayoutParser()
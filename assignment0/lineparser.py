@@ -0,0 +1,244 @@
+import re
+
+# Street suffixes (plus a few Norman specific landmarks) that may terminate the
+# location column of an incident line
+STREET_TYPE_LIST = ['RD/156', 'LAMB TOWING', '201 W GRAY', '1919 W BOYD'
+    , 'BNSF RR', '1100 N PORTER', 'BRIARCLIFF', 'CHESTNUT', 'H4 AL', 'HWY 9',
+    'Allee', 'Alley', 'Ally', 'Aly', 'Anex', 'Annex',
+    'Annx', 'Anx', 'Arc', 'Arcade', 'Av', 'Ave', 'APT',
+    'Aven', 'Avenu', 'Avenue', 'Avn', 'Avnue', 'Base', 'Bayoo',
+    'Bayou', 'Bch', 'Beach', 'Bend', 'Bg', 'Bgs',
+    'Blf', 'Blfs', 'Bluf', 'Bluff', 'Bluffs', 'Blvd',
+    'Bnd', 'Bot', 'Bottm', 'Bottom', 'Boul', 'Boulevard',
+    'Boulv', 'Br', 'Branch', 'Brdge', 'Brg', 'Bridge',
+    'Brk', 'Brks', 'Brnch', 'Broadway', 'Brook', 'Brooks',
+    'Btm', 'Burg', 'Burgs', 'Byp', 'Bypa', 'Bypas',
+    'Bypass', 'Byps', 'Byu', 'Camp', 'Canyn', 'Canyon',
+    'Cape', 'Causeway', 'Causwa', 'Cen', 'Cent', 'Center',
+    'Centers', 'Centr', 'Centre', 'Cir', 'Circ', 'Circl',
+    'Circle', 'Circles', 'Cirs', 'Clb', 'Clf', 'Clfs',
+    'Cliff', 'Cliffs', 'Club', 'Cmn', 'Cmns', 'Cmp',
+    'Cnter', 'Cntr', 'Cnyn', 'Common', 'Commons', 'Cor',
+    'Corner', 'Corners', 'Cors', 'Course', 'Court', 'Courts',
+    'Cove', 'Coves', 'Cp', 'Cpe', 'Crcl', 'Crcle',
+    'Creek', 'Cres', 'Crescent', 'Crest', 'Crk', 'Crossing',
+    'Crossroad', 'Crossroads', 'Crse', 'Crsent', 'Crsnt', 'Crssng',
+    'Crst', 'Cswy', 'Ct', 'Ctr', 'Ctrs', 'Cts',
+    'Curv', 'Curve', 'Cv', 'Cvs', 'Cyn', 'Dale',
+    'Dam', 'Div', 'Divide', 'Dl', 'Dm', 'Dr',
+    'Driv', 'Drive', 'Drives', 'Drs', 'Drv', 'Dv',
+    'Dvd', 'Est', 'Estate', 'Estates', 'Ests', 'Exp',
+    'Expr', 'Express', 'Expressway', 'Expw', 'Expy', 'Ext',
+    'Extension', 'Extensions', 'Extn', 'Extnsn', 'Exts', 'Fall'
+    , 'Ferry', 'Field', 'Fields', 'Flat', 'Flats',
+    'Fld', 'Flds', 'Fls', 'Flt', 'Flts', 'Ford',
+    'Fords', 'Forest', 'Forests', 'Forg', 'Forge', 'Forges',
+    'Fork', 'Forks', 'Fort', 'Frd', 'Frds', 'Freeway',
+    'Freewy', 'Frg', 'Frgs', 'Frk', 'Frks', 'Frry',
+    'Frst', 'Frt', 'Frway', 'Frwy', 'Fry', 'Ft',
+    'Fwy', 'Garden', 'Gardens', 'Gardn', 'Gateway', 'Gatewy',
+    'Gatway', 'Gdn', 'Gdns', 'Glen', 'Glens', 'Gln',
+    'Glns', 'Grden', 'Grdn', 'Grdns', 'Green', 'Greens',
+    'Grn', 'Grns', 'Grov', 'Grove', 'Groves', 'Grv',
+    'Grvs', 'Gtway', 'Gtwy', 'Harb', 'Harbor', 'Harbors',
+    'Harbr', 'Haven', 'Hbr', 'Hbrs', 'Heights', 'Highway',
+    'Highwy', 'Hill', 'Hills', 'Hiway', 'Hiwy', 'Hl',
+    'Hllw', 'Hls', 'Hollow', 'Hollows', 'Holw', 'Holws',
+    'Hrbor', 'Ht', 'Hts', 'Hvn', 'Hway', 'Hwy',
+    'Inlet', 'Inlt', 'Is', 'Island', 'Islands', 'Isle',
+    'Isles', 'Islnd', 'Islnds', 'Iss', 'Jct', 'Jction',
+    'Jctn', 'Jctns', 'Jcts', 'Junction', 'Junctions', 'Junctn',
+    'Juncton', 'Key', 'Keys', 'Knl', 'Knls', 'Knol',
+    'Knoll', 'Knolls', 'Ky', 'Kys', 'Lake', 'Lakes',
+    'Land', 'Landing', 'Lane', 'Lck', 'Lcks', 'Ldg',
+    'Ldge', 'Lf', 'Lgt', 'Lgts', 'Light', 'Lights',
+    'Lk', 'Lks', 'Ln', 'Lndg', 'Lndng', 'Loaf',
+    'Lock', 'Locks', 'Lodg', 'Lodge', 'Loop', 'Loops',
+    'Lp', 'Mall', 'Manor', 'Manors', 'Mdw', 'Mdws',
+    'Meadow', 'Meadows', 'Medows', 'Mews', 'Mill', 'Mills',
+    'Mission', 'Missn', 'Ml', 'Mls', 'Mnr', 'Mnrs',
+    'Mnt', 'Mntain', 'Mntn', 'Mntns', 'Motorway', 'Mount',
+    'Mountain', 'Mountains', 'Mountin', 'Msn', 'Mssn', 'Mt',
+    'Mtin', 'Mtn', 'Mtns', 'Mtwy', 'Nck','Ne' , 'Neck', 'Nw','Norman', 'OK-9', 'OK', ','
+    'Opas', 'Orch', 'Orchard', 'Orchrd', 'Oval', 'Overpass',
+    'Ovl', 'Park', 'Parks', 'Parkway', 'Parkways', 'Parkwy',
+    'Pass', 'Passage', 'Path', 'Paths', 'Pike', 'Pikes',
+    'Pine', 'Pines', 'Pkway', 'Pkwy', 'Pkwys', 'Pky',
+    'Pl', 'Place', 'Plain', 'Plains', 'Plaza', 'Pln',
+    'Plns', 'Plz', 'Plza', 'Pne', 'Pnes', 'Point',
+    'Points', 'Port', 'Ports', 'Pr', 'Prairie', 'Prk',
+    'Prr', 'Prt', 'Prts', 'Psge', 'Pt', 'Pts',
+    'Rad', 'Radial', 'Radiel', 'Radl', 'Ramp', 'Ranch',
+    'Ranches', 'Rapid', 'Rapids', 'Rd', 'Rdg', 'Rdge',
+    'Rdgs', 'Rds', 'Rest', 'Ridge', 'Ridges', 'Riv',
+    'River', 'Rivr', 'Rnch', 'Rnchs', 'Road', 'Roads',
+    'Route', 'Row', 'Rpd', 'Rpds', 'Rst', 'Rte',
+    'Rue', 'Run', 'Rvr','Se' , 'Shl', 'Shls', 'Shoal',
+    'Shoals', 'Shoar', 'Shoars', 'Shore', 'Shores', 'Shr',
+    'Shrs', 'Skwy', 'Skyway', 'Smt', 'Spg', 'Spgs',
+    'Spng', 'Spngs', 'Spring', 'Springs', 'Sprng', 'Sprngs',
+    'Spur', 'Spurs', 'Sq', 'Sqr', 'Sqre', 'Sqrs',
+    'Sqs', 'Squ', 'Square', 'Squares', 'St', 'Sta',
+    'Station', 'Statn', 'Stn', 'Str', 'Stra', 'Strav',
+    'Straven', 'Stravenue', 'Stravn', 'Stream', 'Street', 'Streets',
+    'Streme', 'Strm', 'Strt', 'Strvn', 'Strvnue', 'Sts',
+    'Sumit', 'Sumitt', 'Summit', 'Sw', 'Ter', 'Terr', 'Terrace',
+    'Throughway', 'Tpke', 'Trace', 'Traces', 'Track', 'Tracks',
+    'Trafficway', 'Trail', 'Trailer', 'Trails', 'Trak', 'Trce',
+    'Trfy', 'Trk', 'Trks', 'Trl', 'Trlr', 'Trlrs',
+    'Trls', 'Trnpk', 'Trwy', 'Tunel', 'Tunl', 'Tunls',
+    'Tunnel', 'Tunnels', 'Tunnl', 'Turnpike', 'Turnpk', 'Un',
+    'Underpass', 'Union', 'Unions', 'Uns', 'Upas', 'Valley',
+    'Valleys', 'Vally', 'Vdct', 'Via', 'Viadct', 'Viaduct',
+    'View', 'Views', 'Vill', 'Villag', 'Village', 'Villages',
+    'Ville', 'Villg', 'Villiage', 'Vis', 'Vist', 'Vista',
+    'Vl', 'Vlg', 'Vlgs', 'Vlly', 'Vly', 'Vlys',
+    'Vst', 'Vsta', 'Vw', 'Vws', 'Walk', 'Walks',
+    'Wall', 'Way', 'Ways', 'Well', 'Wells', 'Wl',
+    'Wls', 'Wy', 'Xing', 'Xrd', 'Xrds', 'NPD RANGE', 'PD', 'I', 'UNKNOWN', 'O-358']
+
+STANDARD_ORIS = ['OK0140200', 'EMSSTAT', '14005', '14009']
+
+
+class StreetTypeMatcher:
+    '''Finds the street types of a line with a trie of the lower cased street types, built once.
+
+        It yields exactly the matches of re.finditer with the case insensitive alternation of
+        the street types between word boundaries: matches do not overlap, are found left to
+        right, and at each position the street type listed first wins. Every position is
+        walked down the trie for at most the length of the longest street type, so the cost is
+        linear in the length of the line instead of proportional to the number of street types.
+        Lines with non ascii characters (whose case folding is not a simple lower()) go
+        through the regular expression.'''
+
+    def __init__(self, street_types=STREET_TYPE_LIST):
+        self.root = dict()
+        for priority, street_type in enumerate(street_types):
+            node = self.root
+            for char in street_type.lower():
+                node = node.setdefault(char, dict())
+            # The None key holds the position in the list of the first street type ending here
+            node.setdefault(None, priority)
+        street_type_pattern = r'\b(?:' + '|'.join(map(re.escape, street_types)) + r')\b'
+        self.street_type_re = re.compile(rf'({street_type_pattern})', flags=re.IGNORECASE)
+        self.boundary_re = re.compile(r'\b')
+
+    def finditer(self, text):
+        '''Yields the (start, end) of every street type in text'''
+        if not text.isascii():
+            for match in self.street_type_re.finditer(text):
+                yield match.span()
+            return
+        lower_text = text.lower()
+        boundaries = [match.start() for match in self.boundary_re.finditer(text)]
+        is_boundary = set(boundaries)
+        root = self.root
+        end = 0
+        for start in boundaries:
+            if start < end:
+                continue
+            node = root
+            best_priority, best_end = None, None
+            for index in range(start, len(text)):
+                node = node.get(lower_text[index])
+                if node is None:
+                    break
+                priority = node.get(None)
+                if priority is not None and index + 1 in is_boundary and (best_priority is None or priority < best_priority):
+                    best_priority, best_end = priority, index + 1
+            if best_end is not None:
+                end = best_end
+                yield start, end
+
+    def last_upper(self, text):
+        '''Returns whether text has any street type, and the end of the last one written in
+            upper case (or None)'''
+        found_any = False
+        last_end = None
+        for start, end in self.finditer(text):
+            found_any = True
+            if text[start:end].isupper():
+                last_end = end
+        return found_any, last_end
+
+
+class LineParser:
+    '''Parses the fields of a raw incident line with patterns that are compiled only once'''
+
+    def __init__(self, street_types=STREET_TYPE_LIST, oris=STANDARD_ORIS):
+        self.oris = list(oris)
+        self.street_types = StreetTypeMatcher(street_types)
+        self.head_re = re.compile(r'\d{1,2}/\d{1,2}/\d{4} (\d{1,2}:\d{2}) (\d{4}-\d{8})\s')
+        self.time_re = re.compile(r'\b(\d{1,2}:\d{2})\b')
+        self.number_re = re.compile(r'(\d{4}-\d{8}\s)')
+        self.start_re = re.compile(r'\d{4}-\d{8}')
+        self.special_re = re.compile(r'<[^>]+>')
+        self.lat_lon_re = re.compile(r'([-+]?\d*\.?\d+);([-+]?\d*\.?\d+)')
+        self.ori_re = re.compile(r'(\w+)$')
+
+    def parse_time(self, line):
+        '''Returns the time of the incident or None'''
+        match = self.time_re.search(line)
+        return match.group(1) if match else None
+
+    def parse_number(self, line):
+        '''Returns the incident number or None'''
+        match = self.number_re.search(line)
+        return match.group(1).strip(' ') if match else None
+
+    def parse_address(self, line, start_index=None):
+        '''Returns the location of the incident and the index where it ends. start_index is the
+            end of the incident number when the caller already knows it'''
+        if start_index is None:
+            start_match = self.start_re.search(line)
+            if not start_match:
+                return '', -1
+            start_index = start_match.end()
+        tail = line[start_index:]
+        special_match = self.special_re.search(tail)
+        if special_match:
+            return special_match.group(), start_index + special_match.end()
+        # The last uppercase street type is the one ending furthest right
+        found_any, last_end = self.street_types.last_upper(tail)
+        if last_end is not None:
+            return tail[:last_end].strip(), start_index + last_end - 1
+        if found_any:
+            return '', start_index
+        lat_lon_match = self.lat_lon_re.search(tail)
+        if lat_lon_match:
+            return lat_lon_match.group(), start_index + lat_lon_match.end()
+        return '', start_index
+
+    def parse_nature_and_ori(self, line, start_index):
+        '''Returns the nature of the incident and its ori number, or (None, None)'''
+        if not self.ori_re.search(line):
+            return None, None
+        for ori in self.oris:
+            end_index = line.find(ori)
+            if end_index != -1:
+                return line[start_index+1:end_index].strip(' '), ori
+        return None, None
+
+    def parse(self, line):
+        '''Parses a raw incident line in one pass and returns a tuple of
+            (time, number, address, nature, ori), or None when the line is not an incident'''
+        head_match = self.head_re.match(line)
+        if head_match:
+            incident_time, incident_number = head_match.group(1), head_match.group(2)
+            start_index = head_match.end(2)
+        else:
+            incident_time = self.parse_time(line)
+            if not incident_time:
+                return None
+            incident_number = self.parse_number(line)
+            if not incident_number:
+                return None
+            start_index = None
+        incident_address, last_index = self.parse_address(line, start_index)
+        incident_nature, incident_ori = self.parse_nature_and_ori(line, last_index)
+        if not incident_ori or incident_nature is None:
+            return None
+        return incident_time, incident_number, incident_address, incident_nature, incident_ori
+
+
+line_parser = LineParser()
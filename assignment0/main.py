@@ -1,27 +1,47 @@
 import argparse
+import os
+from functools import partial
 from .fetchincidents import fetchincidents
-from .extractdata import extractdata
+from .parsecache import cached_extractdata, extract_incidents
+from .extractdata import MODES, PARALLEL_MIN_PAGES
+from .profiling import get_profiler
 from .dbmanager import createdb, populatedb, status
 import sys
 # from assignment0 import fetchincidents
 # from . import fetchincidents
-PDF_PATH = 'resources/incident_data.pdf'
+PDF_ARCHIVE_PATH = 'resources/pdfs/'
 DB_NAME = 'normanpd.db'
 DB_PATH = 'resources/'
-def main(url):
+
+def archive_pdf(url, incident_data):
+    '''Saves the downloaded pdf of a url in the archive directory and returns its path'''
+    os.makedirs(PDF_ARCHIVE_PATH, exist_ok=True)
+    pdf_path = os.path.join(PDF_ARCHIVE_PATH, os.path.basename(url.rstrip('/')) or 'incident_data.pdf')
+    with open(pdf_path, 'wb') as file:
+        file.write(incident_data)
+    return pdf_path
+
+def main(url, keep_pdf=False, mode='full', page_processes=1):
     """Function Downloads data, extracts incidents data, saves the data in a database 
-        and prints the status of the incidents"""
+        and prints the status of the incidents. mode is how far the incidents are enriched
+        (extractdata.MODES): 'parse' makes no network call besides the download.
+        page_processes decodes the pages of a large pdf in a pool of that many processes (None
+        for one per cpu), smaller pdfs are still decoded serially (see extractdata.iter_incidents)"""
+
+    profiler = get_profiler()
 
     # # Download data
-    incident_data = fetchincidents(url)
-    # print("WRITING DATA")
-    with open(PDF_PATH,'wb') as file:
-        file.write(incident_data)
-    # print("Data Fetched and Downloaded!")
+    with profiler.stage('download'):
+        incident_data = fetchincidents(url)
+    if keep_pdf:
+        archive_pdf(url, incident_data)
 
-    # # Extract data
-    # all_incidents = extractdata(incident_data)
-    all_incidents = extractdata(PDF_PATH)
+    # # Extract data straight from the downloaded bytes, unless the pdf was parsed before
+    # The incidents are collected rather than streamed: the parse cache stores the list and the
+    # ranks of every row printed by assignment2.py depend on all the incidents of the pdf
+    with profiler.stage('extract'):
+        all_incidents = cached_extractdata(incident_data, partial(extract_incidents, mode=mode, processes=page_processes),
+                                           mode)
     # print(all_incidents)
 	
     # # Create new database
@@ -42,7 +62,14 @@ if __name__ == '__main__':
     parser = argparse.ArgumentParser()
     parser.add_argument("--incidents", type=str, required=True, 
                          help="Incident summary url.")
+    parser.add_argument("--keep-pdf", action="store_true",
+                        help="Also save the downloaded pdf in " + PDF_ARCHIVE_PATH)
+    parser.add_argument("--mode", choices=MODES, default='full',
+                        help="Only parse the incidents, or also geocode them, or also add the weather (full)")
+    parser.add_argument("--page-processes", type=int, default=1,
+                        help="Decode the pages of a pdf of %d pages or more in a pool of this many processes "
+                        "(0 for one per cpu), smaller pdfs are decoded serially" % PARALLEL_MIN_PAGES)
      
     args = parser.parse_args()
     if args.incidents:
-        main(args.incidents)
\ No newline at end of file
+        main(args.incidents, args.keep_pdf, args.mode, args.page_processes or None)
\ No newline at end of file
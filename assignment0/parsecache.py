@@ -0,0 +1,166 @@
+import hashlib
+import os
+import pickle
+import sqlite3
+import threading
+import time
+import zlib
+from functools import partial
+from .extractdata import extractdata, PARSER_VERSION
+from .geocache import get_geocode_store
+from .incident import Incident
+from .spatial import get_spatial_index
+from .weather import get_weather_service
+
+PARSE_CACHE_DB = '.parsecache.sqlite'
+# Total size of the compressed entries kept, the least recently used ones are evicted beyond it
+MAX_BYTES = 256 * 2**20
+CHUNK_SIZE = 64 * 1024
+
+
+def pdf_digest(pdf_file):
+    '''Returns the sha256 digest of a pdf file path, binary stream or the raw bytes of a pdf'''
+    digest = hashlib.sha256()
+    if isinstance(pdf_file, (bytes, bytearray, memoryview)):
+        digest.update(pdf_file)
+    elif isinstance(pdf_file, (str, os.PathLike)):
+        with open(pdf_file, 'rb') as file:
+            for chunk in iter(lambda: file.read(CHUNK_SIZE), b''):
+                digest.update(chunk)
+    else:
+        position = pdf_file.tell()
+        for chunk in iter(lambda: pdf_file.read(CHUNK_SIZE), b''):
+            digest.update(chunk)
+        pdf_file.seek(position)
+    return digest.hexdigest()
+
+
+def lookup_errors():
+    '''Returns the number of geocoder and weather lookups that failed so far in this process'''
+    return get_geocode_store().errors + get_weather_service().errors
+
+
+def extract_incidents(pdf_file, mode='full', processes=1):
+    '''Runs extractdata on a pdf. Returns its incidents and whether every geocoder and weather
+        lookup succeeded, since the incidents of a failed lookup must not be cached'''
+    if mode == 'parse':
+        # No lookup is made, and the geocode store and weather service are not even created
+        return extractdata(pdf_file, mode, processes), True
+    errors = lookup_errors()
+    all_incidents = extractdata(pdf_file, mode, processes)
+    return all_incidents, lookup_errors() == errors
+
+
+class ParseCache:
+    '''Cache of the incidents extracted from each pdf, stored in an sqlite database and keyed
+        by the sha256 of the pdf, the PARSER_VERSION of extractdata and the mode (see
+        extractdata.MODES) the incidents were extracted in. Entries are compressed
+        pickles of the fields of the incidents.
+
+        max_bytes - total size of the entries kept, the least recently used ones are evicted first
+        read - look entries up (False re-extracts every pdf, e.g. to rebuild the cache)
+        write - store the incidents of the pdfs that were extracted'''
+
+    def __init__(self, db_name=PARSE_CACHE_DB, max_bytes=MAX_BYTES, read=True, write=True):
+        self.db_name = db_name
+        self.max_bytes = max_bytes
+        self.read = read
+        self.write = write
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+        self.con = None
+        if read or write:
+            self.connect()
+
+    def connect(self):
+        self.pid = os.getpid()
+        self.con = sqlite3.connect(self.db_name, timeout=30, check_same_thread=False)
+        self.con.execute("""CREATE TABLE IF NOT EXISTS parsed (
+            key TEXT PRIMARY KEY,
+            incidents BLOB,
+            size INTEGER,
+            created_at REAL,
+            last_used REAL
+                )""")
+        self.con.execute("CREATE INDEX IF NOT EXISTS parsed_last_used ON parsed (last_used)")
+        self.con.commit()
+
+    def stats(self):
+        '''Returns the hit and miss counters'''
+        return {'hits': self.hits, 'misses': self.misses}
+
+    def get(self, digest, mode='full'):
+        '''Returns the cached incidents of a pdf digest extracted in mode, or None'''
+        if not self.read:
+            return None
+        key = f'{digest}:{PARSER_VERSION}:{mode}'
+        with self.lock:
+            if self.pid != os.getpid():
+                self.connect()
+            row = self.con.execute("SELECT incidents FROM parsed WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            with self.con:
+                self.con.execute("UPDATE parsed SET last_used = ? WHERE key = ?", (time.time(), key))
+        return [Incident(*fields) for fields in pickle.loads(zlib.decompress(row[0]))]
+
+    def put(self, digest, all_incidents, mode='full'):
+        '''Stores the incidents of a pdf digest extracted in mode and evicts the least recently used entries over max_bytes'''
+        if not self.write:
+            return
+        data = zlib.compress(pickle.dumps([incident.fields() for incident in all_incidents],
+                                          protocol=pickle.HIGHEST_PROTOCOL))
+        now = time.time()
+        with self.lock:
+            if self.pid != os.getpid():
+                self.connect()
+            with self.con:
+                self.con.execute("INSERT OR REPLACE INTO parsed VALUES (?, ?, ?, ?, ?)",
+                                 (f'{digest}:{PARSER_VERSION}:{mode}', data, len(data), now, now))
+                if self.max_bytes is not None:
+                    self.con.execute("""DELETE FROM parsed WHERE key IN (
+                        SELECT key FROM (SELECT key, SUM(size) OVER (ORDER BY last_used DESC, key) AS total
+                                         FROM parsed) WHERE total > ?)""", (self.max_bytes,))
+
+    def close(self):
+        if self.con is not None:
+            self.con.close()
+
+
+def cached_extractdata(pdf_file, extract=None, mode='full'):
+    '''Returns the incidents of a pdf extracted in mode from the parse cache, extracting (and
+        caching) them on a miss. extract is called with the pdf and returns its incidents, extracted
+        in mode, and whether they may be cached (extract_incidents by default)'''
+    if extract is None:
+        extract = partial(extract_incidents, mode=mode)
+    cache = get_parse_cache()
+    if not (cache.read or cache.write):
+        return extract(pdf_file)[0]
+    digest = pdf_digest(pdf_file)
+    # The sides of town depend on the polygons of the spatial index, if it has any
+    spatial_key = get_spatial_index().cache_key() if mode != 'parse' else ''
+    cache_mode = f'{mode}:{spatial_key}' if spatial_key else mode
+    all_incidents = cache.get(digest, cache_mode)
+    if all_incidents is None:
+        all_incidents, complete = extract(pdf_file)
+        if complete:
+            cache.put(digest, all_incidents, cache_mode)
+    return all_incidents
+
+
+_parse_cache = None
+
+def get_parse_cache():
+    '''Returns the parse cache used by main, creating the default one on first use'''
+    global _parse_cache
+    if _parse_cache is None:
+        _parse_cache = ParseCache()
+    return _parse_cache
+
+def set_parse_cache(cache):
+    '''Replaces the parse cache used by main, e.g. with one that is rebuilt or disabled'''
+    global _parse_cache
+    _parse_cache = cache
@@ -0,0 +1,116 @@
+import cProfile
+import os
+import threading
+import time
+from collections import Counter, defaultdict
+
+
+class Stage:
+    '''Context manager adding the time spent in a block to a stage of a profiler'''
+    __slots__ = ('profiler', 'name', 'start')
+
+    def __init__(self, profiler, name):
+        self.profiler = profiler
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.profiler.add_time(self.name, time.perf_counter() - self.start)
+        return False
+
+
+class NullStage:
+    '''Context manager that does nothing, used while profiling is disabled'''
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+NULL_STAGE = NullStage()
+
+
+class Profiler:
+    '''Timers of the stages of a run (download, extract_text, parse_lines, geocode, weather,
+        augment, ...) and counters (pages, lines, skipped lines by reason, ...).
+
+        Stages may be nested and may run in several threads at once, so their times add up to
+        more than the wall time. While the profiler is disabled stage() returns a shared no-op
+        context manager and count() returns at once. With cprofile_dir, profile_url() also
+        dumps a cProfile of the processing of every url in that directory.'''
+
+    def __init__(self, enabled=False, cprofile_dir=None):
+        self.enabled = enabled
+        self.cprofile_dir = cprofile_dir
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        '''Clears all the timers and counters'''
+        self.seconds = defaultdict(float)
+        self.calls = Counter()
+        self.counters = Counter()
+
+    def stage(self, name):
+        '''Returns a context manager that times a block as the stage name'''
+        if not self.enabled:
+            return NULL_STAGE
+        return Stage(self, name)
+
+    def add_time(self, name, seconds):
+        with self.lock:
+            self.seconds[name] += seconds
+            self.calls[name] += 1
+
+    def count(self, name, value=1):
+        '''Adds value to the counter name'''
+        if not self.enabled:
+            return
+        with self.lock:
+            self.counters[name] += value
+
+    def snapshot(self):
+        '''Returns the timers and counters as a json serializable dict'''
+        with self.lock:
+            stages = {name: {'seconds': round(seconds, 6), 'calls': self.calls[name]}
+                      for name, seconds in sorted(self.seconds.items())}
+            return {'stages': stages, 'counters': dict(sorted(self.counters.items()))}
+
+    def merge(self, snapshot):
+        '''Adds the timers and counters of a snapshot, e.g. one taken in a worker process'''
+        with self.lock:
+            for name, stage in snapshot['stages'].items():
+                self.seconds[name] += stage['seconds']
+                self.calls[name] += stage['calls']
+            self.counters.update(snapshot['counters'])
+
+    def profile_url(self, url, function, *args):
+        '''Returns function(*args). With cprofile_dir the call runs under cProfile and its stats
+            are dumped in cprofile_dir, in a file named after the url'''
+        if not self.cprofile_dir:
+            return function(*args)
+        profile = cProfile.Profile()
+        try:
+            return profile.runcall(function, *args)
+        finally:
+            os.makedirs(self.cprofile_dir, exist_ok=True)
+            name = os.path.basename(url.rstrip('/')) or 'incident_data'
+            profile.dump_stats(os.path.join(self.cprofile_dir, f'{os.path.splitext(name)[0]}.{os.getpid()}.prof'))
+
+
+_profiler = Profiler()
+
+def get_profiler():
+    '''Returns the profiler of the run, disabled unless set_profiler() enabled one'''
+    return _profiler
+
+def set_profiler(profiler):
+    '''Replaces the profiler of the run, e.g. with an enabled one for --profile'''
+    global _profiler
+    _profiler = profiler
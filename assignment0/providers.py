@@ -0,0 +1,56 @@
+'''Registry of the geocoder and weather providers used to enrich the incidents.
+
+Every provider is registered under a kind ('geocoder' or 'weather') and a name, with a factory
+that imports its client library only when the provider is created, so importing the package
+never pays for geopy, requests or the Open-Meteo client.
+'''
+
+# Provider created when none is named
+DEFAULTS = {'geocoder': 'nominatim', 'weather': 'open-meteo'}
+
+_factories = {'geocoder': dict(), 'weather': dict()}
+
+
+def register(kind, name, factory):
+    '''Registers factory(**options) as the provider name of a kind'''
+    if kind not in _factories:
+        raise ValueError(f"Unknown provider kind {kind!r}, expected one of {sorted(_factories)}")
+    _factories[kind][name] = factory
+
+
+def names(kind):
+    '''Returns the names of the registered providers of a kind'''
+    return sorted(_factories[kind])
+
+
+def create(kind, name=None, **options):
+    '''Creates the provider name of a kind (the default one if name is None)'''
+    name = name or DEFAULTS[kind]
+    try:
+        factory = _factories[kind][name]
+    except KeyError:
+        raise ValueError(f"Unknown {kind} provider {name!r}, expected one of {names(kind)}") from None
+    return factory(**options)
+
+
+def _nominatim(user_agent="geoapimanoj", **options):
+    from geopy.geocoders import Nominatim
+    return Nominatim(user_agent=user_agent, **options)
+
+def _local_geocoder(locations=None, json_file=None):
+    from .geocache import LocalGeocoder
+    return LocalGeocoder.from_json(json_file) if json_file else LocalGeocoder(locations)
+
+def _openmeteo(**options):
+    from .weather import create_openmeteo_client
+    return create_openmeteo_client(**options)
+
+def _local_weather():
+    from .weather import LocalWeatherClient
+    return LocalWeatherClient()
+
+
+register('geocoder', 'nominatim', _nominatim)
+register('geocoder', 'local', _local_geocoder)
+register('weather', 'open-meteo', _openmeteo)
+register('weather', 'local', _local_weather)
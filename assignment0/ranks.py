@@ -0,0 +1,106 @@
+from collections import Counter, defaultdict
+from datetime import date, timedelta
+
+DEFAULT_RANK = 1000
+
+
+def cumulative_ranks(counts):
+    '''Ranks keys by descending count (ties broken by key). The rank of a key is one plus the
+        counts of all the keys before it, e.g. counts {a: 2, b: 2, c: 1} give ranks {a: 1, b: 3, c: 5}.
+        None (a field that was not enriched) comes after the other keys of the same count'''
+    sorted_counts = sorted(counts.items(), key=lambda x: (-x[1], x[0] is None, x[0]))
+    cumulative_rank = 1
+    ranks = {}
+    for key, count in sorted_counts:
+        ranks[key] = cumulative_rank
+        cumulative_rank += count
+    return ranks
+
+
+def apply_delta(counts, delta):
+    '''Adds count differences in place, dropping the keys that fall to zero'''
+    for key, difference in delta.items():
+        counts[key] += difference
+        if counts[key] <= 0:
+            del counts[key]
+
+
+def shift_day(day, days):
+    '''Adds a number of days to a 'YYYY-MM-DD' string'''
+    return (date.fromisoformat(day) + timedelta(days=days)).isoformat()
+
+
+class RankEngine:
+    '''Running counts of one incident field (e.g. the location), kept per day so ranks can be
+        reported over all the ingested days or over a rolling window of days.
+
+        Adding a day costs time proportional to the incidents of that day. Window counts are
+        maintained incrementally while the window moves forward, so a backfill never rescans
+        the history. With a database connection the daily counts are persisted in the
+        rank_counts table and loaded back when the engine is created.'''
+
+    def __init__(self, kind, con=None):
+        self.kind = kind
+        self.con = con
+        self.daily = defaultdict(Counter)
+        self.totals = Counter()
+        self.windows = dict()
+        if con is not None:
+            con.execute("""CREATE TABLE IF NOT EXISTS rank_counts (
+                kind TEXT,
+                key, -- no type affinity, so integer keys (weather codes) stay integers
+                incident_date TEXT,
+                count INTEGER,
+                PRIMARY KEY (kind, key, incident_date)
+                    )""")
+            con.commit()
+            for key, day, count in con.execute(
+                    "SELECT key, incident_date, count FROM rank_counts WHERE kind = ?", (kind,)):
+                self.daily[day][key] = count
+                self.totals[key] += count
+
+    def update(self, day, keys):
+        '''Sets the counts of a day ('YYYY-MM-DD') from the keys of all its incidents. A day that
+            was already added is replaced, so re-ingesting a day does not count it twice'''
+        new_counts = Counter(keys)
+        old_counts = self.daily.get(day, Counter())
+        delta = Counter(new_counts)
+        delta.subtract(old_counts)
+        apply_delta(self.totals, delta)
+        for window, (end_day, counts) in self.windows.items():
+            if shift_day(end_day, -window) < day <= end_day:
+                apply_delta(counts, delta)
+        self.daily[day] = new_counts
+        if self.con is not None:
+            with self.con:
+                self.con.execute("DELETE FROM rank_counts WHERE kind = ? AND incident_date = ?", (self.kind, day))
+                self.con.executemany("INSERT INTO rank_counts VALUES (?, ?, ?, ?)",
+                                     [(self.kind, key, day, count) for key, count in new_counts.items()])
+
+    def counts(self, window=None, end_day=None):
+        '''Returns the counts over all days, or over the window days ending at end_day'''
+        if window is None:
+            return self.totals
+        if end_day is None:
+            end_day = max(self.daily, default=date.today().isoformat())
+        cached = self.windows.get(window)
+        if cached is not None and cached[0] <= end_day < shift_day(cached[0], window):
+            # Slide the cached window forward one day at a time
+            previous_end, counts = cached
+            counts = Counter(counts)
+            day = previous_end
+            while day < end_day:
+                day = shift_day(day, 1)
+                delta = Counter(self.daily.get(day, Counter()))
+                delta.subtract(self.daily.get(shift_day(day, -window), Counter()))
+                apply_delta(counts, delta)
+        else:
+            counts = Counter()
+            for offset in range(window):
+                counts.update(self.daily.get(shift_day(end_day, -offset), Counter()))
+        self.windows[window] = (end_day, counts)
+        return counts
+
+    def ranks(self, window=None, end_day=None):
+        '''Returns the cumulative rank of every key over all days or over a window of days'''
+        return cumulative_ranks(self.counts(window, end_day))
@@ -0,0 +1,187 @@
+'''Output sinks of the augmented incidents printed or saved by assignment2.py.
+
+Every sink writes a batch of incidents (or an augmented DataFrame) at a time, so the rows of a
+url are written as soon as it is processed and never kept after. The text formats write each
+batch with a single call through a large buffer instead of a write per row. The columnar formats
+(Parquet and Feather) need pyarrow, which is imported when such a sink is created.
+'''
+import csv
+import io
+import json
+import sys
+from operator import attrgetter
+
+# Bytes buffered by the files written by the sinks
+OUTPUT_BUFFER = 1 << 20
+# Arrow type of the fields written by the columnar sinks, the other fields are strings
+FIELD_TYPES = {'day_of_week': 'int64', 'incident_hour': 'int64', 'weather_code': 'int64', 'location_rank': 'int64',
+               'incident_rank': 'int64', 'emsstat': 'bool'}
+
+
+def frame_lines(frame, fields, separator="\t"):
+    '''Formats the fields of a DataFrame as separated lines. Each distinct value of a column is
+        converted to a string once'''
+    import numpy as np
+    import pandas as pd
+    columns = list()
+    for field in fields:
+        codes, uniques = pd.factorize(frame[field], use_na_sentinel=False)
+        # None is kept as a value of its own, factorize returns it as NaN
+        strings = np.array([str(None if pd.isna(value) else value) for value in uniques], dtype=object)
+        columns.append(strings[codes].tolist())
+    return list(map(separator.join, zip(*columns)))
+
+
+class OutputSink:
+    '''Writes batches of incidents, as the columns named by fields, to a file (path) or stdout.
+        Subclasses implement write_columns(); write_incidents() and write_frame() read the
+        columns from Incident records or from an augmented DataFrame'''
+    binary = False
+
+    def __init__(self, fields, path=None):
+        self.fields = list(fields)
+        self.path = path
+        self.rows = 0
+        if path is None:
+            self.file = None
+        elif self.binary:
+            self.file = open(path, 'wb', buffering=OUTPUT_BUFFER)
+        else:
+            self.file = open(path, 'w', newline='', buffering=OUTPUT_BUFFER)
+
+    @property
+    def stream(self):
+        # Resolved on every write so that a replaced sys.stdout (tests, redirections) is used
+        return self.file if self.file is not None else sys.stdout
+
+    def write_incidents(self, all_incidents):
+        self.write_columns({field: list(map(attrgetter(field), all_incidents)) for field in self.fields})
+
+    def write_frame(self, frame):
+        self.write_columns({field: frame[field].tolist() for field in self.fields})
+
+    def write_columns(self, columns):
+        raise NotImplementedError
+
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+        else:
+            sys.stdout.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class TsvSink(OutputSink):
+    '''Tab separated rows without a header, the output printed by process_urls'''
+
+    def write_columns(self, columns):
+        # Each distinct value of a column is converted to a string once (a column holds values of
+        # one type and None, so equal values have the same string)
+        strings = list()
+        for field in self.fields:
+            column = columns[field]
+            cache = {value: str(value) for value in set(column)}
+            strings.append(list(map(cache.__getitem__, column)))
+        self.write_lines(list(map("\t".join, zip(*strings))))
+
+    def write_frame(self, frame):
+        self.write_lines(frame_lines(frame, self.fields))
+
+    def write_lines(self, lines):
+        if lines:
+            self.stream.write("\n".join(lines) + "\n")
+            self.rows += len(lines)
+
+
+class CsvSink(OutputSink):
+    '''Comma separated rows after a header row, None is written as an empty field'''
+
+    def __init__(self, fields, path=None):
+        super().__init__(fields, path)
+        self.header_written = False
+
+    def write_columns(self, columns):
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        # The first batches may be empty, the header is only written once
+        if not self.header_written:
+            writer.writerow(self.fields)
+            self.header_written = True
+        rows = list(zip(*(columns[field] for field in self.fields)))
+        writer.writerows(rows)
+        self.stream.write(buffer.getvalue())
+        self.rows += len(rows)
+
+
+class JsonLinesSink(OutputSink):
+    '''One json object per row, with typed values'''
+
+    def write_columns(self, columns):
+        rows = [json.dumps(dict(zip(self.fields, row))) for row in zip(*(columns[field] for field in self.fields))]
+        if rows:
+            self.stream.write("\n".join(rows) + "\n")
+            self.rows += len(rows)
+
+
+class ArrowSink(OutputSink):
+    '''Base of the columnar sinks: every batch is converted to an Arrow table with a fixed schema
+        and appended to the file by the writer of the format'''
+    binary = True
+
+    def __init__(self, fields, path=None):
+        if path is None:
+            raise ValueError(f"The {self.format} output needs a file path")
+        try:
+            import pyarrow as pa
+        except ImportError:
+            raise ImportError(f"The {self.format} output needs pyarrow (pip install pyarrow)") from None
+        super().__init__(fields, path)
+        self.schema = pa.schema([(field, pa.type_for_alias(FIELD_TYPES.get(field, 'string'))) for field in self.fields])
+        self.writer = self.open_writer()
+
+    def write_columns(self, columns):
+        import pyarrow as pa
+        table = pa.Table.from_pydict({field: columns[field] for field in self.fields}, schema=self.schema)
+        if table.num_rows:
+            self.writer.write_table(table)
+            self.rows += table.num_rows
+
+    def close(self):
+        self.writer.close()
+        super().close()
+
+
+class ParquetSink(ArrowSink):
+    '''Parquet file with one row group per batch'''
+    format = 'parquet'
+
+    def open_writer(self):
+        import pyarrow.parquet as pq
+        return pq.ParquetWriter(self.file, self.schema)
+
+
+class FeatherSink(ArrowSink):
+    '''Feather (Arrow IPC) file with one record batch per batch'''
+    format = 'feather'
+
+    def open_writer(self):
+        import pyarrow as pa
+        return pa.ipc.new_file(self.file, self.schema)
+
+
+# Sink of every --output-format
+FORMATS = {'tsv': TsvSink, 'csv': CsvSink, 'jsonl': JsonLinesSink, 'parquet': ParquetSink, 'feather': FeatherSink}
+
+
+def create_sink(output_format, fields, path=None):
+    '''Creates the sink of an output format writing fields to path (stdout if None)'''
+    try:
+        sink = FORMATS[output_format]
+    except KeyError:
+        raise ValueError(f"Unknown output format {output_format!r}, expected one of {sorted(FORMATS)}") from None
+    return sink(fields, path)
@@ -0,0 +1,198 @@
+import hashlib
+import json
+import math
+import threading
+from .geocache import get_geocode_store
+
+# Degrees of the cells of the grid index of a polygon layer
+CELL_SIZE = 0.01
+# Sides of town indexed by 2 * (north of the center) + (east of the center)
+SIDES = ('SW', 'SE', 'NW', 'NE')
+
+
+def quadrant_sides(latitudes, longitudes, center_latitudes, center_longitudes):
+    '''Vectorized get_location_side: returns an array with the side of town (NE, NW, SE or SW)
+        of every point relative to its town center'''
+    import numpy as np
+    north = np.asarray(latitudes, dtype=float) > np.asarray(center_latitudes, dtype=float)
+    east = np.asarray(longitudes, dtype=float) > np.asarray(center_longitudes, dtype=float)
+    return np.array(SIDES, dtype=object)[2 * north + east]
+
+
+def inside_rings(latitudes, longitudes, rings):
+    '''Returns a boolean array of the points that are inside the rings of a polygon by the even-odd
+        rule, so holes are outside. Every ring is an array of (longitude, latitude) vertices'''
+    import numpy as np
+    inside = np.zeros(len(latitudes), dtype=bool)
+    y = latitudes[:, None]
+    x = longitudes[:, None]
+    for ring in rings:
+        x1, y1 = ring[:, 0], ring[:, 1]
+        x2, y2 = np.roll(x1, -1), np.roll(y1, -1)
+        straddles = (y1 > y) != (y2 > y)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            crossing_x = x1 + (y - y1) * (x2 - x1) / (y2 - y1)
+        inside ^= (np.count_nonzero(straddles & (x < crossing_x), axis=1) % 2).astype(bool)
+    return inside
+
+
+class PolygonLayer:
+    '''Named polygons (quadrants, beats, neighborhoods...) loaded from a GeoJSON feature collection,
+        with a grid index that maps every cell of cell_size degrees to the polygons whose bounding
+        box overlaps it. lookup() finds the polygon of one point and classify() the polygons of
+        arrays of points with vectorized NumPy operations. The first polygon that contains a
+        point wins.'''
+
+    def __init__(self, features, cell_size=CELL_SIZE, digest=None):
+        import numpy as np
+        self.names = list()
+        # Vertices of the rings of every polygon, as arrays for classify() and lists for lookup()
+        self.rings = list()
+        self.ring_lists = list()
+        self.cell_size = cell_size
+        self.digest = digest
+        for name, polygons in features:
+            for rings in polygons:
+                self.names.append(name)
+                self.rings.append([np.asarray(ring, dtype=float)[:, :2] for ring in rings])
+                self.ring_lists.append([ring.tolist() for ring in self.rings[-1]])
+        # (min longitude, min latitude, max longitude, max latitude) of every polygon
+        self.bounds = np.array([(*rings[0].min(axis=0), *rings[0].max(axis=0)) for rings in self.rings]).reshape(-1, 4).tolist()
+        self.grid = dict()
+        for index, (min_x, min_y, max_x, max_y) in enumerate(self.bounds):
+            for cell_x in range(self.cell(min_x), self.cell(max_x) + 1):
+                for cell_y in range(self.cell(min_y), self.cell(max_y) + 1):
+                    self.grid.setdefault((cell_x, cell_y), list()).append(index)
+
+    @classmethod
+    def from_geojson(cls, geojson_file, name_property='name', cell_size=CELL_SIZE):
+        '''Loads the Polygon and MultiPolygon features of a GeoJSON file, named by name_property'''
+        with open(geojson_file, 'rb') as file:
+            data = file.read()
+        features = list()
+        for feature in json.loads(data)['features']:
+            geometry = feature['geometry']
+            if geometry['type'] == 'Polygon':
+                polygons = [geometry['coordinates']]
+            elif geometry['type'] == 'MultiPolygon':
+                polygons = geometry['coordinates']
+            else:
+                continue
+            features.append((feature.get('properties', {}).get(name_property), polygons))
+        digest = hashlib.sha256(data + name_property.encode()).hexdigest()[:16]
+        return cls(features, cell_size, digest)
+
+    def cell(self, degrees):
+        return math.floor(degrees / self.cell_size)
+
+    def lookup(self, latitude, longitude):
+        '''Returns the name of the polygon that contains a point, or None'''
+        for index in self.grid.get((self.cell(longitude), self.cell(latitude)), ()):
+            min_x, min_y, max_x, max_y = self.bounds[index]
+            if min_x <= longitude <= max_x and min_y <= latitude <= max_y:
+                inside = False
+                for ring in self.ring_lists[index]:
+                    x1, y1 = ring[-1]
+                    for x2, y2 in ring:
+                        if (y1 > latitude) != (y2 > latitude) and \
+                                longitude < x1 + (latitude - y1) * (x2 - x1) / (y2 - y1):
+                            inside = not inside
+                        x1, y1 = x2, y2
+                if inside:
+                    return self.names[index]
+        return None
+
+    def classify(self, latitudes, longitudes):
+        '''Returns an object array with the name of the polygon of every point (None outside).
+            The points are grouped by grid cell, so each polygon is only tested against the
+            points of the cells it overlaps'''
+        import numpy as np
+        latitudes = np.asarray(latitudes, dtype=float)
+        longitudes = np.asarray(longitudes, dtype=float)
+        names = np.full(len(latitudes), None, dtype=object)
+        if not len(latitudes):
+            return names
+        cell_x = np.floor(longitudes / self.cell_size).astype(np.int64)
+        cell_y = np.floor(latitudes / self.cell_size).astype(np.int64)
+        # One integer per cell, so the points are grouped by a single sort
+        min_y, span_y = cell_y.min(), cell_y.max() - cell_y.min() + 1
+        keys = (cell_x - cell_x.min()) * span_y + (cell_y - min_y)
+        order = np.argsort(keys, kind='stable')
+        sorted_keys = keys[order]
+        starts = np.flatnonzero(np.diff(sorted_keys, prepend=-1))
+        ends = np.append(starts[1:], len(order))
+        points_by_polygon = dict()
+        for start, end in zip(starts.tolist(), ends.tolist()):
+            point = order[start]
+            for index in self.grid.get((int(cell_x[point]), int(cell_y[point])), ()):
+                points_by_polygon.setdefault(index, list()).append(order[start:end])
+        unassigned = np.ones(len(latitudes), dtype=bool)
+        for index in sorted(points_by_polygon):
+            candidates = np.concatenate(points_by_polygon[index])
+            candidates = candidates[unassigned[candidates]]
+            if not len(candidates):
+                continue
+            inside = candidates[inside_rings(latitudes[candidates], longitudes[candidates], self.rings[index])]
+            names[inside] = self.names[index]
+            unassigned[inside] = False
+        return names
+
+
+class SpatialIndex:
+    '''In-memory spatial layer used to find the side of town of the incidents.
+
+        The center of every town is geocoded once (through the geocode store, which persists it)
+        and then kept in memory, so classifying an incident is a lookup rather than a geocode.
+        Without polygons the side of town is the quadrant (NE, NW, SE or SW) of the incident
+        around its town center; with a PolygonLayer it is the name of the polygon that contains
+        the incident, and the quadrant for the incidents outside every polygon.'''
+
+    def __init__(self, polygons=None, centers=None):
+        self.polygons = polygons
+        # town -> (latitude, longitude), or None for a town that can't be geocoded
+        self.centers = dict(centers or {})
+        self.lock = threading.Lock()
+
+    def cache_key(self):
+        '''Returns what distinguishes the sides of town of this index in the parse cache'''
+        return '' if self.polygons is None else f'polygons={self.polygons.digest}'
+
+    def resolve_towns(self, towns):
+        '''Geocodes the centers of the towns that are not known yet, in one batch'''
+        with self.lock:
+            missing = [town for town in set(towns) if town not in self.centers]
+        if not missing:
+            return
+        locations = get_geocode_store().resolve_addresses(missing)
+        with self.lock:
+            for town in missing:
+                location = locations.get(town)
+                self.centers[town] = None if location is None else (location.latitude, location.longitude)
+
+    def center(self, town):
+        '''Returns the (latitude, longitude) of a town center resolved before, or None'''
+        return self.centers.get(town)
+
+    def classify(self, latitudes, longitudes, center_latitudes, center_longitudes):
+        '''Returns the side of town of every point, as a list'''
+        sides = quadrant_sides(latitudes, longitudes, center_latitudes, center_longitudes)
+        if self.polygons is not None and len(sides):
+            names = self.polygons.classify(latitudes, longitudes)
+            inside = names != None
+            sides[inside] = names[inside]
+        return sides.tolist()
+
+
+_spatial_index = None
+
+def get_spatial_index():
+    '''Returns the spatial index used by extractdata, creating the default one on first use'''
+    global _spatial_index
+    if _spatial_index is None:
+        _spatial_index = SpatialIndex()
+    return _spatial_index
+
+def set_spatial_index(index):
+    '''Replaces the spatial index used by extractdata, e.g. with one that has a polygon layer'''
+    global _spatial_index
+    _spatial_index = index
@@ -0,0 +1,171 @@
+import calendar
+import math
+import threading
+from datetime import datetime
+from .enrichment import get_enrichment_stage
+from . import providers
+
+WEATHER_URL = "https://archive-api.open-meteo.com/v1/archive"
+# Open-Meteo accepts comma separated coordinates, this keeps the request urls short
+MAX_LOCATIONS_PER_REQUEST = 100
+# Name under which the enrichment stage rate limits the weather api
+PROVIDER = 'open-meteo'
+
+
+def create_openmeteo_client(cache_name='.cache'):
+    '''Creates the Open-Meteo API client with a persistent requests cache and retry on error'''
+    import openmeteo_requests
+    import requests_cache
+    from retry_requests import retry
+    cache_session = requests_cache.CachedSession(cache_name, expire_after = -1)
+    retry_session = retry(cache_session, retries = 5, backoff_factor = 0.2)
+    return openmeteo_requests.Client(session = retry_session)
+
+
+class LocalWeatherResponse:
+    '''Response of LocalWeatherClient, with the Hourly().Time()/Interval()/Variables(0).ValuesAsNumpy()
+        interface of the Open-Meteo client'''
+
+    def __init__(self, start, codes):
+        import numpy as np
+        self.start = start
+        self.codes = np.array(codes, dtype=np.float32)
+
+    def Hourly(self):
+        return self
+
+    def Time(self):
+        return self.start
+
+    def Interval(self):
+        return 3600
+
+    def Variables(self, index):
+        return self
+
+    def ValuesAsNumpy(self):
+        return self.codes
+
+
+class LocalWeatherClient:
+    '''Offline stand-in for the Open-Meteo client that gives every location a deterministic series
+        of hourly weather codes derived from its coordinates, and records every request'''
+
+    CODES = (0, 1, 2, 3, 45, 51, 61, 71)
+
+    def __init__(self):
+        self.requests = list()
+
+    def weather_api(self, url, params):
+        self.requests.append(params)
+        start = calendar.timegm(datetime.strptime(params["start_date"], '%Y-%m-%d').timetuple())
+        return [LocalWeatherResponse(start, [self.CODES[(round(latitude * 100) + round(longitude * 100) + hour) % len(self.CODES)]
+                                             for hour in range(24)])
+                for latitude, longitude in zip(params["latitude"], params["longitude"])]
+
+
+class WeatherService:
+    '''Serves hourly weather codes for (latitude, longitude, day, hour) lookups.
+
+        Coordinates are snapped to a grid of grid_size degrees and the hourly codes of every
+        (grid cell, day) are fetched once, with all the cells of a day sent in a single
+        multi-location request, then kept in memory as an array indexed by the hour. Without a
+        client, the registered weather provider named provider is created on the first request.
+        A (grid cell, day) whose request failed is not kept: its lookups return 0 and are
+        counted in errors (so the incidents are not cached) until the next prefetch retries it.'''
+
+    def __init__(self, client=None, grid_size=0.01, url=WEATHER_URL, provider=None):
+        self.client = client
+        self.provider = provider
+        self.grid_size = grid_size
+        self.url = url
+        self.hourly = dict()
+        self.failed = set()
+        self.requests = 0
+        self.errors = 0
+        self.lock = threading.Lock()
+
+    def snap(self, latitude, longitude):
+        '''Returns the grid cell of a coordinate'''
+        if not self.grid_size:
+            return latitude, longitude
+        return (round(round(latitude / self.grid_size) * self.grid_size, 6),
+                round(round(longitude / self.grid_size) * self.grid_size, 6))
+
+    def prefetch(self, lookups):
+        '''Fetches the hourly codes of every (latitude, longitude, day) not fetched yet,
+            with one request per day (and per MAX_LOCATIONS_PER_REQUEST cells). The requests
+            run concurrently through the enrichment stage'''
+        cells_by_day = dict()
+        for latitude, longitude, day in lookups:
+            key = (self.snap(latitude, longitude), day)
+            if key not in self.hourly:
+                cells_by_day.setdefault(day, dict())[key[0]] = None
+        stage = get_enrichment_stage()
+        futures = list()
+        for day, cells in cells_by_day.items():
+            cells = list(cells)
+            for i in range(0, len(cells), MAX_LOCATIONS_PER_REQUEST):
+                chunk = tuple(cells[i:i + MAX_LOCATIONS_PER_REQUEST])
+                futures.append(stage.submit(PROVIDER, (chunk, day), self._fetch, chunk, day))
+        for future in futures:
+            future.result()
+
+    def _fetch(self, cells, day):
+        '''Requests the hourly weather codes of some grid cells for a day'''
+        with self.lock:
+            if self.client is None:
+                self.client = providers.create('weather', self.provider)
+            self.requests += 1
+        params = {
+            "latitude": [cell[0] for cell in cells],
+            "longitude": [cell[1] for cell in cells],
+            "start_date": day,
+            "end_date": day,
+            "hourly": ["weather_code"]
+        }
+        try:
+            responses = self.client.weather_api(self.url, params=params)
+        except Exception:
+            # The cells are requested again by the next prefetch, their codes default to 0 until then
+            with self.lock:
+                self.errors += 1
+                self.failed.update((cell, day) for cell in cells)
+            return
+        for cell, response in zip(cells, responses):
+            hourly = response.Hourly()
+            self.hourly[(cell, day)] = (hourly.Time(), hourly.Interval(), hourly.Variables(0).ValuesAsNumpy())
+            self.failed.discard((cell, day))
+
+    def get_weather_code(self, latitude, longitude, day, hour):
+        '''Returns the weather code at an hour (GMT) of a day ('YYYY-MM-DD'), or 0 if it is unknown'''
+        key = (self.snap(latitude, longitude), day)
+        if key not in self.hourly and key not in self.failed:
+            self.prefetch([(latitude, longitude, day)])
+        series = self.hourly.get(key)
+        if series is None:
+            # Every code served for a failed request is an error, not a weather code of 0
+            with self.lock:
+                self.errors += 1
+            return 0
+        start, interval, values = series
+        timestamp = calendar.timegm(datetime.strptime(day, '%Y-%m-%d').timetuple()) + hour * 3600
+        index = (timestamp - start) // interval
+        if not 0 <= index < len(values) or math.isnan(values[index]):
+            return 0
+        return int(values[index])
+
+
+_weather_service = None
+
+def get_weather_service():
+    '''Returns the weather service used by extractdata, creating the default one on first use'''
+    global _weather_service
+    if _weather_service is None:
+        _weather_service = WeatherService()
+    return _weather_service
+
+def set_weather_service(service):
+    '''Replaces the weather service used by extractdata, e.g. with one using a stand-in client'''
+    global _weather_service
+    _weather_service = service
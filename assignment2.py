@@ -1,76 +1,451 @@
 import argparse
 import csv
-from assignment0.main import main
-from collections import Counter
-
-def augment_location_ranks(all_incidents):
-    # Extract locations from the tuples in the incidents_list
-    locations = [incident[4] for incident in all_incidents]
-    # Count the frequency of each location
-    location_counts = Counter(locations)
-
-    # Assign ranks to locations based on their frequency
-    sorted_locations = sorted(location_counts.items(), key=lambda x: (-x[1], x[0]))
-
-    # Assign ranks cumulatively
-    cumulative_rank = 1
-    location_ranks = {}
-    for location, count in sorted_locations:
-        location_ranks[location] = cumulative_rank
-        cumulative_rank += count
-
-    # Update the tuples in the incidents_list with the corresponding location ranks
-    updated_incidents_list = [(incident[0], incident[1], incident[2], incident[3], incident[4], incident[5], incident[6], incident[7], incident[8], location_ranks.get(incident[4], 1000)) for incident in all_incidents]
-    return updated_incidents_list
-
-def augment_incident_ranks(all_incidents):
-    # Extract incidents from the tuples in the incidents_list
-    incidents = [incident[6] for incident in all_incidents]
-    # Count the frequency of each location
-    incident_counts = Counter(incidents)
-    # Assign ranks to locations based on their frequency
-    sorted_incidents = sorted(incident_counts.items(), key=lambda x: (-x[1], x[0]))
-    # Assign ranks cumulatively
-    cumulative_rank = 1
-    incident_ranks = {}
-    for incident, count in sorted_incidents:
-        incident_ranks[incident] = cumulative_rank
-        cumulative_rank += count
-    
-    # Update the tuples in the incidents_list with the corresponding location ranks
-    updated_incidents_list = [(incident[0], incident[1], incident[2], incident[3], incident[4], incident[5], incident[6], incident[7], incident[8], incident[9], incident_ranks.get(incident[6], 1000)) for incident in all_incidents]
-    return updated_incidents_list
-
-def augment_emsstat(all_incidents):
-    for i, incident in enumerate(all_incidents):
-        bool_value = False
-        current_ori = incident[7]
-        if current_ori == 'EMSSTAT':
-            bool_value = True
-        else:
-            next_incidents = all_incidents[i+1:i+3]
-            bool_value = any(next_inc[7] == 'EMSSTAT' and next_inc[2] == incident[2] and next_inc[4] == incident[4] for next_inc in next_incidents)
-        all_incidents[i] = (incident[0], incident[1], incident[2], incident[3], incident[4], incident[5], incident[6], incident[7], incident[8], incident[9], incident[10], bool_value)
+import json
+import sys
+import queue
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, wait
+from datetime import date, timedelta
+from operator import attrgetter
+from assignment0.main import main, archive_pdf
+from assignment0.fetchincidents import SUMMARY_URL, daily_summary_url, get_downloader
+from assignment0.enrichment import get_enrichment_stage
+from assignment0.geocache import get_geocode_store
+from assignment0.weather import get_weather_service
+from assignment0.profiling import Profiler, get_profiler, set_profiler
+from assignment0.spatial import PolygonLayer, SpatialIndex, set_spatial_index
+from assignment0.parsecache import cached_extractdata, extract_incidents, lookup_errors, get_parse_cache, set_parse_cache
+from assignment0.parsecache import ParseCache
+from assignment0.dbmanager import createdb, populate_enriched, unenriched_records, record_progress, backfill_progress
+from assignment0.extractdata import MODES, PARALLEL_MIN_PAGES, enrich_incidents
+from assignment0.emsstat import EMSSTAT, EMSSTAT_FIELD, EmsstatLinker
+from assignment0.sinks import FORMATS, TsvSink, create_sink, frame_lines
+from assignment0.ranks import RankEngine, cumulative_ranks, DEFAULT_RANK
+from assignment0.incident import Incident
+from collections import Counter, defaultdict
+
+# Seconds between two writes of the progress of the days of a backfill
+BACKFILL_PROGRESS_INTERVAL = 1
+
+# Fields printed by process_urls, in order
+OUTPUT_FIELDS = ['day_of_week', 'incident_hour', 'weather_code', 'location_rank', 'side_of_town',
+                 'incident_rank', 'nature', 'emsstat']
+
+def augment_location_ranks(all_incidents, location_ranks=None):
+    if location_ranks is None:
+        # Count the frequency of each location in this pdf and assign ranks cumulatively
+        location_ranks = cumulative_ranks(Counter(incident.incident_location for incident in all_incidents))
+
+    # Fill in the location rank of every incident
+    for incident in all_incidents:
+        incident.location_rank = location_ranks.get(incident.incident_location, DEFAULT_RANK)
+    return all_incidents
+
+def augment_incident_ranks(all_incidents, incident_ranks=None):
+    if incident_ranks is None:
+        # Count the frequency of each incident in this pdf and assign ranks cumulatively.
+        # The ranks are keyed on the weather code, the column the tuple layout (incident[6]) used
+        incident_ranks = cumulative_ranks(Counter(incident.weather_code for incident in all_incidents))
+
+    # Fill in the incident rank of every incident
+    for incident in all_incidents:
+        incident.incident_rank = incident_ranks.get(incident.weather_code, DEFAULT_RANK)
+    return all_incidents
+
+def frame_ranks(keys, ranks=None):
+    '''Vectorized cumulative ranks of a column: unique keys are sorted by (-count, key) and each
+        rank is one plus the counts before it, as in cumulative_ranks'''
+    # numpy and pandas are only imported by the --columnar path
+    import numpy as np
+    import pandas as pd
+    # None (a field that was not enriched) is a key of its own, not the -1 code of a missing value
+    codes, uniques = pd.factorize(keys, use_na_sentinel=False)
+    uniques = [None if pd.isna(key) else key for key in uniques.tolist()]
+    if ranks is None:
+        # Only the few unique keys are sorted, in python so that None is ordered as in cumulative_ranks
+        ranks = cumulative_ranks(dict(zip(uniques, np.bincount(codes, minlength=len(uniques)).tolist())))
+    unique_ranks = np.array([ranks.get(key, DEFAULT_RANK) for key in uniques], dtype=np.int64)
+    return pd.Series(unique_ranks[codes], index=keys.index)
+
+def augment_columnar(all_incidents, location_ranks=None, incident_ranks=None, emsstat_field=EMSSTAT_FIELD):
+    '''Columnar equivalent of the three augment functions: returns a DataFrame of the incidents
+        with location_rank, incident_rank and emsstat computed with vectorized group-by and shifts.
+        emsstat_field is the field of the EMSSTAT incidents, like the field of EmsstatLinker'''
+    import pandas as pd
+    # One pass per field rather than a tuple per incident. A field with None (not enriched) is kept
+    # as python objects, so its integers are not turned into floats and None into NaN
+    columns = {field: list(map(attrgetter(field), all_incidents)) for field in Incident.__slots__}
+    frame = pd.DataFrame({field: pd.Series(column, dtype=object if None in column else None)
+                          for field, column in columns.items()})
+    frame['location_rank'] = frame_ranks(frame['incident_location'], location_ranks)
+    frame['incident_rank'] = frame_ranks(frame['weather_code'], incident_ranks)
+    is_emsstat = (frame[emsstat_field] == EMSSTAT).to_numpy()
+    time_codes = pd.factorize(frame['incident_time'])[0]
+    location_codes = pd.factorize(frame['incident_location'])[0]
+    emsstat = is_emsstat.copy()
+    # Same lookahead as augment_emsstat: one of the next two rows is EMSSTAT at the same time and place
+    for offset in (1, 2):
+        emsstat[:-offset] |= (is_emsstat[offset:]
+                              & (time_codes[offset:] == time_codes[:-offset])
+                              & (location_codes[offset:] == location_codes[:-offset]))
+    frame['emsstat'] = emsstat
+    return frame
+
+def frame_rows(frame):
+    '''Formats an augmented frame as the tab separated rows printed by process_urls'''
+    return frame_lines(frame, OUTPUT_FIELDS)
+
+def frame_db_records(frame):
+    '''Returns the records of an augmented frame in the order of Incident.enriched_record, as python values'''
+    return list(zip(*(frame[field].tolist() for field in Incident.__slots__)))
+
+def update_rank_engines(location_engine, incident_engine, all_incidents):
+    '''Adds the incidents of a pdf, day by day, to the running location and incident counts. The
+        incident ranks are keyed on the weather code, like augment_incident_ranks. Incidents
+        without a date (the rows hand-patched by the text fallback of parse_incidents) belong to no
+        day and are left out of the counts. Returns the last day of the pdf'''
+    incidents_by_day = defaultdict(list)
+    for incident in all_incidents:
+        if incident.incident_date is not None:
+            incidents_by_day[incident.incident_date].append(incident)
+    for day, incidents in incidents_by_day.items():
+        location_engine.update(day, [incident.incident_location for incident in incidents])
+        incident_engine.update(day, [incident.weather_code for incident in incidents])
+    return max(incidents_by_day, default=None)
+
+def augment_emsstat(all_incidents, linker=None):
+    '''Flags the EMSSTAT incidents and the incidents with an EMSSTAT companion. The default
+        linker matches the next two rows at the same time and place'''
+    return (linker or EmsstatLinker()).link(all_incidents)
+
+def extract_in_worker(pdf_file, url, mode='parse'):
+    '''Extracts the incidents of a pdf in a parser process, by default only parsed since the
+        lookups are made from the main process. Returns them with whether they may be
+        cached and the timers and counters of this pdf, which are merged into the profiler of
+        the main process. The pages are decoded serially, the pool already runs one pdf per process'''
+    profiler = get_profiler()
+    profiler.reset()
+    all_incidents, complete = profiler.profile_url(url, extract_incidents, pdf_file, mode, 1)
+    return all_incidents, complete, profiler.snapshot()
+
+def download_and_parse(parser, url, keep_pdf=False, mode='full'):
+    '''Downloads the pdf of a url into the pdf store in the calling thread and, unless it was
+        parsed before, parses it in the parser process pool. Only the path of the stored pdf is
+        sent to the parser process. The incidents are enriched back in the calling thread, so
+        every geocoder and weather request goes through the rate limits of the main process
+        rather than through one set of limits per parser process'''
+    profiler = get_profiler()
+    with profiler.stage('download'):
+        pdf_path = get_downloader().fetch(url)
+    if keep_pdf:
+        with open(pdf_path, 'rb') as file:
+            archive_pdf(url, file.read())
+
+    def parse_in_pool(pdf_file):
+        all_incidents, complete, snapshot = parser.submit(extract_in_worker, pdf_file, url, 'parse').result()
+        profiler.merge(snapshot)
+        if mode == 'parse':
+            return all_incidents, complete
+        errors = lookup_errors()
+        all_incidents = enrich_incidents(all_incidents, mode)
+        return all_incidents, complete and lookup_errors() == errors
+
+    with profiler.stage('extract'):
+        return cached_extractdata(pdf_path, parse_in_pool, mode)
+
+def ingest_urls(urls, workers, keep_pdf=False, mode='full'):
+    '''Downloads the urls concurrently over the pooled session of the downloader and parses their
+        pdfs in a process pool. The incidents of each url are yielded in the same order as the urls'''
+    pending = deque(urls)
+    with ThreadPoolExecutor(max_workers=workers) as downloader, ProcessPoolExecutor(max_workers=workers) as parser:
+        # At most two urls per worker are in flight, so the incidents waiting to be yielded stay bounded
+        running = deque()
+        while pending or running:
+            while pending and len(running) < 2 * workers:
+                running.append(downloader.submit(download_and_parse, parser, pending.popleft(), keep_pdf, mode))
+            yield running.popleft().result()
+
+def backfill_day(parser, day, url, stage, mode, keep_pdf, events):
+    '''Downloads, parses and enriches the daily summary of a day in a thread of the backfill
+        pool and returns its incidents. The pdf of a day downloaded by a previous run (stage is
+        not None) is read from the pdf store without a request, and a parsed pdf is read from
+        the parse cache. (day, url, stage) is put in the events queue after every stage'''
+    profiler = get_profiler()
+    downloader = get_downloader()
+    entry = downloader.store.lookup(url) if stage is not None else None
+    if entry is not None:
+        pdf_path = downloader.store.object_path(entry['sha256'])
+    else:
+        with profiler.stage('download'):
+            pdf_path = downloader.fetch(url)
+    events.put((day, url, 'downloaded'))
+    if keep_pdf:
+        with open(pdf_path, 'rb') as file:
+            archive_pdf(url, file.read())
+
+    def parse_in_pool(pdf_file):
+        all_incidents, complete, snapshot = parser.submit(extract_in_worker, pdf_file, url, 'parse').result()
+        profiler.merge(snapshot)
+        return all_incidents, complete
+
+    with profiler.stage('extract'):
+        all_incidents = cached_extractdata(pdf_path, parse_in_pool, 'parse')
+    events.put((day, url, 'parsed'))
+    if mode != 'parse':
+        all_incidents = enrich_incidents(all_incidents, mode)
+        events.put((day, url, 'enriched'))
     return all_incidents
 
-def process_urls(urls_file):
-    with open(urls_file, 'r') as file:
-        urls = csv.reader(file)
-        for url in urls:
-            all_incidents = main(url[0])
-            all_incidents = augment_location_ranks(all_incidents)
-            all_incidents = augment_incident_ranks(all_incidents)
-            all_incidents = augment_emsstat(all_incidents)
+def backfill(db_name, start_date, end_date, workers=1, mode='full', keep_pdf=False, url_template=SUMMARY_URL):
+    '''Ingests the daily summaries of every day from start_date to end_date (datetime.date,
+        both included) into a database. The stage reached by every day (dbmanager.BACKFILL_STAGES)
+        is recorded in the backfill_progress table of the database as soon as it is reached, so
+        a backfill that is stopped or fails on some days is resumed by running it again: the
+        stored days are skipped and the others continue from their last stage. Days are
+        downloaded, parsed (in a process pool) and enriched by up to workers at a time and stored
+        in date order, with the ranks of each day computed over that day. A day that fails is
+        recorded with its error and the backfill goes on. Returns {stage: days} over the range'''
+    profiler = get_profiler()
+    con = createdb(db_name)
+    days = [(start_date + timedelta(days=offset)).isoformat() for offset in range((end_date - start_date).days + 1)]
+    progress = backfill_progress(con, days[0], days[-1]) if days else dict()
+    pending = deque((day, daily_summary_url(date.fromisoformat(day), url_template), progress.get(day, (None,))[0])
+                    for day in days if progress.get(day, (None,))[0] != 'stored')
+    events = queue.SimpleQueue()
+
+    def record_events():
+        while not events.empty():
+            record_progress(con, *events.get())
+
+    with profiler.stage('total'), ThreadPoolExecutor(max_workers=workers) as pool, \
+            ProcessPoolExecutor(max_workers=workers) as parser:
+        # At most two days per worker are in flight, so the incidents waiting to be stored stay bounded
+        running = deque()
+        while pending or running:
+            while pending and len(running) < 2 * workers:
+                day, url, stage = pending.popleft()
+                running.append((day, url, pool.submit(backfill_day, parser, day, url, stage, mode, keep_pdf, events)))
+            day, url, future = running.popleft()
+            # Waiting rather than result(timeout=...), whose TimeoutError can't be told apart from
+            # a TimeoutError raised by the day itself
+            while not wait([future], timeout=BACKFILL_PROGRESS_INTERVAL).done:
+                record_events()
+            try:
+                all_incidents, error = future.result(), None
+            except Exception as exception:
+                all_incidents, error = None, f"{type(exception).__name__}: {exception}"
+            record_events()
+            if error is not None:
+                record_progress(con, day, url, error=error)
+                continue
+            with profiler.stage('augment'):
+                all_incidents = augment_emsstat(augment_incident_ranks(augment_location_ranks(all_incidents)))
+            with profiler.stage('database'):
+                populate_enriched(con, [incident.enriched_record() for incident in all_incidents])
+            record_progress(con, day, url, 'stored', len(all_incidents))
+    summary = Counter('failed' if error else stage for stage, incidents, error
+                      in backfill_progress(con, days[0], days[-1]).values()) if days else Counter()
+    con.close()
+    if profiler.enabled:
+        json.dump(profile_summary(), sys.stderr, indent=2)
+        print(file=sys.stderr)
+    return summary
+
+def profile_summary():
+    '''Returns the stage timers and counters of the run with the statistics of the caches and
+        of the network services. The services of the parser processes (--workers) are not included'''
+    summary = get_profiler().snapshot()
+    weather_service = get_weather_service()
+    summary['parse_cache'] = get_parse_cache().stats()
+    summary['geocode_cache'] = get_geocode_store().stats()
+    summary['weather'] = {'requests': weather_service.requests, 'errors': weather_service.errors}
+    summary['enrichment'] = get_enrichment_stage().stats()
+    summary['downloads'] = get_downloader().stats()
+    return summary
+
+def store_and_write(con, all_incidents, sink):
+    '''Stores the augmented incidents in the database, if there is one, and writes them to the sink'''
+    profiler = get_profiler()
+    if con is not None:
+        with profiler.stage('database'):
+            populate_enriched(con, [incident.enriched_record() for incident in all_incidents])
+    with profiler.stage('output'):
+        sink.write_incidents(all_incidents)
+
+def process_urls(urls_file, workers=1, keep_pdf=False, db_name=None, rank_window=None, columnar=False, mode='full',
+                 emsstat_linker=None, emsstat_across_days=False, sink=None, page_processes=1):
+    '''Prints the augmented incidents of every url. By default the ranks are computed over each
+        pdf alone; rank_window 'all' ranks over every day ingested so far (persisted in the
+        database if there is one) and a number of days ranks over that rolling window.
+        With columnar the incidents are augmented as a pandas DataFrame instead of tuples.
+        mode is how far the incidents are enriched (extractdata.MODES), the fields that are not
+        are printed and stored as None and can be filled in later by enrich_db.
+        EMSSTAT companions are matched within each pdf by emsstat_linker (the default
+        EmsstatLinker if None, --columnar only uses its field); with emsstat_across_days the
+        incidents of consecutive urls are streamed through it, so companions are also matched
+        across days and the last incidents of a pdf are printed with the next one.
+        The rows are written to sink (an OutputSink of OUTPUT_FIELDS) url by url, by default
+        they are printed to stdout as tab separated values.
+        With a single worker, page_processes decodes the pages of each large pdf in a pool of
+        that many processes (see main.main); with workers every pdf is decoded in one process'''
+    profiler = get_profiler()
+    sink = sink or TsvSink(OUTPUT_FIELDS)
+    with profiler.stage('total'):
+        with open(urls_file, 'r') as file:
+            urls = [url[0] for url in csv.reader(file)]
+        con = createdb(db_name) if db_name else None
+        if rank_window is not None:
+            window = None if rank_window == 'all' else int(rank_window)
+            location_engine, incident_engine = RankEngine('location', con), RankEngine('weather_code', con)
+        emsstat_linker = emsstat_linker or EmsstatLinker()
+        if workers > 1:
+            incidents_by_url = ingest_urls(urls, workers, keep_pdf, mode)
+        else:
+            incidents_by_url = (profiler.profile_url(url, main, url, keep_pdf, mode, page_processes) for url in urls)
+        for all_incidents in incidents_by_url:
+            location_ranks, incident_ranks = None, None
+            if rank_window is not None:
+                with profiler.stage('ranks'):
+                    end_day = update_rank_engines(location_engine, incident_engine, all_incidents)
+                    location_ranks = location_engine.ranks(window, end_day)
+                    incident_ranks = incident_engine.ranks(window, end_day)
+            if columnar:
+                with profiler.stage('augment'):
+                    frame = augment_columnar(all_incidents, location_ranks, incident_ranks, emsstat_linker.field)
+                if con is not None:
+                    with profiler.stage('database'):
+                        populate_enriched(con, frame_db_records(frame))
+                with profiler.stage('output'):
+                    sink.write_frame(frame)
+                continue
+            with profiler.stage('augment'):
+                all_incidents = augment_location_ranks(all_incidents, location_ranks)
+                all_incidents = augment_incident_ranks(all_incidents, incident_ranks)
+                if emsstat_across_days:
+                    all_incidents = emsstat_linker.feed(all_incidents)
+                else:
+                    all_incidents = augment_emsstat(all_incidents, emsstat_linker)
+            store_and_write(con, all_incidents, sink)
+        if emsstat_across_days:
+            store_and_write(con, emsstat_linker.flush(), sink)
+        if con is not None:
+            con.close()
+    if profiler.enabled:
+        json.dump(profile_summary(), sys.stderr, indent=2)
+        print(file=sys.stderr)
+
+def enrich_db(db_name, mode='full'):
+    '''Enriches, as a separate batch stage, the incidents stored in a database by a run in a
+        lighter mode. The incidents of every day that has incidents missing the enrichment of
+        mode are geocoded (and their weather looked up) in one batch, the incident ranks of
+        those days are computed again and the days are stored back. Unlike a full mode run,
+        incidents that can't be geocoded are kept (and ranked) with a NULL side of town, so their
+        days are selected again by every later run: addresses the geocoder didn't find are read
+        back from the geocode store, addresses that failed with a network error are looked up
+        again. Returns the number of incidents stored back'''
+    profiler = get_profiler()
+    con = createdb(db_name)
+    with profiler.stage('total'):
+        all_incidents = [Incident(*record) for record in unenriched_records(con, mode)]
+        enrich_incidents([incident for incident in all_incidents
+                          if incident.side_of_town is None or (mode == 'full' and incident.weather_code is None)],
+                         mode, keep_unlocated=True)
+        with profiler.stage('augment'):
+            incidents_by_day = defaultdict(list)
             for incident in all_incidents:
-                row = "\t".join(map(str, [incident[0], incident[1], incident[6], incident[9], incident[5], incident[10], incident[7], incident[11]]))
-                print(row)
+                incidents_by_day[incident.incident_date].append(incident)
+            for incidents in incidents_by_day.values():
+                augment_incident_ranks(incidents)
+        with profiler.stage('database'):
+            populate_enriched(con, [incident.enriched_record() for incident in all_incidents])
+    con.close()
+    if profiler.enabled:
+        json.dump(profile_summary(), sys.stderr, indent=2)
+        print(file=sys.stderr)
+    return len(all_incidents)
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser()
-    parser.add_argument("--urls", required=True, help="Path to the CSV file containing a list of URLs")
+    parser.add_argument("--urls", help="Path to the CSV file containing a list of URLs")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="Number of urls to download and parse concurrently")
+    parser.add_argument("--page-processes", type=int, default=1,
+                        help="Decode the pages of a pdf of %d pages or more in a pool of this many processes "
+                        "(0 for one per cpu), smaller pdfs are decoded serially" % PARALLEL_MIN_PAGES)
+    parser.add_argument("--keep-pdf", action="store_true",
+                        help="Also save every downloaded pdf in resources/pdfs/")
+    parser.add_argument("--db", help="Path of an sqlite database to store the augmented incidents in")
+    parser.add_argument("--rank-window", help="Rank locations and incidents over 'all' the ingested days "
+                        "or over a rolling window of this many days instead of over each pdf")
+    parser.add_argument("--columnar", action="store_true",
+                        help="Augment the incidents with vectorized pandas operations")
+    parser.add_argument("--mode", choices=MODES, default='full',
+                        help="Only parse the incidents (no network call besides the downloads), "
+                        "or also geocode them, or also add the weather (full)")
+    parser.add_argument("--polygons", help="GeoJSON file of named polygons (beats, neighborhoods...) "
+                        "that give the side of town of the incidents inside them instead of the quadrant")
+    parser.add_argument("--polygon-name", default="name", help="Property of the --polygons features that names them")
+    parser.add_argument("--emsstat-rows", default=None,
+                        help="Match an EMSSTAT companion among this many following rows (2 by default), "
+                        "or 'all' to match it anywhere, before or after, within --emsstat-minutes")
+    parser.add_argument("--emsstat-minutes", type=int, default=0,
+                        help="Minutes between an incident and its EMSSTAT companion (0 is the same time)")
+    parser.add_argument("--emsstat-across-days", action="store_true",
+                        help="Stream the incidents of consecutive urls through one linker so EMSSTAT "
+                        "companions are matched across days")
+    parser.add_argument("--output-format", choices=sorted(FORMATS), default="tsv",
+                        help="Format of the augmented incidents: tab separated values (printed by default), "
+                        "csv or json lines, or the parquet and feather columnar files (need --output and pyarrow)")
+    parser.add_argument("--output", help="Write the augmented incidents to this file instead of stdout")
+    parser.add_argument("--backfill", nargs=2, metavar=("START", "END"),
+                        help="Instead of reading --urls, ingest the daily summaries of every day from START to END "
+                        "(YYYY-MM-DD) into --db, resuming from the progress recorded by a previous backfill")
+    parser.add_argument("--enrich", action="store_true",
+                        help="Instead of ingesting urls, enrich the incidents stored in --db in --mode")
+    cache_group = parser.add_mutually_exclusive_group()
+    cache_group.add_argument("--no-cache", action="store_true",
+                             help="Parse every pdf again without reading or writing the parse cache")
+    cache_group.add_argument("--rebuild-cache", action="store_true",
+                             help="Parse every pdf again and replace its entry in the parse cache")
+    parser.add_argument("--profile", action="store_true",
+                        help="Print a json summary of the stage timers and counters of the run to stderr")
+    parser.add_argument("--cprofile-dir", help="Dump a cProfile of the processing of every url in this directory")
     args = parser.parse_args()
 
-    process_urls(args.urls)
+    if args.profile or args.cprofile_dir:
+        set_profiler(Profiler(enabled=args.profile, cprofile_dir=args.cprofile_dir))
+    if args.polygons:
+        set_spatial_index(SpatialIndex(PolygonLayer.from_geojson(args.polygons, args.polygon_name)))
+    if args.no_cache or args.rebuild_cache:
+        set_parse_cache(ParseCache(read=False, write=args.rebuild_cache))
+    if args.enrich:
+        if not args.db or args.mode == 'parse':
+            parser.error("--enrich needs --db and a --mode of geocode or full")
+        enrich_db(args.db, args.mode)
+    elif args.backfill:
+        try:
+            start_date, end_date = map(date.fromisoformat, args.backfill)
+        except ValueError:
+            parser.error("--backfill needs two dates as YYYY-MM-DD")
+        if not args.db:
+            parser.error("--backfill needs --db")
+        summary = backfill(args.db, start_date, end_date, args.workers, args.mode, args.keep_pdf)
+        for stage, days in sorted(summary.items()):
+            print(f"{stage}|{days}")
+    elif not args.urls:
+        parser.error("--urls is required")
+    else:
+        if (args.emsstat_rows is not None or args.emsstat_minutes or args.emsstat_across_days) and args.columnar:
+            parser.error("--columnar only matches EMSSTAT companions in the next two rows at the same time")
+        row_window = 2 if args.emsstat_rows is None else None if args.emsstat_rows == 'all' else int(args.emsstat_rows)
+        emsstat_linker = EmsstatLinker(row_window, args.emsstat_minutes)
+        if args.page_processes != 1 and args.workers > 1:
+            parser.error("--page-processes only applies with a single worker, --workers already parses a pdf per process")
+        if args.output_format in ('parquet', 'feather') and not args.output:
+            parser.error(f"--output-format {args.output_format} needs --output")
+        with create_sink(args.output_format, OUTPUT_FIELDS, args.output) as sink:
+            process_urls(args.urls, args.workers, args.keep_pdf, args.db, args.rank_window, args.columnar, args.mode,
+                         emsstat_linker, args.emsstat_across_days, sink, args.page_processes or None)
 
 # if __name__ == "__main__":
 #     all_incidents = main("https://www.normanok.gov/sites/default/files/documents/2024-03/2024-03-04_daily_incident_summary.pdf")
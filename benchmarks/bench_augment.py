@@ -0,0 +1,66 @@
+'''Benchmark of the record and the vectorized (columnar) augmentation paths of assignment2.
+
+Run from the repository root with
+    python -m benchmarks.bench_augment [rows]
+'''
+import random
+import sys
+import time
+from assignment2 import augment_location_ranks, augment_incident_ranks, augment_emsstat
+from assignment2 import augment_columnar, frame_rows, OUTPUT_FIELDS
+from assignment0.incident import Incident
+
+DEFAULT_ROWS = 1_000_000
+
+
+def synthetic_incidents(rows, seed=0):
+    '''Builds incidents shaped like the output of extractdata, with a realistic spread of
+        locations and natures and EMSSTAT companions following some incidents'''
+    rng = random.Random(seed)
+    locations = [f"{rng.randint(100, 9999)} {rng.choice('NSEW')} STREET{i} AVE" for i in range(20000)]
+    natures = [f"Nature {i}" for i in range(80)]
+    sides = ['NE', 'NW', 'SE', 'SW']
+    incidents = list()
+    while len(incidents) < rows:
+        hour = rng.randrange(24)
+        incident_time = f"{hour}:{rng.randrange(60):02d}"
+        location = rng.choice(locations)
+        incident = Incident(incident_time, f"2024-{len(incidents):08d}", location, rng.choice(natures),
+                            rng.choice(['OK0140200', '14005', '14009']), '2024-01-01', rng.randint(1, 7), hour,
+                            rng.choice(sides), rng.choice([0, 1, 2, 3, 51, 61, 71]))
+        incidents.append(incident)
+        if rng.random() < 0.1:
+            incidents.append(Incident(incident_time, f"2024-{len(incidents):08d}", location, 'EMSSTAT', 'EMSSTAT',
+                                      '2024-01-01', incident.day_of_week, hour, incident.side_of_town, incident.weather_code))
+    return incidents[:rows]
+
+
+def record_path(all_incidents):
+    all_incidents = augment_location_ranks(all_incidents)
+    all_incidents = augment_incident_ranks(all_incidents)
+    all_incidents = augment_emsstat(all_incidents)
+    return ["\t".join(map(str, [getattr(incident, field) for field in OUTPUT_FIELDS])) for incident in all_incidents]
+
+
+def columnar_path(all_incidents):
+    return frame_rows(augment_columnar(all_incidents))
+
+
+def timed(function, all_incidents):
+    start = time.perf_counter()
+    result = function(all_incidents)
+    return result, time.perf_counter() - start
+
+
+def main(rows):
+    all_incidents = synthetic_incidents(rows)
+    record_rows, record_seconds = timed(record_path, all_incidents)
+    columnar_rows, columnar_seconds = timed(columnar_path, all_incidents)
+    print(f"rows: {rows:,} (identical output: {record_rows == columnar_rows})")
+    print(f"record path:   {record_seconds:.2f}s ({rows / record_seconds:,.0f} rows/sec)")
+    print(f"columnar path: {columnar_seconds:.2f}s ({rows / columnar_seconds:,.0f} rows/sec, "
+          f"{record_seconds / columnar_seconds:.1f}x)")
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_ROWS)
@@ -0,0 +1,55 @@
+'''Wall time of geocoding the addresses of a pdf with a simulated network latency, one lookup
+at a time against the concurrent enrichment stage.
+
+Run from the repository root with
+    python -m benchmarks.bench_enrichment [addresses] [latency_ms]
+'''
+import os
+import sys
+import tempfile
+import time
+from assignment0 import enrichment
+from assignment0.enrichment import EnrichmentStage
+from assignment0.geocache import GeocodeStore, LocalGeocoder
+
+DEFAULT_ADDRESSES = 300
+DEFAULT_LATENCY_MS = 50
+
+
+class LatencyGeocoder(LocalGeocoder):
+    '''Offline geocoder that sleeps like a network round trip before answering'''
+    def __init__(self, locations, latency):
+        super().__init__(locations)
+        self.latency = latency
+
+    def geocode(self, address):
+        time.sleep(self.latency)
+        return super().geocode(address)
+
+
+def timed_resolve(addresses, latency, max_workers):
+    '''Returns the seconds taken to geocode the addresses with a cold cache'''
+    enrichment.set_enrichment_stage(EnrichmentStage(max_workers=max_workers))
+    geocoder = LatencyGeocoder({address: (35.2, -97.4, address) for address in addresses}, latency)
+    with tempfile.TemporaryDirectory() as directory:
+        store = GeocodeStore(os.path.join(directory, 'geocode.sqlite'), geocoder=geocoder)
+        start = time.perf_counter()
+        store.resolve_addresses(addresses)
+        seconds = time.perf_counter() - start
+        store.close()
+    return seconds
+
+
+def main(count, latency_ms):
+    addresses = [f"{number} N MAIN ST" for number in range(count)]
+    print(f"addresses: {count:,}, latency: {latency_ms} ms")
+    serial = timed_resolve(addresses, latency_ms / 1000, 1)
+    print(f"1 worker:  {serial:.2f}s")
+    for max_workers in (4, enrichment.MAX_WORKERS, 16):
+        seconds = timed_resolve(addresses, latency_ms / 1000, max_workers)
+        print(f"{max_workers} workers: {seconds:.2f}s ({serial / seconds:.1f}x)")
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_ADDRESSES,
+         int(sys.argv[2]) if len(sys.argv) > 2 else DEFAULT_LATENCY_MS)
@@ -0,0 +1,43 @@
+'''Import time of the entry points of the project, each measured in a fresh interpreter, and the
+heavy dependencies that importing them loads.
+
+Run from the repository root with
+    python -m benchmarks.bench_import [module ...]
+'''
+import json
+import subprocess
+import sys
+
+DEFAULT_MODULES = ['assignment0.lineparser', 'assignment0.extractdata', 'assignment0.main', 'assignment2']
+HEAVY_MODULES = ['pandas', 'numpy', 'pypdf', 'geopy', 'requests', 'urllib3', 'openmeteo_requests', 'requests_cache']
+REPEAT = 5
+
+PROBE = '''
+import json, sys, time
+start = time.perf_counter()
+import {module}
+seconds = time.perf_counter() - start
+print(json.dumps([seconds, [name for name in {heavy!r} if name in sys.modules]]))
+'''
+
+
+def import_time(module, repeat=REPEAT):
+    '''Returns the best import time of module over repeat fresh interpreters and the heavy
+        modules it loaded'''
+    best, loaded = float('inf'), None
+    for _ in range(repeat):
+        output = subprocess.run([sys.executable, '-c', PROBE.format(module=module, heavy=HEAVY_MODULES)],
+                                capture_output=True, text=True, check=True).stdout
+        seconds, loaded = json.loads(output)
+        best = min(best, seconds)
+    return best, loaded
+
+
+def main(modules):
+    for module in modules:
+        seconds, loaded = import_time(module)
+        print(f"{module:<25} {seconds * 1000:7.1f} ms  loads: {', '.join(loaded) or '-'}")
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:] or DEFAULT_MODULES)
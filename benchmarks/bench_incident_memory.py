@@ -0,0 +1,60 @@
+'''Memory used by augmented incidents: the growing tuples of the old pipeline against Incident records.
+
+Run from the repository root with
+    python -m benchmarks.bench_incident_memory [incidents]
+'''
+import gc
+import sys
+import tracemalloc
+from assignment0.incident import Incident
+
+DEFAULT_INCIDENTS = 1_000_000
+
+
+def parsed_fields(count):
+    '''Yields the fields parsed from the pdf. Every value is a fresh string, as when it is
+        sliced out of a page of text'''
+    for i in range(count):
+        yield (f"{i % 24}:{i % 60:02d}", f"2024-{i:08d}", f"{i % 5000} N MAIN ST", f"Nature {i % 80}",
+               ''.join(['OK', '0140200']), ''.join(['2024-', '01-01']), ''.join(['N', 'E'][i % 2:]))
+
+
+def tuple_incidents(count):
+    '''The old pipeline: a 10 element tuple per incident, copied into a new tuple by each augmentation'''
+    incidents = [(1, 0, time, number, location, side, 3, nature, ori, day)
+                 for time, number, location, nature, ori, day, side in parsed_fields(count)]
+    for _ in range(3):
+        incidents = [incident + (1,) for incident in incidents]
+    return incidents
+
+
+def record_incidents(count):
+    '''The current pipeline: one Incident per incident, augmented in place'''
+    incidents = [Incident(time, number, location, nature, ori, day, 1, 0, side, 3)
+                 for time, number, location, nature, ori, day, side in parsed_fields(count)]
+    for incident in incidents:
+        incident.location_rank = incident.incident_rank = incident.emsstat = 1
+    return incidents
+
+
+def measure(function, count):
+    '''Returns the bytes still allocated by the result of function, and the peak while building it'''
+    gc.collect()
+    tracemalloc.start()
+    result = function(count)
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del result
+    return current, peak
+
+
+def main(count):
+    print(f"incidents: {count:,}")
+    for name, function in (('tuples', tuple_incidents), ('Incident', record_incidents)):
+        current, peak = measure(function, count)
+        print(f"{name:>8}: {current / 2**20:,.0f} MiB ({current / count:.0f} bytes per incident), "
+              f"peak {peak / 2**20:,.0f} MiB")
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_INCIDENTS)
@@ -0,0 +1,62 @@
+'''Time of parsing the incidents of a pdf from the lines of its text (the line parser) against
+parsing them from the layout of its pages (assignment0/layout.py), and the rows where the two
+differ. The pages are decoded once by pypdf, with the positions of the text, and both parsers
+work from that decoding; the time of the decoding is printed apart since it is the same for both.
+
+Run from the repository root with
+    python -m benchmarks.bench_layout [pdf_file ...]
+'''
+import sys
+import time
+from pypdf import PdfReader
+from assignment0.layout import layout_parser
+from assignment0.lineparser import line_parser
+from benchmarks.fixtures import RECORDED_PDFS
+
+
+def text_rows(pages):
+    '''The incidents of the lines of the text of the pages'''
+    return [row for page_text, fragments in pages
+            for row in map(line_parser.parse, page_text.split('\n')) if row]
+
+
+def layout_rows(pages):
+    '''The incidents of the rows recovered from the positions of the text of the pages'''
+    rows = list()
+    for page_text, fragments in pages:
+        cells = layout_parser.rows(fragments)
+        if cells is None:
+            rows += [row for row in map(line_parser.parse, page_text.split('\n')) if row]
+            continue
+        rows += [row[:5] for row in map(layout_parser.parse_row, cells) if row]
+    return rows
+
+
+def best_time(parse, pages, repeat=5):
+    '''Best-of-repeat time of parse over pages'''
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        parse(pages)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main(pdf_files):
+    for pdf_file in pdf_files:
+        start = time.perf_counter()
+        pages = [layout_parser.fragments(page) for page in PdfReader(pdf_file).pages]
+        decode = time.perf_counter() - start
+        text, layout = text_rows(pages), layout_rows(pages)
+        differences = [(old, new) for old, new in zip(text, layout) if old != new]
+        before, after = best_time(text_rows, pages), best_time(layout_rows, pages)
+        print(f"{pdf_file}: {len(pages)} pages, {len(layout)} incidents (lines: {len(text)}), "
+              f"decoding {decode * 1000:.0f} ms")
+        print(f"  lines:  {before * 1000:6.1f} ms")
+        print(f"  layout: {after * 1000:6.1f} ms ({before / after:.1f}x)")
+        for old, new in differences:
+            print(f"  lines:  {old}\n  layout: {new}")
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:] or RECORDED_PDFS)
@@ -0,0 +1,82 @@
+'''Micro-benchmark of the incident line parser.
+
+Run from the repository root with
+    python -m benchmarks.bench_lineparser [pdf_file ...]
+'''
+import re
+import sys
+import time
+from pypdf import PdfReader
+from assignment0.lineparser import STREET_TYPE_LIST, STANDARD_ORIS, line_parser
+
+DEFAULT_PDFS = ['test_files/test_incident_data.pdf']
+
+
+def legacy_parse(line):
+    '''The parser as it was before LineParser: every pattern is rebuilt on every call'''
+    match = re.search(re.compile(r'\b(\d{1,2}:\d{2})\b'), line)
+    if not match:
+        return None
+    incident_time = match.group(1)
+    match = re.search(re.compile(r'(\d{4}-\d{8}\s)'), line)
+    if not match:
+        return None
+    incident_number = match.group(1).strip(' ')
+    street_type_pattern = r'\b(?:' + '|'.join(map(re.escape, STREET_TYPE_LIST)) + r')\b'
+    start_index = re.search(r'\d{4}-\d{8}', line).end()
+    address, last_index = '', start_index
+    matches = list(re.finditer(rf'({street_type_pattern})', line[start_index:], flags=re.IGNORECASE))
+    special_match = re.search(r'<[^>]+>', line[start_index:])
+    if special_match:
+        address, last_index = special_match.group(), start_index + special_match.end()
+    elif matches:
+        uppercase_matches = [m for m in matches if m.group(1).isupper()]
+        if uppercase_matches:
+            longest_match = max(uppercase_matches, key=lambda m: m.end() - start_index)
+            address = line[start_index:start_index + longest_match.end()].strip()
+            last_index = longest_match.end() + start_index - 1
+    else:
+        lat_lon_match = re.search(r'([-+]?\d*\.?\d+);([-+]?\d*\.?\d+)', line[start_index:])
+        if lat_lon_match:
+            address, last_index = lat_lon_match.group(), lat_lon_match.end() + start_index
+    if not re.search(r'(\w+)$', line):
+        return None
+    for ori in STANDARD_ORIS:
+        if ori in line:
+            nature = line[last_index+1:line.find(ori)].strip(' ')
+            return incident_time, incident_number, address, nature, ori
+    return None
+
+
+def load_lines(pdf_files):
+    '''Returns every text line of the given pdf files'''
+    lines = list()
+    for pdf_file in pdf_files:
+        for page in PdfReader(pdf_file).pages:
+            lines.extend(page.extract_text().split('\n'))
+    return lines
+
+
+def lines_per_second(parse, lines, repeat=5):
+    '''Best-of-repeat throughput of parse over lines'''
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for line in lines:
+            parse(line)
+        best = min(best, time.perf_counter() - start)
+    return len(lines) / best
+
+
+def main(pdf_files):
+    lines = load_lines(pdf_files)
+    mismatches = sum(1 for line in lines if legacy_parse(line) != line_parser.parse(line))
+    before = lines_per_second(legacy_parse, lines)
+    after = lines_per_second(line_parser.parse, lines)
+    print(f"lines: {len(lines)} (mismatches: {mismatches})")
+    print(f"before: {before:,.0f} lines/sec")
+    print(f"after:  {after:,.0f} lines/sec ({after / before:.1f}x)")
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:] or DEFAULT_PDFS)
@@ -0,0 +1,59 @@
+'''Time of writing augmented incidents, a batch per url: the original print of every row against
+each output sink of assignment0/sinks.py. stdout is redirected to a file for the print and the
+tsv sink; the other sinks write their own file. The columnar sinks are skipped without pyarrow.
+
+Run from the repository root with
+    python -m benchmarks.bench_output [rows] [rows per url]
+'''
+import contextlib
+import os
+import sys
+import tempfile
+import time
+from assignment2 import augment_location_ranks, augment_incident_ranks, augment_emsstat, OUTPUT_FIELDS
+from assignment0.sinks import FORMATS, create_sink
+from benchmarks.bench_augment import synthetic_incidents
+
+DEFAULT_ROWS = 500_000
+DEFAULT_BATCH = 1000
+
+
+def print_rows(all_incidents):
+    '''The output of process_urls before the sinks'''
+    for incident in all_incidents:
+        row = "\t".join(map(str, [getattr(incident, field) for field in OUTPUT_FIELDS]))
+        print(row)
+
+
+def main(rows, batch):
+    all_incidents = augment_emsstat(augment_incident_ranks(augment_location_ranks(synthetic_incidents(rows))))
+    batches = [all_incidents[start:start + batch] for start in range(0, rows, batch)]
+    print(f"rows: {rows:,} in batches of {batch:,}")
+    with tempfile.TemporaryDirectory() as directory:
+        stdout_path = os.path.join(directory, 'stdout')
+        with open(stdout_path, 'w') as stdout, contextlib.redirect_stdout(stdout):
+            start = time.perf_counter()
+            for incidents in batches:
+                print_rows(incidents)
+            baseline = time.perf_counter() - start
+        print(f"{'print per row':<14} {baseline:6.2f}s ({rows / baseline:,.0f} rows/sec)")
+        for output_format in FORMATS:
+            path = None if output_format == 'tsv' else os.path.join(directory, output_format)
+            try:
+                with open(stdout_path, 'w') as stdout, contextlib.redirect_stdout(stdout):
+                    start = time.perf_counter()
+                    with create_sink(output_format, OUTPUT_FIELDS, path) as sink:
+                        for incidents in batches:
+                            sink.write_incidents(incidents)
+                    seconds = time.perf_counter() - start
+            except ImportError as error:
+                print(f"{output_format:<14} skipped: {error}")
+                continue
+            size = os.path.getsize(path or stdout_path)
+            print(f"{output_format:<14} {seconds:6.2f}s ({rows / seconds:,.0f} rows/sec, {baseline / seconds:.1f}x, "
+                  f"{size / 1e6:.1f} MB)")
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_ROWS,
+         int(sys.argv[2]) if len(sys.argv) > 2 else DEFAULT_BATCH)
@@ -0,0 +1,39 @@
+'''Wall time of decoding and parsing the pages of a large synthetic summary serially and in a
+process pool (parse mode, so no geocoder or weather lookup is timed).
+
+Run from the repository root with
+    python -m benchmarks.bench_page_pool [incidents] [processes ...]
+'''
+import os
+import sys
+import time
+from assignment0.extractdata import extractdata
+from benchmarks.fixtures import recorded_incidents
+from benchmarks.synthetic_pdf import ROWS_PER_PAGE, generate_summary
+
+DEFAULT_INCIDENTS = 5000
+
+
+def timed_extract(pdf_bytes, processes, repeat=2):
+    '''Returns the shortest time of extracting the incidents of a pdf with a number of processes'''
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        extractdata(pdf_bytes, 'parse', processes)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main(incidents, processes_counts):
+    pdf_bytes = generate_summary(recorded_incidents(), incidents)
+    print(f"incidents: {incidents:,}, pages: {-(-incidents // ROWS_PER_PAGE)}, cpus: {os.cpu_count()}")
+    serial = timed_extract(pdf_bytes, 1)
+    print(f"serial:      {serial:.2f}s")
+    for processes in processes_counts:
+        seconds = timed_extract(pdf_bytes, processes)
+        print(f"{processes} processes: {seconds:.2f}s ({serial / seconds:.1f}x)")
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_INCIDENTS,
+         [int(count) for count in sys.argv[2:]] or sorted({2, os.cpu_count() or 1} - {1}))
@@ -0,0 +1,58 @@
+'''Time of classifying points into sides of town: get_location_side one point at a time against
+the vectorized quadrants, and PolygonLayer.lookup() one point at a time against classify() on a
+grid of square polygons (like police beats).
+
+Run from the repository root with
+    python -m benchmarks.bench_spatial [points] [polygons per side]
+'''
+import random
+import sys
+import time
+from assignment0.extractdata import get_location_side
+from assignment0.spatial import PolygonLayer, quadrant_sides
+
+DEFAULT_POINTS = 200_000
+DEFAULT_GRID = 10
+CENTER = (35.22, -97.44)
+
+
+def beats_layer(grid):
+    '''Returns a layer of grid x grid square polygons over Norman'''
+    size = 0.2 / grid
+    features = list()
+    for row in range(grid):
+        for column in range(grid):
+            west, south = -97.54 + column * size, 35.12 + row * size
+            features.append((f"BEAT {row * grid + column}", [[[(west, south), (west + size, south), (west + size, south + size),
+                                                               (west, south + size), (west, south)]]]))
+    return PolygonLayer(features)
+
+
+def timed(function):
+    start = time.perf_counter()
+    result = function()
+    return time.perf_counter() - start, result
+
+
+def main(count, grid):
+    rng = random.Random(0)
+    latitudes = [rng.uniform(35.12, 35.32) for _ in range(count)]
+    longitudes = [rng.uniform(-97.54, -97.34) for _ in range(count)]
+    print(f"points: {count:,}")
+    # numpy is imported on the first call
+    quadrant_sides([0.0], [0.0], [0.0], [0.0])
+    scalar, expected = timed(lambda: [get_location_side(*CENTER, latitude, longitude)
+                                      for latitude, longitude in zip(latitudes, longitudes)])
+    vectorized, sides = timed(lambda: quadrant_sides(latitudes, longitudes, [CENTER[0]] * count, [CENTER[1]] * count))
+    assert list(sides) == expected
+    print(f"quadrants  get_location_side: {scalar:.3f}s  vectorized: {vectorized:.3f}s ({scalar / vectorized:.1f}x)")
+    layer = beats_layer(grid)
+    scalar, expected = timed(lambda: [layer.lookup(latitude, longitude) for latitude, longitude in zip(latitudes, longitudes)])
+    vectorized, names = timed(lambda: layer.classify(latitudes, longitudes))
+    assert list(names) == expected
+    print(f"{grid * grid} polygons  lookup: {scalar:.3f}s  classify: {vectorized:.3f}s ({scalar / vectorized:.1f}x)")
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_POINTS,
+         int(sys.argv[2]) if len(sys.argv) > 2 else DEFAULT_GRID)
@@ -0,0 +1,46 @@
+'''Per-line cost of finding the street types of an incident line: the case insensitive regular
+expression alternation against the StreetTypeMatcher trie.
+
+Run from the repository root with
+    python -m benchmarks.bench_street_types [pdf_file ...]
+'''
+import re
+import sys
+import time
+from assignment0.lineparser import STREET_TYPE_LIST, StreetTypeMatcher
+from benchmarks.bench_lineparser import DEFAULT_PDFS, load_lines
+
+STREET_TYPE_RE = re.compile(r'(\b(?:' + '|'.join(map(re.escape, STREET_TYPE_LIST)) + r')\b)', flags=re.IGNORECASE)
+NUMBER_RE = re.compile(r'\d{4}-\d{8}')
+
+
+def regex_spans(tail):
+    return [match.span() for match in STREET_TYPE_RE.finditer(tail)]
+
+
+def microseconds_per_line(find, tails, repeat=5):
+    '''Best-of-repeat cost of find on every tail, in microseconds per line'''
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for tail in tails:
+            find(tail)
+        best = min(best, time.perf_counter() - start)
+    return best / len(tails) * 1e6
+
+
+def main(pdf_files):
+    # The street types are looked up in the part of the line after the incident number
+    tails = [line[match.end():] for line in load_lines(pdf_files) for match in [NUMBER_RE.search(line)] if match]
+    matcher = StreetTypeMatcher()
+    trie_spans = lambda tail: list(matcher.finditer(tail))
+    mismatches = sum(1 for tail in tails if regex_spans(tail) != trie_spans(tail))
+    before = microseconds_per_line(regex_spans, tails)
+    after = microseconds_per_line(trie_spans, tails)
+    print(f"lines: {len(tails)} (mismatches: {mismatches})")
+    print(f"regex: {before:.1f} us/line")
+    print(f"trie:  {after:.1f} us/line ({before / after:.1f}x)")
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:] or DEFAULT_PDFS)
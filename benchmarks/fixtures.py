@@ -0,0 +1,61 @@
+'''Offline fixtures of the benchmarks: the recorded pdfs and their incidents, and local stand-ins
+for Nominatim and Open-Meteo so that the whole ingestion path runs without network access.
+'''
+import os
+import tempfile
+from contextlib import contextmanager
+from assignment0 import enrichment, geocache, parsecache, spatial, weather
+from assignment0.enrichment import EnrichmentStage
+from assignment0.geocache import GeocodeStore, LocalGeocoder
+from assignment0.lineparser import line_parser
+from assignment0.parsecache import ParseCache
+from assignment0.spatial import SpatialIndex
+from assignment0.weather import LocalWeatherClient, WeatherService
+from benchmarks.bench_lineparser import load_lines
+
+RECORDED_PDFS = ['test_files/test_incident_data.pdf', 'resources/incident_data.pdf']
+TOWN = ("Norman", (35.22, -97.44, "Norman, Cleveland County, Oklahoma"))
+
+
+def recorded_lines(pdf_files=RECORDED_PDFS):
+    '''Returns every text line of the recorded pdfs'''
+    return load_lines(pdf_files)
+
+
+def recorded_incidents(pdf_files=RECORDED_PDFS):
+    '''Returns the (time, number, location, nature, ori) of every incident of the recorded pdfs
+        that has a location'''
+    parsed = (line_parser.parse(line) for line in recorded_lines(pdf_files))
+    return [incident for incident in parsed if incident and incident[2]]
+
+
+def recorded_locations(pdf_files=RECORDED_PDFS):
+    '''Returns deterministic coordinates around Norman for every address of the recorded pdfs'''
+    locations = dict([TOWN])
+    for incident in recorded_incidents(pdf_files):
+        address = incident[2]
+        locations[address] = (35.17 + len(address) % 10 * 0.01, -97.49 + sum(map(ord, address)) % 10 * 0.01,
+                              f"{address}, Norman, Cleveland County, Oklahoma")
+    return locations
+
+
+@contextmanager
+def offline_services(locations=None):
+    '''Replaces the geocoder, the weather client, the parse cache and the spatial index used by
+        extractdata with offline stand-ins (and an empty geocode database) for the duration of the block'''
+    previous = (geocache._geocode_store, weather._weather_service, enrichment._enrichment_stage,
+                parsecache._parse_cache, spatial._spatial_index)
+    with tempfile.TemporaryDirectory() as directory:
+        store = GeocodeStore(os.path.join(directory, 'geocode.sqlite'),
+                             geocoder=LocalGeocoder(recorded_locations() if locations is None else locations))
+        geocache.set_geocode_store(store)
+        weather.set_weather_service(WeatherService(client=LocalWeatherClient()))
+        enrichment.set_enrichment_stage(EnrichmentStage())
+        parsecache.set_parse_cache(ParseCache(read=False, write=False))
+        spatial.set_spatial_index(SpatialIndex())
+        try:
+            yield store
+        finally:
+            store.close()
+            (geocache._geocode_store, weather._weather_service, enrichment._enrichment_stage,
+             parsecache._parse_cache, spatial._spatial_index) = previous
@@ -0,0 +1,161 @@
+'''Benchmark suite of the ingestion path, run offline against recorded and synthetic fixtures.
+
+Measures the throughput of extractdata (on the recorded pdfs and on a large synthetic summary),
+of each extract_* function, of the three augment_* functions and of dbmanager.populatedb. Every
+run is appended to benchmarks/results.jsonl (local to the machine, it is not tracked by git) with
+the commit it was run on, and compared with the previous run: a benchmark whose throughput dropped by more than --threshold is reported as a
+regression (and the exit status is 1).
+
+Run from the repository root with
+    python -m benchmarks.run [--only <name>] [--no-save] [--threshold 0.15]
+'''
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from assignment0.dbmanager import createdb, populatedb
+from assignment0.extractdata import extractdata, extract_time, extract_number, extract_address, extract_nature_and_ori
+from assignment2 import augment_location_ranks, augment_incident_ranks, augment_emsstat
+from benchmarks.bench_augment import synthetic_incidents
+from benchmarks.fixtures import RECORDED_PDFS, offline_services, recorded_incidents, recorded_lines
+from benchmarks.synthetic_pdf import generate_summary
+
+RESULTS_FILE = os.path.join(os.path.dirname(__file__), 'results.jsonl')
+SYNTHETIC_INCIDENTS = 2000
+AUGMENT_ROWS = 200_000
+DB_ROWS = 100_000
+THRESHOLD = 0.15
+
+
+def best_of(function, repeat):
+    '''Returns the shortest of repeat timed calls of function()'''
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def bench_extractdata(pdf_file, repeat=3):
+    '''Incidents per second of extractdata with cold offline services (empty geocode database)'''
+    def run():
+        with offline_services():
+            counts.append(len(extractdata(pdf_file)))
+    counts = list()
+    seconds = best_of(run, repeat)
+    return counts[0], seconds
+
+
+def bench_extract_functions(lines, repeat=5):
+    '''Lines per second of each extract_* function over the incident lines of the recorded pdfs'''
+    start_indexes = [extract_address(line)[1] for line in lines]
+    functions = {
+        'extract_time': lambda: [extract_time(line) for line in lines],
+        'extract_number': lambda: [extract_number(line) for line in lines],
+        'extract_address': lambda: [extract_address(line) for line in lines],
+        'extract_nature_and_ori': lambda: [extract_nature_and_ori(line, start_index)
+                                           for line, start_index in zip(lines, start_indexes)],
+    }
+    return {name: (len(lines), best_of(function, repeat)) for name, function in functions.items()}
+
+
+def bench_augment(rows, repeat=3):
+    '''Rows per second of each augment_* function (they fill the incidents in place)'''
+    all_incidents = synthetic_incidents(rows)
+    functions = {
+        'augment_location_ranks': lambda: augment_location_ranks(all_incidents),
+        'augment_incident_ranks': lambda: augment_incident_ranks(all_incidents),
+        'augment_emsstat': lambda: augment_emsstat(all_incidents),
+    }
+    return {name: (rows, best_of(function, repeat)) for name, function in functions.items()}
+
+
+def bench_populatedb(rows, repeat=3):
+    '''Rows per second of populatedb into a new database file'''
+    records = [incident.record() for incident in synthetic_incidents(rows)]
+    def run():
+        with tempfile.TemporaryDirectory() as directory:
+            con = createdb(os.path.join(directory, 'bench.db'))
+            populatedb(con, records)
+            con.close()
+    return rows, best_of(run, repeat)
+
+
+def run_benchmarks():
+    '''Runs every benchmark and returns {name: {'count', 'seconds', 'per_second'}}'''
+    measured = dict()
+    for pdf_file in RECORDED_PDFS:
+        measured[f'extractdata[{os.path.basename(pdf_file)}]'] = bench_extractdata(pdf_file)
+    synthetic = generate_summary(recorded_incidents(), SYNTHETIC_INCIDENTS)
+    measured[f'extractdata[synthetic_{SYNTHETIC_INCIDENTS}]'] = bench_extractdata(synthetic, repeat=1)
+    incident_lines = [line for line in recorded_lines() if extract_number(line)]
+    measured.update(bench_extract_functions(incident_lines))
+    measured.update(bench_augment(AUGMENT_ROWS))
+    measured['populatedb'] = bench_populatedb(DB_ROWS)
+    return {name: {'count': count, 'seconds': round(seconds, 6), 'per_second': round(count / seconds, 1)}
+            for name, (count, seconds) in measured.items()}
+
+
+def current_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def load_results(results_file=RESULTS_FILE):
+    '''Returns the stored runs, oldest first'''
+    if not os.path.exists(results_file):
+        return list()
+    with open(results_file, 'r') as file:
+        return [json.loads(line) for line in file if line.strip()]
+
+
+def compare(results, previous, threshold=THRESHOLD):
+    '''Prints every benchmark with its change against the previous run and returns the names of
+        the ones whose throughput dropped by more than threshold'''
+    regressions = list()
+    for name, result in results.items():
+        line = f"{name:<40} {result['per_second']:>14,.1f}/s"
+        before = previous.get(name)
+        if before:
+            change = result['per_second'] / before['per_second'] - 1
+            line += f"  {change:+7.1%}"
+            if change < -threshold:
+                line += "  REGRESSION"
+                regressions.append(name)
+        print(line)
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Offline benchmark suite of the ingestion path")
+    parser.add_argument("--only", help="Only report the benchmarks whose name contains this text")
+    parser.add_argument("--no-save", action="store_true", help=f"Do not append the results to {RESULTS_FILE}")
+    parser.add_argument("--threshold", type=float, default=THRESHOLD,
+                        help="Relative drop in throughput reported as a regression")
+    args = parser.parse_args(argv)
+
+    results = run_benchmarks()
+    if args.only:
+        results = {name: result for name, result in results.items() if args.only in name}
+    history = load_results()
+    previous = history[-1]['results'] if history else dict()
+    regressions = compare(results, previous, args.threshold)
+    if not args.no_save:
+        run = {'timestamp': datetime.now(timezone.utc).isoformat(timespec='seconds'), 'commit': current_commit(),
+               'python': platform.python_version(), 'machine': platform.machine(), 'results': results}
+        with open(RESULTS_FILE, 'a') as file:
+            file.write(json.dumps(run) + '\n')
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,92 @@
+'''Generator of synthetic daily incident summaries, for benchmarks on pdfs larger than the recorded ones.
+
+The incidents reuse the (location, nature, ori) of the incidents of the recorded pdfs, so the
+offline geocoder knows all their addresses, with new times and incident numbers. Every cell is
+written at the x of its column, like the table of the real summaries, and a cell with line
+breaks wraps onto several lines.
+
+Run from the repository root with
+    python -m benchmarks.synthetic_pdf <output.pdf> [incidents]
+'''
+import random
+import sys
+from datetime import date, timedelta
+
+ROWS_PER_PAGE = 25
+HEADER = ('Date / Time', 'Incident Number', 'Location', 'Nature', 'Incident ORI')
+# x of the columns of the real summaries, and the y of the header and the rows
+COLUMN_X = (52.6, 150.9, 229.8, 423.2, 623.9)
+TOP = 580
+ROW_PITCH = 21
+LINE_PITCH = 8
+
+
+def summary_rows(recorded, incidents, day=date(2024, 1, 1), seed=0):
+    '''Returns the (date and time, number, location, nature, ori) cells of the rows of a daily
+        summary of a number of incidents, in time order. recorded is a list of parsed (time,
+        number, location, nature, ori) tuples to draw the incidents from'''
+    rng = random.Random(seed)
+    minutes = sorted(rng.randrange(24 * 60) for _ in range(incidents))
+    rows = list()
+    for i, minute in enumerate(minutes):
+        incident_time, incident_number, location, nature, ori = rng.choice(recorded)
+        rows.append((f"{day.month}/{day.day}/{day.year} {minute // 60}:{minute % 60:02d}",
+                     f"{day.year}-{i + 1:08d}", location, nature, ori))
+    return rows
+
+
+def escape(text):
+    '''Escapes a string for a pdf literal string'''
+    return text.replace('\\', '\\\\').replace('(', '\\(').replace(')', '\\)')
+
+
+def write_pdf(rows, rows_per_page=ROWS_PER_PAGE):
+    '''Returns the bytes of a pdf of the rows of cells, rows_per_page per page under the header,
+        in Helvetica'''
+    pages = [[HEADER] + rows[i:i + rows_per_page] for i in range(0, max(len(rows), 1), rows_per_page)]
+    objects = [None, None, b'<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>']
+    kids = list()
+    for page_rows in pages:
+        text = list()
+        for number, row in enumerate(page_rows):
+            y = TOP - number * ROW_PITCH
+            for column, (x, cell) in enumerate(zip(COLUMN_X, row)):
+                for line_number, line in enumerate(cell.split('\n')):
+                    # A text object per line of a cell, like in the real summaries
+                    text.append(f'BT /F1 7 Tf 1 0 0 1 {x} {y - line_number * LINE_PITCH} Tm ({escape(line)}) Tj ET')
+        stream = ' '.join(text).encode('latin-1')
+        objects.append(b'<< /Length %d >>\nstream\n%s\nendstream' % (len(stream), stream))
+        objects.append(b'<< /Type /Page /Parent 2 0 R /MediaBox [0 0 792 612] '
+                       b'/Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>' % len(objects))
+        kids.append(len(objects))
+    objects[0] = b'<< /Type /Catalog /Pages 2 0 R >>'
+    objects[1] = b'<< /Type /Pages /Kids [%s] /Count %d >>' % (b' '.join(b'%d 0 R' % kid for kid in kids), len(kids))
+
+    pdf = bytearray(b'%PDF-1.4\n')
+    offsets = list()
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(pdf))
+        pdf += b'%d 0 obj\n%s\nendobj\n' % (number, body)
+    xref = len(pdf)
+    pdf += b'xref\n0 %d\n0000000000 65535 f \n' % (len(objects) + 1)
+    pdf += b''.join(b'%010d 00000 n \n' % offset for offset in offsets)
+    pdf += b'trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n' % (len(objects) + 1, xref)
+    return bytes(pdf)
+
+
+def generate_summary(recorded, incidents, day=date(2024, 1, 1), seed=0):
+    '''Returns the bytes of a synthetic daily summary pdf'''
+    return write_pdf(summary_rows(recorded, incidents, day, seed))
+
+
+def generate_summaries(recorded, incidents, days, start=date(2024, 1, 1), seed=0):
+    '''Yields (day, pdf bytes) for a number of consecutive days'''
+    for offset in range(days):
+        day = start + timedelta(days=offset)
+        yield day, generate_summary(recorded, incidents, day, seed + offset)
+
+
+if __name__ == '__main__':
+    from benchmarks.fixtures import recorded_incidents
+    with open(sys.argv[1], 'wb') as file:
+        file.write(generate_summary(recorded_incidents(), int(sys.argv[2]) if len(sys.argv) > 2 else 1000))
@@ -5,6 +5,6 @@ setup(
 	version='1.0',
 	author='manoj kumar galla',
 	author_email='manojkumargalla@ufl.edu',
-	packages=find_packages(exclude=('tests', 'docs', 'resources')),
+	packages=find_packages(exclude=('tests', 'docs', 'resources', 'benchmarks')),
 	setup_requires=['pytest-runner'],
 	tests_require=['pytest'])
\ No newline at end of file
@@ -0,0 +1,177 @@
+import calendar
+import hashlib
+import importlib
+import os
+import threading
+import numpy as np
+import pytest
+from datetime import datetime
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+from pypdf import PdfReader
+from assignment0 import geocache, parsecache, spatial, weather
+from assignment0 import main as main_module
+from assignment0.fetchincidents import Downloader, PdfStore
+from assignment0.geocache import GeocodeStore, LocalGeocoder
+from assignment0.parsecache import ParseCache
+from assignment0.spatial import SpatialIndex
+from assignment0.lineparser import line_parser
+from assignment0.weather import WeatherService
+
+# assignment0 re-exports the fetchincidents function under the name of its module
+fetch_module = importlib.import_module('assignment0.fetchincidents')
+
+
+class FakeVariable:
+    def __init__(self, values):
+        self.values = values
+
+    def ValuesAsNumpy(self):
+        return self.values
+
+
+class FakeHourly:
+    def __init__(self, start, values):
+        self.start = start
+        self.values = values
+
+    def Time(self):
+        return self.start
+
+    def Interval(self):
+        return 3600
+
+    def Variables(self, index):
+        return FakeVariable(self.values)
+
+
+class FakeResponse:
+    def __init__(self, start, values):
+        self.hourly = FakeHourly(start, values)
+
+    def Hourly(self):
+        return self.hourly
+
+
+class FakeClient:
+    '''Stand-in for the Open-Meteo client that returns the hour (plus 100 times the index of
+        the location) as the weather code of each location and records every request'''
+    def __init__(self):
+        self.requests = list()
+
+    def weather_api(self, url, params):
+        self.requests.append(params)
+        start = calendar.timegm(datetime.strptime(params["start_date"], '%Y-%m-%d').timetuple())
+        return [FakeResponse(start, np.arange(24, dtype=np.float32) + 100 * i)
+                for i in range(len(params["latitude"]))]
+
+
+class PdfRequestHandler(SimpleHTTPRequestHandler):
+    '''Serves the files of test_files/ with ETag and Last-Modified headers and answers conditional
+        and range requests. The headers of every request are recorded, and setting cut_after
+        drops the connection of the next response after that many bytes of the body'''
+    requests = list()
+    cut_after = None
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, directory='test_files', **kwargs)
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        path = self.translate_path(self.path)
+        if not os.path.isfile(path):
+            self.send_error(404)
+            return
+        with open(path, 'rb') as file:
+            data = file.read()
+        type(self).requests.append(dict(self.headers))
+        etag = '"' + hashlib.sha256(data).hexdigest()[:16] + '"'
+        if self.headers.get('If-None-Match') == etag:
+            self.send_response(304)
+            self.send_header('ETag', etag)
+            self.end_headers()
+            return
+        start = 0
+        if self.headers.get('Range') and self.headers.get('If-Range', etag) == etag:
+            start = int(self.headers['Range'].split('=')[1].split('-')[0])
+        body = data[start:]
+        self.send_response(206 if start else 200)
+        if start:
+            self.send_header('Content-Range', f'bytes {start}-{len(data) - 1}/{len(data)}')
+        self.send_header('Content-Type', 'application/pdf')
+        self.send_header('Content-Length', str(len(body)))
+        self.send_header('ETag', etag)
+        self.send_header('Last-Modified', self.date_time_string(int(os.path.getmtime(path))))
+        self.end_headers()
+        if type(self).cut_after is not None:
+            body, type(self).cut_after = body[:type(self).cut_after], None
+            self.close_connection = True
+        self.wfile.write(body)
+
+
+def sample_locations(pdf_files):
+    '''Builds deterministic fake coordinates around Norman for every address in the pdf files'''
+    locations = {"Norman": (35.22, -97.44, "Norman, Cleveland County, Oklahoma")}
+    for pdf_file in pdf_files:
+        for page in PdfReader(pdf_file).pages:
+            for line in page.extract_text().split('\n'):
+                parsed = line_parser.parse(line)
+                if parsed:
+                    address = parsed[2]
+                    locations[address] = (35.17 + len(address) % 10 * 0.01, -97.49 + sum(map(ord, address)) % 10 * 0.01,
+                                          f"{address}, Norman, Cleveland County, Oklahoma")
+    return locations
+
+
+@pytest.fixture
+def fake_client():
+    '''Provides an offline Open-Meteo client'''
+    return FakeClient()
+
+@pytest.fixture
+def offline_services(tmp_path, fake_client, monkeypatch):
+    '''Replaces the geocoder and the weather client used by extractdata with offline stand-ins
+        that know every address of the sample pdfs, and the parse cache and the spatial index
+        with empty ones'''
+    geocoder = LocalGeocoder(sample_locations(["test_files/test_incident_data.pdf", "resources/incident_data.pdf"]))
+    store = GeocodeStore(str(tmp_path / "geocode.sqlite"), geocoder=geocoder)
+    service = WeatherService(client=fake_client)
+    cache = ParseCache(str(tmp_path / "parsecache.sqlite"))
+    monkeypatch.setattr(geocache, '_geocode_store', store)
+    monkeypatch.setattr(weather, '_weather_service', service)
+    monkeypatch.setattr(parsecache, '_parse_cache', cache)
+    # Town centers resolved by another test's geocoder must not be reused
+    monkeypatch.setattr(spatial, '_spatial_index', SpatialIndex())
+    yield store, service
+    store.close()
+    cache.close()
+
+@pytest.fixture
+def offline_download(monkeypatch):
+    '''Serves the sample pdf instead of downloading any url'''
+    def fake_fetchincidents(url):
+        with open("test_files/test_incident_data.pdf", 'rb') as file:
+            return file.read()
+    monkeypatch.setattr(main_module, 'fetchincidents', fake_fetchincidents)
+
+@pytest.fixture
+def pdf_server():
+    '''Serves test_files/ over http on a local port. Provides the request handler class, whose
+        base_url is the url of the server'''
+    handler = type('Handler', (PdfRequestHandler,), {'requests': list(), 'cut_after': None})
+    server = ThreadingHTTPServer(('127.0.0.1', 0), handler)
+    handler.base_url = f"http://127.0.0.1:{server.server_address[1]}/"
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield handler
+    server.shutdown()
+    server.server_close()
+
+@pytest.fixture
+def local_downloader(tmp_path, monkeypatch):
+    '''Replaces the downloader used by fetchincidents with one using a temporary pdf store'''
+    downloader = Downloader(PdfStore(str(tmp_path / "pdfstore")), retries=2, backoff_factor=0)
+    monkeypatch.setattr(fetch_module, '_downloader', downloader)
+    yield downloader
+    downloader.store.close()
@@ -0,0 +1,270 @@
+import csv
+import importlib
+import sqlite3
+import time
+import assignment2
+import pytest
+from datetime import date
+from assignment2 import process_urls, augment_columnar, frame_rows, enrich_db, backfill, OUTPUT_FIELDS
+from assignment2 import augment_location_ranks, augment_incident_ranks, augment_emsstat, update_rank_engines
+from assignment0 import parsecache
+from assignment0.dbmanager import backfill_progress, createdb, record_progress
+from assignment0.emsstat import EmsstatLinker
+from assignment0.sinks import create_sink
+from assignment0.incident import Incident
+from assignment0.parsecache import ParseCache
+from assignment0.ranks import RankEngine
+
+
+@pytest.fixture
+def urls_file(tmp_path):
+    '''Provides a csv file with a single url'''
+    path = tmp_path / "files.csv"
+    path.write_text('"https://example.com/2024-01-01_daily_incident_summary.pdf", \n')
+    return str(path)
+
+def test_process_urls(urls_file, offline_download, offline_services, capsys):
+    '''tests that one tab separated row of 8 fields is printed per incident'''
+    process_urls(urls_file)
+    rows = capsys.readouterr().out.splitlines()
+    assert len(rows) > 0
+    assert all(len(row.split("\t")) == 8 for row in rows)
+
+def test_process_urls_workers(pdf_server, local_downloader, offline_services, tmp_path, monkeypatch, capsys):
+    '''tests that downloading from a local server with several workers prints the same rows as one worker,
+    enriched in the main process'''
+    # Parse the pdf in both runs rather than reading it back from the parse cache
+    monkeypatch.setattr(parsecache, '_parse_cache', ParseCache(read=False, write=False))
+    path = tmp_path / "local.csv"
+    path.write_text(f'"{pdf_server.base_url}test_incident_data.pdf", \n')
+    process_urls(str(path))
+    serial = capsys.readouterr().out
+    store, service = offline_services
+    lookups = store.hits + store.misses
+    process_urls(str(path), workers=2)
+    assert capsys.readouterr().out == serial
+    # The parser processes only parse, the addresses are looked up through the store of this process
+    assert store.hits + store.misses > lookups
+    assert local_downloader.stats()['downloads'] == 1
+
+def test_process_urls_page_processes(urls_file, offline_download, offline_services, monkeypatch, capsys):
+    '''tests that --page-processes sends the pages of each pdf to the page pool and prints the same rows'''
+    monkeypatch.setattr(parsecache, '_parse_cache', ParseCache(read=False, write=False))
+    process_urls(urls_file)
+    serial = capsys.readouterr().out
+    extractdata_module = importlib.import_module('assignment0.extractdata')
+    parse_pages_in_pool, pools = extractdata_module.parse_pages_in_pool, list()
+    def recorded_pool(pdf_file, processes=None):
+        pools.append(processes)
+        return parse_pages_in_pool(pdf_file, processes, min_pages=1)
+    monkeypatch.setattr(extractdata_module, 'parse_pages_in_pool', recorded_pool)
+    process_urls(urls_file, page_processes=2)
+    assert capsys.readouterr().out == serial
+    assert pools == [2]
+
+def test_ingest_urls_bounded(monkeypatch):
+    '''tests that at most two urls per worker are downloaded ahead of the one being yielded'''
+    started = list()
+    def fake_download_and_parse(parser, url, keep_pdf, mode):
+        started.append(url)
+        return [url]
+    monkeypatch.setattr(assignment2, 'download_and_parse', fake_download_and_parse)
+    urls = [f"https://example.com/{day}.pdf" for day in range(6)]
+    ingested = assignment2.ingest_urls(urls, 1)
+    assert next(ingested) == [urls[0]]
+    # Leave the download thread time to start any url that was submitted
+    time.sleep(0.2)
+    assert started == urls[:2]
+    assert list(ingested) == [[url] for url in urls[1:]]
+
+def test_process_urls_parse_cache(urls_file, offline_download, offline_services, capsys):
+    '''tests that a repeated run reads the incidents from the parse cache and prints the same rows'''
+    process_urls(urls_file)
+    first = capsys.readouterr().out
+    process_urls(urls_file)
+    assert capsys.readouterr().out == first
+    assert parsecache.get_parse_cache().stats() == {'hits': 1, 'misses': 1}
+
+def test_process_urls_db(urls_file, offline_download, offline_services, tmp_path, capsys):
+    '''tests that the augmented incidents are stored once even if the url is processed twice'''
+    db_path = str(tmp_path / "incidents.db")
+    process_urls(urls_file, db_name=db_path)
+    rows = capsys.readouterr().out.splitlines()
+    process_urls(urls_file, db_name=db_path)
+    con = sqlite3.connect(db_path)
+    assert con.execute("SELECT COUNT(*) FROM incidents").fetchone()[0] == len(rows)
+    assert con.execute("SELECT COUNT(*) FROM incidents WHERE incident_date = '2024-01-01'").fetchone()[0] > 0
+    con.close()
+
+def test_process_urls_rank_window(urls_file, offline_download, offline_services, capsys):
+    '''tests that ranking over all the ingested days gives the same ranks for a single day'''
+    process_urls(urls_file)
+    per_pdf = capsys.readouterr().out
+    process_urls(urls_file, rank_window='all')
+    assert capsys.readouterr().out == per_pdf
+    process_urls(urls_file, rank_window='30')
+    assert capsys.readouterr().out == per_pdf
+
+def test_rank_engines_skip_undated_incidents():
+    '''tests that incidents without a date are left out of the running counts instead of failing the window'''
+    rows = [Incident('0:01', 'n1', 'A ST', 'Alarm', '14005', '2024-01-01', 1, 0, 'NE', 3),
+            Incident('6:42', 'n2', 'B ST', 'Motorist Assist', 'OK0140200'),
+            Incident('0:02', 'n3', 'A ST', 'Alarm', '14005', '2024-01-02', 2, 0, 'NE', 3)]
+    location_engine, incident_engine = RankEngine('location'), RankEngine('weather_code')
+    assert update_rank_engines(location_engine, incident_engine, rows) == '2024-01-02'
+    assert location_engine.ranks(7, '2024-01-02') == {'A ST': 1}
+    assert incident_engine.ranks() == {3: 1}
+    assert None not in location_engine.daily
+
+def test_process_urls_columnar(urls_file, offline_download, offline_services, tmp_path, capsys):
+    '''tests that the columnar path prints and stores exactly what the tuple path does'''
+    process_urls(urls_file, db_name=str(tmp_path / "tuples.db"))
+    tuple_rows = capsys.readouterr().out
+    process_urls(urls_file, db_name=str(tmp_path / "columnar.db"), columnar=True)
+    assert capsys.readouterr().out == tuple_rows
+    query = "SELECT * FROM incidents ORDER BY incident_number, incident_ori"
+    tuple_records = sqlite3.connect(str(tmp_path / "tuples.db")).execute(query).fetchall()
+    columnar_records = sqlite3.connect(str(tmp_path / "columnar.db")).execute(query).fetchall()
+    assert columnar_records == tuple_records
+
+def test_augment_columnar_emsstat():
+    '''tests the EMSSTAT lookahead of the columnar path against augment_emsstat'''
+    def rows():
+        return [Incident('0:01', 'n1', 'A ST', 'Chest Pain', '14005', '2024-01-01', 1, 0, 'NE', 3),
+                Incident('0:01', 'n2', 'B ST', 'Alarm', '14005', '2024-01-01', 1, 0, 'NE', 3),
+                Incident('0:01', 'n3', 'A ST', 'EMSSTAT', 'EMSSTAT', '2024-01-01', 1, 0, 'NE', 3),
+                Incident('0:02', 'n4', 'A ST', 'EMSSTAT', 'EMSSTAT', '2024-01-01', 1, 0, 'NE', 3)]
+    expected = [incident.emsstat for incident in augment_emsstat(augment_incident_ranks(augment_location_ranks(rows())))]
+    assert augment_columnar(rows())['emsstat'].tolist() == expected
+
+def test_augment_columnar_unenriched():
+    '''tests that the columnar path ranks and prints the incidents without weather code or date like the tuple path'''
+    def rows():
+        return [Incident('0:01', 'n1', 'A ST', 'Chest Pain', '14005', '2024-01-01', 1, 0, 'NE', 3),
+                Incident('0:02', 'n2', 'B ST', 'Alarm', '14005', None, None, None, None, None),
+                Incident('0:03', 'n3', 'B ST', 'Alarm', '14005', '2024-01-01', 1, 0, 'NE', None),
+                Incident('0:04', 'n4', 'C ST', 'Alarm', '14005', '2024-01-01', 1, 0, 'NE', 2)]
+    expected = augment_emsstat(augment_incident_ranks(augment_location_ranks(rows())))
+    frame = augment_columnar(rows())
+    assert frame['incident_rank'].tolist() == [incident.incident_rank for incident in expected]
+    assert frame_rows(frame) == ["\t".join(str(getattr(incident, field)) for field in OUTPUT_FIELDS)
+                                 for incident in expected]
+
+def test_process_urls_emsstat_across_days(urls_file, offline_download, offline_services, capsys):
+    '''tests that streaming the incidents through one EMSSTAT linker prints the same rows for a single day'''
+    process_urls(urls_file)
+    per_pdf = capsys.readouterr().out
+    process_urls(urls_file, emsstat_linker=EmsstatLinker(), emsstat_across_days=True)
+    assert capsys.readouterr().out == per_pdf
+
+def test_process_urls_csv_output(urls_file, offline_download, offline_services, tmp_path, capsys):
+    '''tests that a csv sink gets the same rows as the printed output, after a header'''
+    process_urls(urls_file)
+    printed = [row.split("\t") for row in capsys.readouterr().out.splitlines()]
+    with create_sink('csv', OUTPUT_FIELDS, str(tmp_path / "incidents.csv")) as sink:
+        process_urls(urls_file, sink=sink)
+    assert capsys.readouterr().out == ''
+    with open(tmp_path / "incidents.csv", newline='') as file:
+        rows = list(csv.reader(file))
+    assert rows[0] == OUTPUT_FIELDS
+    assert rows[1:] == [[value if value != 'None' else '' for value in row] for row in printed]
+
+def test_process_urls_parse_mode(urls_file, offline_download, offline_services, capsys):
+    '''tests that the parse mode prints every incident without any geocoder or weather request'''
+    store, service = offline_services
+    process_urls(urls_file, mode='parse')
+    rows = capsys.readouterr().out.splitlines()
+    assert store.geocoder.calls == 0 and service.requests == 0
+    process_urls(urls_file, mode='full')
+    assert len(rows) == len(capsys.readouterr().out.splitlines())
+    assert all(row.split("\t")[2] == 'None' and row.split("\t")[4] == 'None' for row in rows)
+
+@pytest.mark.parametrize('mode', ['parse', 'geocode'])
+def test_process_urls_columnar_modes(mode, urls_file, offline_download, offline_services, tmp_path, capsys):
+    '''tests that the columnar path prints and stores what the tuple path does when fields are not enriched'''
+    process_urls(urls_file, db_name=str(tmp_path / "tuples.db"), mode=mode)
+    tuple_rows = capsys.readouterr().out
+    process_urls(urls_file, db_name=str(tmp_path / "columnar.db"), columnar=True, mode=mode)
+    assert capsys.readouterr().out == tuple_rows
+    query = "SELECT * FROM incidents ORDER BY incident_number, incident_ori"
+    tuple_records = sqlite3.connect(str(tmp_path / "tuples.db")).execute(query).fetchall()
+    assert sqlite3.connect(str(tmp_path / "columnar.db")).execute(query).fetchall() == tuple_records
+
+def test_enrich_db(urls_file, offline_download, offline_services, tmp_path, capsys):
+    '''tests that enriching the incidents stored by a parse mode run stores the same rows as a full run'''
+    parsed_db, full_db = str(tmp_path / "parsed.db"), str(tmp_path / "full.db")
+    process_urls(urls_file, db_name=parsed_db, mode='parse')
+    process_urls(urls_file, db_name=full_db)
+    assert enrich_db(parsed_db, 'geocode') > 0
+    assert enrich_db(parsed_db) > 0
+    query = "SELECT * FROM incidents ORDER BY incident_number, incident_ori"
+    parsed_con, full_con = sqlite3.connect(parsed_db), sqlite3.connect(full_db)
+    assert parsed_con.execute(query).fetchall() == full_con.execute(query).fetchall()
+    parsed_con.close()
+    full_con.close()
+
+def test_enrich_db_unlocated(urls_file, offline_download, offline_services, tmp_path, capsys):
+    '''tests that an incident whose address can't be geocoded is kept without a side of town and that its
+    day is enriched again by the next run, from the geocode store'''
+    db_path = str(tmp_path / "parsed.db")
+    process_urls(urls_file, db_name=db_path, mode='parse')
+    con = sqlite3.connect(db_path)
+    with con:
+        con.execute("""UPDATE incidents SET incident_location = 'NOWHERE ST'
+            WHERE rowid = (SELECT MIN(rowid) FROM incidents WHERE incident_date IS NOT NULL)""")
+    stored = con.execute("SELECT COUNT(*) FROM incidents").fetchone()[0]
+    unlocated = "SELECT side_of_town, weather_code FROM incidents WHERE incident_location = 'NOWHERE ST'"
+    assert enrich_db(db_path) > 0
+    assert con.execute(unlocated).fetchall() == [(None, None)]
+    store, service = offline_services
+    hits, misses = store.hits, store.misses
+    assert enrich_db(db_path) > 0
+    assert store.hits > hits
+    assert store.misses == misses
+    assert con.execute(unlocated).fetchall() == [(None, None)]
+    assert con.execute("SELECT COUNT(*) FROM incidents").fetchone()[0] == stored
+    con.close()
+
+def test_backfill_resumes(pdf_server, local_downloader, offline_services, tmp_path):
+    '''tests that a backfill stores every day, continues a day from its recorded stage and skips the stored days'''
+    db_path = str(tmp_path / "backfill.db")
+    template = f"{pdf_server.base_url}test_incident_data.pdf?day={{day:%Y-%m-%d}}"
+    # A previous run that stopped after downloading the first day
+    url = template.format(day=date(2024, 1, 1))
+    local_downloader.fetch(url)
+    con = createdb(db_path)
+    record_progress(con, '2024-01-01', url, 'downloaded')
+    con.close()
+    requests = len(pdf_server.requests)
+    assert backfill(db_path, date(2024, 1, 1), date(2024, 1, 3), workers=2, url_template=template) == {'stored': 3}
+    assert len(pdf_server.requests) == requests + 2
+    con = sqlite3.connect(db_path)
+    progress = backfill_progress(con)
+    assert sorted(progress) == ['2024-01-01', '2024-01-02', '2024-01-03']
+    assert all(stage == 'stored' and incidents > 0 and error is None for stage, incidents, error in progress.values())
+    assert con.execute("SELECT COUNT(*) FROM incidents").fetchone()[0] > 0
+    con.close()
+    assert backfill(db_path, date(2024, 1, 1), date(2024, 1, 3), url_template=template) == {'stored': 3}
+    assert len(pdf_server.requests) == requests + 2
+
+def test_backfill_failed_days(pdf_server, local_downloader, offline_services, tmp_path):
+    '''tests that the days that fail are recorded with their error and ingested by the next run'''
+    db_path = str(tmp_path / "backfill.db")
+    missing = f"{pdf_server.base_url}missing_{{day:%Y-%m-%d}}.pdf"
+    assert backfill(db_path, date(2024, 1, 1), date(2024, 1, 2), url_template=missing, mode='parse') == {'failed': 2}
+    con = sqlite3.connect(db_path)
+    assert all(stage is None and 'HTTPError' in error for stage, incidents, error in backfill_progress(con).values())
+    con.close()
+    template = f"{pdf_server.base_url}test_incident_data.pdf?day={{day:%Y-%m-%d}}"
+    assert backfill(db_path, date(2024, 1, 1), date(2024, 1, 2), url_template=template, mode='parse') == {'stored': 2}
+
+def test_backfill_day_timing_out(offline_services, tmp_path, monkeypatch):
+    '''tests that a day whose download times out is recorded as failed instead of waited on forever'''
+    def timing_out(parser, day, url, stage, mode, keep_pdf, events):
+        raise TimeoutError(url)
+    monkeypatch.setattr(assignment2, 'backfill_day', timing_out)
+    db_path = str(tmp_path / "backfill.db")
+    assert backfill(db_path, date(2024, 1, 1), date(2024, 1, 1), mode='parse') == {'failed': 1}
+    con = sqlite3.connect(db_path)
+    assert backfill_progress(con)['2024-01-01'][2].startswith('TimeoutError')
+    con.close()
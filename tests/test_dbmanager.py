@@ -1,6 +1,8 @@
 import pytest
 import os
+import sqlite3
 from assignment0.dbmanager import createdb, populatedb, status
+from assignment0.dbmanager import populate_enriched, rollup_counts, ENRICHED_COLUMNS, ROLLUP_DIMENSIONS
 
 @pytest.fixture
 def temp_db_connection():
@@ -33,3 +35,88 @@ def test_status(temp_db_connection, capsys):
     captured = capsys.readouterr()
 
     assert captured.out is not None
+
+def test_populatedb_is_idempotent(temp_db_connection):
+    '''tests that inserting the same incidents twice keeps one row per incident number and ori'''
+    incidents_data = [
+        ("0:03", "2024-00000001", "226 CINDY AVE", "Chest Pain", "14005"),
+        ("0:03", "2024-00000001", "226 CINDY AVE", "Sick Person", "EMSSTAT"),
+    ]
+    populatedb(temp_db_connection, incidents_data)
+    populatedb(temp_db_connection, incidents_data)
+    populatedb(temp_db_connection, [("0:04", "2024-00000001", "226 CINDY AVE", "Breathing Problems", "14005")])
+
+    cursor = temp_db_connection.cursor()
+    rows = cursor.execute("SELECT incident_time, nature FROM incidents ORDER BY incident_ori").fetchall()
+    assert rows == [("0:04", "Breathing Problems"), ("0:03", "Sick Person")]
+
+def test_populate_enriched(temp_db_connection):
+    '''tests that the enriched fields of an incident are stored'''
+    record = ("0:01", "2024-00000001", "3603 N FLOOD AVE", "Traffic Stop", "OK0140200",
+              "2024-01-01", 2, 0, "NW", 3, 1, 5, False)
+    populate_enriched(temp_db_connection, [record])
+
+    cursor = temp_db_connection.cursor()
+    row = cursor.execute("""SELECT incident_date, day_of_week, incident_hour, side_of_town, weather_code,
+        location_rank, incident_rank, emsstat FROM incidents""").fetchone()
+    assert row == ("2024-01-01", 2, 0, "NW", 3, 1, 5, 0)
+
+def test_createdb_indexes_and_wal(temp_db_connection):
+    '''tests that the database uses WAL mode and has the unique key and the query indexes'''
+    cursor = temp_db_connection.cursor()
+    assert cursor.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+    indexes = {row[1] for row in cursor.execute("PRAGMA index_list(incidents)")}
+    assert {"incidents_key", "incidents_nature", "incidents_location", "incidents_date"} <= indexes
+
+def test_createdb_migrates_old_table(tmp_path):
+    '''tests that a database created with the old five column schema is upgraded'''
+    db_path = str(tmp_path / "old.db")
+    con = sqlite3.connect(db_path)
+    con.execute("""CREATE TABLE incidents (incident_time TEXT, incident_number TEXT,
+        incident_location TEXT, nature TEXT, incident_ori TEXT)""")
+    con.executemany("INSERT INTO incidents VALUES (?, ?, ?, ?, ?)",
+                    [("0:01", "2024-00000001", "A ST", "Alarm", "14005")] * 2)
+    con.commit()
+    con.close()
+
+    con = createdb(db_path)
+    columns = {row[1] for row in con.execute("PRAGMA table_info(incidents)")}
+    assert {name for name, column_type in ENRICHED_COLUMNS} <= columns
+    assert con.execute("SELECT COUNT(*) FROM incidents").fetchone()[0] == 1
+    assert rollup_counts(con, 'nature') == {"Alarm": 1}
+    con.close()
+
+def scanned_counts(con, column, start_date='0000-00-00', end_date='9999-99-99'):
+    return dict(con.execute(f"""SELECT {column}, COUNT(*) FROM incidents
+        WHERE incident_date BETWEEN ? AND ? GROUP BY {column}""", (start_date, end_date)))
+
+def test_rollups_follow_upserts(temp_db_connection):
+    '''tests that the rollups give the counts of a scan of the incidents after inserts and replacements'''
+    con = temp_db_connection
+    populate_enriched(con, [("0:01", "2024-00000001", "A ST", "Alarm", "14005", "2024-01-01", 2, 0, "NW", 3, 1, 5, False),
+                            ("1:01", "2024-00000002", "B ST", "Alarm", "14005", "2024-01-01", 2, 1, "NE", 3, 1, 5, False),
+                            ("2:01", "2024-00000003", "C ST", "Fire", "OK0140200", "2024-01-02", 3, 2, "SE", 3, 1, 5, False)])
+    # Replaces a stored incident (twice in one batch) and only changes the five parsed columns of another
+    populate_enriched(con, [("1:01", "2024-00000002", "B ST", "Fire", "14005", "2024-01-03", 4, 5, "SW", 3, 1, 5, False),
+                            ("1:01", "2024-00000002", "B ST", "Theft", "14005", "2024-01-03", 4, 6, "SW", 3, 1, 5, False)])
+    populatedb(con, [("0:01", "2024-00000001", "A ST", "Sick Person", "14005"),
+                     ("4:01", "2024-00000004", "D ST", "Alarm", "14009")])
+    for dimension, column in ROLLUP_DIMENSIONS.items():
+        assert rollup_counts(con, dimension, '2024-01-01', '2024-01-31') == scanned_counts(con, column)
+        assert rollup_counts(con, dimension, '2024-01-02', '2024-01-02') == scanned_counts(con, column, '2024-01-02', '2024-01-02')
+    assert rollup_counts(con, 'nature') == {"Sick Person": 1, "Fire": 1, "Theft": 1, "Alarm": 1}
+    assert con.execute("SELECT COUNT(*) FROM rollups WHERE count <= 0").fetchone()[0] == 0
+    with pytest.raises(ValueError):
+        rollup_counts(con, 'location')
+
+def test_rollups_built_for_existing_database(tmp_path, capsys):
+    '''tests that the rollups of a database created before they existed are built from its incidents'''
+    db_path = str(tmp_path / "norollups.db")
+    con = createdb(db_path)
+    populatedb(con, [("0:01", "2024-00000001", "A ST", "Alarm", "14005"), ("0:02", "2024-00000002", "A ST", "", "14005")])
+    con.execute("DROP TABLE rollups")
+    con.close()
+    con = createdb(db_path)
+    status(con)
+    assert capsys.readouterr().out.splitlines() == ["Alarm|1", "|1"]
+    con.close()
@@ -1,7 +1,11 @@
+import hashlib
 import os
 import pytest
+import socket
 from assignment0.fetchincidents import fetchincidents
 
+SAMPLE_PDF = 'test_files/test_incident_data.pdf'
+
 @pytest.fixture
 def sample_pdf_url():
     '''Provides a constant sample url to test downloading the data'''
@@ -22,4 +26,52 @@ def test_fetchincidents_success(sample_pdf_url):
         file.write(data)
 
     # Check if the file is created and not empty
-    assert os.path.getsize(pdf_path) > 0
\ No newline at end of file
+    assert os.path.getsize(pdf_path) > 0
+
+def sample_bytes():
+    with open(SAMPLE_PDF, 'rb') as file:
+        return file.read()
+
+def test_fetchincidents_local_server(pdf_server, local_downloader):
+    '''tests that the pdf served by a local http server is downloaded unchanged'''
+    assert fetchincidents(pdf_server.base_url + "test_incident_data.pdf") == sample_bytes()
+
+def test_conditional_get(pdf_server, local_downloader):
+    '''tests that an unchanged pdf is not downloaded again'''
+    url = pdf_server.base_url + "test_incident_data.pdf"
+    path = local_downloader.fetch(url)
+    assert local_downloader.fetch(url) == path
+    assert local_downloader.stats() == {'downloads': 1, 'not_modified': 1, 'resumed': 0,
+                                        'bytes': len(sample_bytes())}
+    assert pdf_server.requests[-1]['If-None-Match'] is not None
+
+def test_content_addressed_store(pdf_server, local_downloader):
+    '''tests that the same pdf served under two urls is stored once'''
+    first = local_downloader.fetch(pdf_server.base_url + "test_incident_data.pdf")
+    second = local_downloader.fetch(pdf_server.base_url + "./test_incident_data.pdf?copy=1")
+    assert first == second
+    assert os.path.basename(first) == hashlib.sha256(sample_bytes()).hexdigest() + '.pdf'
+
+def test_resume_dropped_download(pdf_server, local_downloader):
+    '''tests that a download cut midway is resumed from where it stopped'''
+    pdf_server.cut_after = 1000
+    path = local_downloader.fetch(pdf_server.base_url + "test_incident_data.pdf")
+    with open(path, 'rb') as file:
+        assert file.read() == sample_bytes()
+    assert local_downloader.resumed == 1
+    assert pdf_server.requests[-1]['Range'] == 'bytes=1000-'
+
+def test_connection_errors_retried_once(local_downloader, monkeypatch):
+    '''tests that a refused connection is retried by the session only, not again by fetch'''
+    import requests
+    with socket.socket() as closed:
+        closed.bind(('127.0.0.1', 0))
+        url = f"http://127.0.0.1:{closed.getsockname()[1]}/test_incident_data.pdf"
+    session_get, requests_sent = local_downloader.session.get, list()
+    def counted_get(*args, **kwargs):
+        requests_sent.append(args[0])
+        return session_get(*args, **kwargs)
+    monkeypatch.setattr(local_downloader.session, 'get', counted_get)
+    with pytest.raises(requests.ConnectionError):
+        local_downloader.fetch(url)
+    assert requests_sent == [url]
@@ -0,0 +1,72 @@
+from assignment0.emsstat import EmsstatLinker
+from assignment0.extractdata import extractdata
+from assignment0.incident import Incident
+
+
+def incident(time, number, location, nature, day='2024-01-01'):
+    ori = 'EMSSTAT' if nature == 'EMSSTAT' else '14005'
+    return Incident(time, number, location, nature, ori, day, 1, int(time.split(':')[0]), 'NE', 3)
+
+def flags(incidents):
+    return [incident.emsstat for incident in incidents]
+
+def test_default_window_is_the_next_two_rows():
+    '''tests that the default linker only matches a companion in the next two rows at the same time and place'''
+    rows = [incident('0:01', 'n1', 'A ST', 'Chest Pain'),
+            incident('0:01', 'n2', 'A ST', 'Alarm'),
+            incident('0:01', 'n3', 'B ST', 'Alarm'),
+            incident('0:01', 'n4', 'A ST', 'EMSSTAT'),
+            incident('0:02', 'n5', 'B ST', 'Fall'),
+            incident('0:03', 'n6', 'B ST', 'EMSSTAT')]
+    assert flags(EmsstatLinker().link(rows)) == [False, True, False, True, False, True]
+    assert flags(EmsstatLinker(row_window=3).link(rows)) == [True, True, False, True, False, True]
+    assert flags(EmsstatLinker(row_window=2, time_window=1).link(rows)) == [False, True, False, True, True, True]
+
+def test_anywhere_matches_reordered_rows():
+    '''tests that without a row window a companion before the incident or far from it still matches'''
+    rows = [incident('0:01', 'n1', 'A ST', 'EMSSTAT'),
+            incident('0:05', 'n2', 'B ST', 'Alarm'),
+            incident('0:05', 'n3', 'C ST', 'Alarm'),
+            incident('0:05', 'n4', 'D ST', 'Alarm'),
+            incident('0:01', 'n5', 'A ST', 'Chest Pain'),
+            incident('0:07', 'n6', 'B ST', 'EMSSTAT')]
+    assert flags(EmsstatLinker(row_window=None).link(rows)) == [True, False, False, False, True, True]
+    assert flags(EmsstatLinker(row_window=None, time_window=2).link(rows)) == [True, True, False, False, True, True]
+
+def test_time_window_spans_midnight():
+    '''tests that a companion on the next day within the time window matches'''
+    rows = [incident('23:59', 'n1', 'A ST', 'Chest Pain', '2024-01-01'),
+            incident('0:01', 'n2', 'A ST', 'EMSSTAT', '2024-01-02'),
+            incident('0:01', 'n3', 'B ST', 'Alarm', '2024-01-03'),
+            incident('0:01', 'n4', 'B ST', 'EMSSTAT', '2024-01-02')]
+    assert flags(EmsstatLinker(row_window=None, time_window=2).link(rows)) == [True, True, False, True]
+
+def test_feed_matches_across_batches():
+    '''tests that streaming the incidents in batches returns them in order with the flags of one link'''
+    def rows():
+        return [incident(f'{minute // 60}:{minute % 60:02d}', f'n{minute}', f'{minute // 3} ST',
+                         'EMSSTAT' if minute % 4 == 0 else 'Alarm', day)
+                for day in ('2024-01-01', '2024-01-02') for minute in range(0, 1440, 7)]
+    for row_window, time_window in [(2, 0), (3, 10), (None, 0), (None, 10)]:
+        expected = flags(EmsstatLinker(row_window, time_window).link(rows()))
+        linker, streamed = EmsstatLinker(row_window, time_window), rows()
+        returned = list()
+        for start in range(0, len(streamed), 50):
+            returned += linker.feed(streamed[start:start + 50])
+        returned += linker.flush()
+        assert [row.incident_number for row in returned] == [row.incident_number for row in streamed]
+        assert flags(returned) == expected
+
+def test_sample_pdf_companions():
+    '''tests that the companions of the parsed sample pdf are found by a linker on the ori, while the default
+    linker on the nature (the original output) flags none'''
+    rows = extractdata('test_files/test_incident_data.pdf', 'parse')
+    reported = [row.incident_ori == 'EMSSTAT' for row in rows]
+    for linker in (EmsstatLinker(field='incident_ori'), EmsstatLinker(None, 5, 'incident_ori')):
+        flagged = flags(linker.link(rows))
+        companions = [flag and not own for flag, own in zip(flagged, reported)]
+        assert [flag for flag, own in zip(flagged, reported) if own] == [True] * sum(reported)
+        assert sum(companions) > 0
+        assert all(any(other.incident_ori == 'EMSSTAT' and other.incident_location == row.incident_location
+                       for other in rows) for row, companion in zip(rows, companions) if companion)
+    assert not any(flags(EmsstatLinker().link(rows)))
@@ -0,0 +1,79 @@
+import random
+import threading
+import time
+from assignment0.enrichment import EnrichmentStage, TokenBucket
+from assignment0.geocache import GeocodeStore, LocalGeocoder
+
+
+class SlowGeocoder(LocalGeocoder):
+    '''Offline geocoder that waits like a network request before answering'''
+    def geocode(self, address):
+        time.sleep(0.05)
+        return super().geocode(address)
+
+
+def test_token_bucket_rate():
+    '''tests that the bucket lets through one request per token and waits for the next ones'''
+    bucket = TokenBucket(rate=20)
+    start = time.monotonic()
+    for _ in range(5):
+        bucket.acquire()
+    assert time.monotonic() - start >= 0.19
+
+def test_map_keeps_order():
+    '''tests that results come back in the order of the keys whatever order they complete in'''
+    stage = EnrichmentStage(max_workers=4)
+    def lookup(key):
+        time.sleep(random.random() / 100)
+        return key * 2
+    assert stage.map('test', lookup, list(range(20))) == [key * 2 for key in range(20)]
+
+def test_coalescing():
+    '''tests that a key already in flight is not requested again'''
+    stage = EnrichmentStage(max_workers=4)
+    release = threading.Event()
+    calls = list()
+    def lookup(key):
+        calls.append(key)
+        release.wait()
+        return key
+    first = stage.submit('test', 'A ST', lookup, 'A ST')
+    second = stage.submit('test', 'A ST', lookup, 'A ST')
+    release.set()
+    assert first.result() == second.result() == 'A ST'
+    assert calls == ['A ST']
+    assert stage.stats() == {'requests': {'test': 1}, 'coalesced': 1}
+
+def test_rate_limited_provider():
+    '''tests that concurrent lookups of a throttled provider stay within its rate'''
+    stage = EnrichmentStage(max_workers=8, rate_limits={'slow': 20.0})
+    start = time.monotonic()
+    stage.map('slow', str, list(range(6)))
+    assert time.monotonic() - start >= 0.24
+
+def test_geocode_store_runs_concurrently(tmp_path, monkeypatch):
+    '''tests that the misses of a batch are geocoded concurrently and returned in place'''
+    monkeypatch.setattr('assignment0.enrichment._enrichment_stage', EnrichmentStage(max_workers=8))
+    addresses = [f"{number} MAIN ST" for number in range(16)]
+    geocoder = SlowGeocoder({address: (35.2, -97.4, address) for address in addresses})
+    store = GeocodeStore(str(tmp_path / "geocode.sqlite"), geocoder=geocoder)
+    start = time.monotonic()
+    locations = store.resolve_addresses(addresses)
+    assert time.monotonic() - start < 16 * 0.05 / 2
+    assert [locations[address].raw['display_name'] for address in addresses] == addresses
+    assert geocoder.calls == 16
+    store.close()
+
+def test_geocoder_class_is_rate_limited(tmp_path, monkeypatch):
+    '''tests that a Nominatim geocoder given without a provider name gets the nominatim rate limit'''
+    class Nominatim(LocalGeocoder):
+        pass
+    monkeypatch.setattr('assignment0.enrichment._enrichment_stage',
+                        EnrichmentStage(max_workers=8, rate_limits={'nominatim': 20.0}))
+    addresses = [f"{number} MAIN ST" for number in range(6)]
+    store = GeocodeStore(str(tmp_path / "geocode.sqlite"), geocoder=Nominatim())
+    assert store.provider == 'nominatim'
+    start = time.monotonic()
+    store.resolve_addresses(addresses)
+    assert time.monotonic() - start >= 0.24
+    store.close()
@@ -1,6 +1,8 @@
+import importlib
 import pytest
 from assignment0.extractdata import extractdata, extract_time, extract_address
 from assignment0.extractdata import extract_nature_and_ori, extract_number
+from assignment0.extractdata import iter_incidents, iter_pages_text, process_incidents_by_page, parse_pages_in_pool
 
 
 @pytest.fixture
@@ -45,4 +47,45 @@ def test_extract_address(sample_incident_string):
     the incident from the raw incident string'''
     address = extract_address(sample_incident_string)[0]
     assert address is not None
-    assert address == "3603 N FLOOD AVE"
\ No newline at end of file
+    assert address == "3603 N FLOOD AVE"
+
+def test_iter_pages_text(sample_pdf_path):
+    '''Tests that pages decoded in the background come out in order'''
+    serial_pages = list(iter_pages_text(sample_pdf_path, read_ahead=0))
+    assert list(iter_pages_text(sample_pdf_path, read_ahead=2)) == serial_pages
+    pages = iter_pages_text(sample_pdf_path, read_ahead=1)
+    assert next(pages) == serial_pages[0]
+    pages.close()
+
+def test_iter_incidents(sample_pdf_path, offline_services):
+    '''Tests that streaming the incidents gives the same rows as processing all pages at once'''
+    incidents = list(iter_incidents(sample_pdf_path))
+    assert len(incidents) > 0
+    assert incidents == process_incidents_by_page(list(iter_pages_text(sample_pdf_path, read_ahead=0)))
+
+def test_extraction_from_bytes(sample_pdf_path, offline_services):
+    '''Tests that a downloaded pdf can be parsed from memory'''
+    with open(sample_pdf_path, 'rb') as file:
+        pdf_bytes = file.read()
+    from_path = extractdata(sample_pdf_path)
+    assert extractdata(pdf_bytes) == from_path
+    assert extractdata(memoryview(pdf_bytes)) == from_path
+
+def test_pages_decoded_in_pool(sample_pdf_path, offline_services):
+    '''Tests that decoding the pages in a process pool gives the same incidents in the same order'''
+    serial = extractdata(sample_pdf_path, processes=1)
+    assert extractdata(sample_pdf_path, processes=2) == serial
+    with open(sample_pdf_path, 'rb') as file:
+        assert extractdata(file.read(), 'parse', processes=2) == extractdata(sample_pdf_path, 'parse', processes=1)
+
+def test_small_pdf_decoded_serially(sample_pdf_path):
+    '''Tests that a pdf with fewer pages than the threshold, or a single process, is not sent to a pool'''
+    assert parse_pages_in_pool(sample_pdf_path, processes=2, min_pages=1000) is None
+    assert parse_pages_in_pool(sample_pdf_path, processes=1) is None
+
+def test_pool_is_opt_in(sample_pdf_path, monkeypatch):
+    '''Tests that by default a pdf of more than PARALLEL_MIN_PAGES pages is streamed without a process pool'''
+    def no_pool(*args):
+        raise AssertionError("the pdf was sent to a process pool")
+    monkeypatch.setattr(importlib.import_module('assignment0.extractdata'), 'parse_pages_in_pool', no_pool)
+    assert len(extractdata(sample_pdf_path, 'parse')) > 0
@@ -0,0 +1,94 @@
+import time
+import pytest
+from assignment0.geocache import GeocodeStore, LocalGeocoder, normalize_address
+
+
+class FailingGeocoder:
+    '''Geocoder that behaves like Nominatim without network access'''
+    def geocode(self, address):
+        raise ConnectionError(address)
+
+
+@pytest.fixture
+def local_geocoder():
+    '''Provides an offline geocoder that knows two addresses and the town'''
+    return LocalGeocoder({
+        "3603 N FLOOD AVE": (35.25, -97.45, "3603, North Flood Avenue, Norman, Oklahoma"),
+        "226 CINDY AVE": (35.20, -97.40, "226, Cindy Avenue, Norman, Oklahoma"),
+        "Norman": (35.22, -97.44, "Norman, Cleveland County, Oklahoma"),
+    })
+
+@pytest.fixture
+def db_path(tmp_path):
+    '''Provides the path of a temporary geocode database'''
+    return str(tmp_path / "geocode.sqlite")
+
+def test_normalize_address():
+    '''tests that addresses differing only in case and spacing share a key'''
+    assert normalize_address(" 226  cindy Ave ") == "226 CINDY AVE"
+
+def test_resolve_addresses_deduplicates(local_geocoder, db_path):
+    '''tests that every distinct address is geocoded once per batch'''
+    store = GeocodeStore(db_path, geocoder=local_geocoder)
+    locations = store.resolve_addresses(["3603 N FLOOD AVE", "226 CINDY AVE", "3603 n flood ave", "UNKNOWN PL"])
+    assert locations["3603 N FLOOD AVE"].latitude == 35.25
+    assert locations["3603 n flood ave"].longitude == -97.45
+    assert locations["UNKNOWN PL"] is None
+    assert local_geocoder.calls == 3
+    assert store.stats() == {'hits': 0, 'misses': 3, 'errors': 0}
+
+def test_store_is_persistent(local_geocoder, db_path):
+    '''tests that a new store reads the locations geocoded by a previous one'''
+    GeocodeStore(db_path, geocoder=local_geocoder).resolve_addresses(["226 CINDY AVE", "UNKNOWN PL"])
+    store = GeocodeStore(db_path, geocoder=local_geocoder)
+    location = store.get_location("226 CINDY AVE")
+    assert location.raw['display_name'] == "226, Cindy Avenue, Norman, Oklahoma"
+    assert store.get_location("UNKNOWN PL") is None
+    assert local_geocoder.calls == 2
+    assert store.stats()['hits'] == 2
+
+def test_ttl_expires_entries(local_geocoder, db_path):
+    '''tests that expired entries are geocoded again'''
+    GeocodeStore(db_path, geocoder=local_geocoder).get_location("226 CINDY AVE")
+    store = GeocodeStore(db_path, geocoder=local_geocoder, ttl=-1)
+    store.get_location("226 CINDY AVE")
+    assert store.stats()['misses'] == 1
+    assert local_geocoder.calls == 2
+
+def test_ttl_applies_within_a_store(local_geocoder, db_path):
+    '''tests that an entry read by the same store expires too'''
+    store = GeocodeStore(db_path, geocoder=local_geocoder, ttl=0.05)
+    store.get_location("226 CINDY AVE")
+    store.get_location("226 CINDY AVE")
+    assert local_geocoder.calls == 1
+    time.sleep(0.1)
+    store.get_location("226 CINDY AVE")
+    assert local_geocoder.calls == 2
+
+def test_hits_are_recently_used(local_geocoder, db_path):
+    '''tests that an address read again is kept over one that was not'''
+    store = GeocodeStore(db_path, geocoder=local_geocoder, max_entries=2)
+    store.get_location("3603 N FLOOD AVE")
+    store.get_location("226 CINDY AVE")
+    time.sleep(0.01)
+    store.get_location("3603 N FLOOD AVE")
+    store.get_location("Norman")
+    keys = {key for key, in store.con.execute("SELECT address_key FROM geocodes")}
+    assert keys == {"3603 N FLOOD AVE", "NORMAN"}
+
+def test_max_entries_evicts_least_recently_used(local_geocoder, db_path):
+    '''tests the size limit of the store'''
+    store = GeocodeStore(db_path, geocoder=local_geocoder, max_entries=2)
+    store.get_location("3603 N FLOOD AVE")
+    store.get_location("226 CINDY AVE")
+    store.get_location("Norman")
+    count = store.con.execute("SELECT COUNT(*) FROM geocodes").fetchone()[0]
+    assert count == 2
+
+def test_geocoder_errors_are_not_cached(db_path):
+    '''tests that failed lookups return None and are retried later'''
+    store = GeocodeStore(db_path, geocoder=FailingGeocoder())
+    assert store.resolve_addresses(["226 CINDY AVE"]) == {"226 CINDY AVE": None}
+    assert store.stats()['errors'] == 1
+    count = store.con.execute("SELECT COUNT(*) FROM geocodes").fetchone()[0]
+    assert count == 0
@@ -0,0 +1,25 @@
+import pickle
+from assignment0.incident import Incident
+
+
+def test_fields_and_records():
+    '''tests that the records of an incident follow the columns of dbmanager'''
+    incident = Incident('1:07', '2024-00000001', '1234 N MAIN ST', 'Chest Pain', 'OK0140200', '2024-01-01', 2, 7)
+    assert incident.record() == ('1:07', '2024-00000001', '1234 N MAIN ST', 'Chest Pain', 'OK0140200')
+    incident.emsstat = True
+    assert incident.enriched_record() == ('1:07', '2024-00000001', '1234 N MAIN ST', 'Chest Pain', 'OK0140200',
+                                          '2024-01-01', 2, 7, None, None, None, None, True)
+    assert not hasattr(incident, '__dict__')
+
+def test_interned_strings():
+    '''tests that repeated values of different incidents share a single string'''
+    first = Incident('1:07', '2024-00000001', 'A ST', ''.join(['Chest', ' Pain']), 'OK0140200')
+    second = Incident('1:08', '2024-00000002', 'A ST', ''.join(['Chest ', 'Pain']), 'OK0140200')
+    assert first.nature is second.nature
+
+def test_pickle_round_trip():
+    '''tests that incidents sent to and from worker processes are unchanged and re-interned'''
+    incident = Incident('1:07', '2024-00000001', 'A ST', 'Chest Pain', 'OK0140200', '2024-01-01', 2, 7, 'NE', 3)
+    copy = pickle.loads(pickle.dumps(incident))
+    assert copy == incident
+    assert copy.nature is incident.nature
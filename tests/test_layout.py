@@ -0,0 +1,46 @@
+from io import BytesIO
+from pypdf import PdfReader
+from assignment0.extractdata import decode_page, parse_incidents
+from assignment0.layout import layout_parser
+from assignment0.lineparser import line_parser
+from benchmarks.synthetic_pdf import write_pdf
+
+SAMPLE_PDF = 'test_files/test_incident_data.pdf'
+
+
+def test_layout_matches_line_parser():
+    '''tests that the rows recovered from the layout of the sample pdf are the incidents of its lines'''
+    layout, lines = list(), list()
+    for page in PdfReader(SAMPLE_PDF).pages:
+        page_text, rows = layout_parser.parse_page(page)
+        assert rows is not None
+        layout += [row[:5] for row in rows if row]
+        lines += [row for row in map(line_parser.parse, page_text.split('\n')) if row]
+    assert len(layout) > 0
+    assert layout == lines
+
+def test_wrapped_cells_are_joined():
+    '''tests that cells wrapped onto several lines are joined without special cases'''
+    rows = [('1/1/2024 6:42', '2024-00004434', 'W STATE HWY 9 HWY I35 NB ON\nRAMP 108A', 'Motorist Assist', 'OK0140200'),
+            ('1/1/2024 6:36', '2024-00005537', 'W MAIN ST / I35 NB ON RAMP 109\nEAST SPUR RAMP', 'MVA Non\nInjury',
+             'OK0140200'),
+            ('1/2/2024 6:50', '2024-00005538', '226 CINDY AVE', 'Chest Pain', '14005')]
+    page_text, parsed = layout_parser.parse_page(PdfReader(BytesIO(write_pdf(rows))).pages[0])
+    assert parsed == [('6:42', '2024-00004434', 'W STATE HWY 9 HWY I35 NB ON RAMP 108A', 'Motorist Assist', 'OK0140200',
+                       '2024-01-01'),
+                      ('6:36', '2024-00005537', 'W MAIN ST / I35 NB ON RAMP 109 EAST SPUR RAMP', 'MVA Non Injury',
+                       'OK0140200', '2024-01-01'),
+                      ('6:50', '2024-00005538', '226 CINDY AVE', 'Chest Pain', '14005', '2024-01-02')]
+
+def test_pages_without_columns_use_the_text():
+    '''tests that a page whose columns can't be recovered is parsed from its lines'''
+    assert layout_parser.rows([(20, 580, '1/1/2024 0:01 2024-00000001 3603 N FLOOD AVE Traffic Stop OK0140200')]) is None
+    page_text = "1/1/2024 0:01 2024-00000001 3603 N FLOOD AVE Traffic Stop OK0140200"
+    [incident] = parse_incidents([(page_text, None)])
+    assert (incident.incident_number, incident.incident_location, incident.nature) == \
+        ('2024-00000001', '3603 N FLOOD AVE', 'Traffic Stop')
+
+def test_parsed_incidents_match_the_text():
+    '''tests that the incidents parsed from the layout have the date, day of the week and hour of the text path'''
+    pages = [decode_page(page) for page in PdfReader(SAMPLE_PDF).pages]
+    assert parse_incidents(pages) == parse_incidents([page_text for page_text, rows in pages])
@@ -0,0 +1,82 @@
+import re
+import pytest
+from pypdf import PdfReader
+from assignment0.lineparser import LineParser, StreetTypeMatcher, STREET_TYPE_LIST, line_parser
+
+SAMPLE_PDFS = ['test_files/test_incident_data.pdf', 'resources/incident_data.pdf']
+STREET_TYPE_RE = re.compile(r'(\b(?:' + '|'.join(map(re.escape, STREET_TYPE_LIST)) + r')\b)', flags=re.IGNORECASE)
+
+
+def regex_parse_address(line):
+    '''parse_address as it was with the case insensitive regular expression of the street types'''
+    start_index = re.search(r'\d{4}-\d{8}', line).end()
+    tail = line[start_index:]
+    special_match = re.search(r'<[^>]+>', tail)
+    if special_match:
+        return special_match.group(), start_index + special_match.end()
+    matches = list(STREET_TYPE_RE.finditer(tail))
+    upper_matches = [match for match in matches if match.group(1).isupper()]
+    if upper_matches:
+        return tail[:upper_matches[-1].end()].strip(), start_index + upper_matches[-1].end() - 1
+    if matches:
+        return '', start_index
+    lat_lon_match = re.search(r'([-+]?\d*\.?\d+);([-+]?\d*\.?\d+)', tail)
+    if lat_lon_match:
+        return lat_lon_match.group(), start_index + lat_lon_match.end()
+    return '', start_index
+
+def sample_lines():
+    '''Returns every line of the sample pdfs that has an incident number, plus tricky cases'''
+    lines = [line for pdf_file in SAMPLE_PDFS for page in PdfReader(pdf_file).pages
+             for line in page.extract_text().split('\n') if re.search(r'\d{4}-\d{8}', line)]
+    return lines + ["1/1/2024 0:01 2024-00000001 1 HWY 9 W / I 35 Ramp Traffic Stop EMSSTAT",
+                    "1/1/2024 0:01 2024-00000001 main st lower Traffic Stop 14005",
+                    "1/1/2024 0:01 2024-00000001 12 Ave ST,Opas Alarm 14005",
+                    "1/1/2024 0:01 2024-00000001 1100 N PORTERS AVE Alarm 14005",
+                    "1/1/2024 0:01 2024-00000001 12 PARKWAY PARK WAY Alarm 14005",
+                    "1/1/2024 0:01 2024-00000001 12 Ńorth ST Alarm 14005"]
+
+
+@pytest.fixture
+def sample_incident_string():
+    '''Provides a sample incident string to test the line parser'''
+    return "1/1/2024 0:01 2024-00000001 3603 N FLOOD AVE Traffic Stop OK0140200"
+
+def test_parse(sample_incident_string):
+    '''Tests that parse returns all five fields of an incident line together'''
+    parsed = line_parser.parse(sample_incident_string)
+    assert parsed == ('0:01', '2024-00000001', '3603 N FLOOD AVE', 'Traffic Stop', 'OK0140200')
+
+def test_parse_header_line():
+    '''Tests that lines which are not incidents are rejected'''
+    assert line_parser.parse("Date / Time Incident Number Location Nature Incident ORI") is None
+    assert line_parser.parse("3/5/2024 10:25") is None
+
+def test_parse_special_locations():
+    '''Tests <UNKNOWN> and coordinate locations'''
+    parsed = line_parser.parse("1/1/2024 0:01 2024-00000001 <UNKNOWN> Alarm 14005")
+    assert parsed[2:] == ('<UNKNOWN>', 'Alarm', '14005')
+    parsed = line_parser.parse("1/1/2024 0:01 2024-00000001 35.2;-97.4 Traffic Stop OK0140200")
+    assert parsed[2:] == ('35.2;-97.4', 'Traffic Stop', 'OK0140200')
+
+def test_parse_without_header():
+    '''Tests the fallback path for lines that do not start with a date and time'''
+    parsed = line_parser.parse("x 12:30 foo 2024-00000001 ABC ST Alarm 14009")
+    assert parsed == ('12:30', '2024-00000001', 'ABC ST', 'Alarm', '14009')
+
+def test_custom_street_types():
+    '''Tests that a parser can be built from a different list of street types'''
+    parser = LineParser(street_types=['Ave'])
+    assert parser.parse_address("1/1/2024 0:01 2024-00000001 3603 N FLOOD AVE Traffic Stop OK0140200") == ('3603 N FLOOD AVE', 43)
+
+
+def test_street_type_matcher_matches_regex():
+    '''Differential test: the trie finds the same street types as the regular expression on every sample line'''
+    matcher = StreetTypeMatcher()
+    for line in sample_lines():
+        assert list(matcher.finditer(line)) == [match.span() for match in STREET_TYPE_RE.finditer(line)], line
+
+def test_parse_address_matches_regex():
+    '''Differential test: the address and last_index of every sample line are unchanged'''
+    for line in sample_lines():
+        assert line_parser.parse_address(line) == regex_parse_address(line), line
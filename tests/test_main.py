@@ -0,0 +1,16 @@
+import os
+from assignment0 import main as main_module
+
+
+def test_main_does_not_write_pdf(offline_download, offline_services, tmp_path, monkeypatch):
+    '''tests that main parses the download without writing it to disk'''
+    monkeypatch.setattr(main_module, 'PDF_ARCHIVE_PATH', str(tmp_path / "pdfs"))
+    all_incidents = main_module.main("https://example.com/2024-01-01_daily_incident_summary.pdf")
+    assert len(all_incidents) > 0
+    assert not os.path.exists(tmp_path / "pdfs")
+
+def test_main_keep_pdf(offline_download, offline_services, tmp_path, monkeypatch):
+    '''tests that --keep-pdf archives the download under the name of the url'''
+    monkeypatch.setattr(main_module, 'PDF_ARCHIVE_PATH', str(tmp_path / "pdfs"))
+    main_module.main("https://example.com/2024-01-01_daily_incident_summary.pdf", keep_pdf=True)
+    assert os.path.getsize(tmp_path / "pdfs" / "2024-01-01_daily_incident_summary.pdf") > 0
@@ -0,0 +1,84 @@
+from assignment0 import parsecache
+from assignment0.incident import Incident
+from assignment0.parsecache import ParseCache, cached_extractdata, pdf_digest
+
+SAMPLE_PDF = 'test_files/test_incident_data.pdf'
+
+
+def sample_incidents(count):
+    return [Incident('1:07', f'2024-{i:08d}', f'{i} N MAIN ST', 'Chest Pain', 'OK0140200', '2024-01-01', 2, 1, 'NE', 3)
+            for i in range(count)]
+
+def test_round_trip(tmp_path):
+    '''tests that cached incidents come back unchanged'''
+    cache = ParseCache(str(tmp_path / "parsecache.sqlite"))
+    assert cache.get('abc') is None
+    cache.put('abc', sample_incidents(10))
+    assert cache.get('abc') == sample_incidents(10)
+    assert cache.stats() == {'hits': 1, 'misses': 1}
+
+def test_parser_version_is_part_of_the_key(tmp_path, monkeypatch):
+    '''tests that incidents parsed by another version of the parser are not used'''
+    cache = ParseCache(str(tmp_path / "parsecache.sqlite"))
+    cache.put('abc', sample_incidents(10))
+    monkeypatch.setattr(parsecache, 'PARSER_VERSION', parsecache.PARSER_VERSION + 1)
+    assert cache.get('abc') is None
+
+def test_lru_eviction(tmp_path):
+    '''tests that the least recently used entries are evicted beyond max_bytes'''
+    cache = ParseCache(str(tmp_path / "parsecache.sqlite"))
+    cache.put('first', sample_incidents(100))
+    cache.put('second', sample_incidents(100))
+    cache.get('first')
+    size = cache.con.execute("SELECT MAX(size) FROM parsed").fetchone()[0]
+    cache.max_bytes = 2 * size
+    cache.put('third', sample_incidents(100))
+    assert cache.get('second') is None
+    assert cache.get('first') is not None and cache.get('third') is not None
+
+def test_cached_extractdata(offline_services):
+    '''tests that a pdf is parsed once and read back from the cache by digest'''
+    calls = list()
+    def extract(pdf_file):
+        calls.append(pdf_file)
+        return sample_incidents(3), True
+    with open(SAMPLE_PDF, 'rb') as file:
+        data = file.read()
+    assert cached_extractdata(SAMPLE_PDF, extract) == sample_incidents(3)
+    assert cached_extractdata(data, extract) == sample_incidents(3)
+    assert len(calls) == 1
+    assert pdf_digest(SAMPLE_PDF) == pdf_digest(data)
+
+def test_failed_lookups_are_not_cached(offline_services):
+    '''tests that incidents extracted while a lookup failed are parsed again next time'''
+    calls = list()
+    def extract(pdf_file):
+        calls.append(pdf_file)
+        return sample_incidents(3), False
+    cached_extractdata(SAMPLE_PDF, extract)
+    cached_extractdata(SAMPLE_PDF, extract)
+    assert len(calls) == 2
+
+def test_rebuild_and_no_cache(offline_services, tmp_path, monkeypatch):
+    '''tests that rebuilding replaces an entry without reading it and no-cache ignores the cache'''
+    db_name = str(tmp_path / "rebuild.sqlite")
+    calls = list()
+    def extract(pdf_file):
+        calls.append(pdf_file)
+        return sample_incidents(len(calls)), True
+    monkeypatch.setattr(parsecache, '_parse_cache', ParseCache(db_name))
+    assert cached_extractdata(SAMPLE_PDF, extract) == sample_incidents(1)
+    monkeypatch.setattr(parsecache, '_parse_cache', ParseCache(db_name, read=False))
+    assert cached_extractdata(SAMPLE_PDF, extract) == sample_incidents(2)
+    monkeypatch.setattr(parsecache, '_parse_cache', ParseCache(db_name, read=False, write=False))
+    assert cached_extractdata(SAMPLE_PDF, extract) == sample_incidents(3)
+    monkeypatch.setattr(parsecache, '_parse_cache', ParseCache(db_name))
+    assert cached_extractdata(SAMPLE_PDF, extract) == sample_incidents(2)
+    assert len(calls) == 3
+
+def test_mode_is_part_of_the_key(tmp_path):
+    '''tests that incidents extracted in one mode are not returned for another mode'''
+    cache = ParseCache(str(tmp_path / "parsecache.sqlite"))
+    cache.put('abc', sample_incidents(10), 'parse')
+    assert cache.get('abc') is None
+    assert cache.get('abc', 'parse') == sample_incidents(10)
@@ -0,0 +1,57 @@
+import json
+import os
+from assignment0 import parsecache, profiling
+from assignment0.parsecache import ParseCache
+from assignment0.profiling import NULL_STAGE, Profiler
+from assignment2 import process_urls
+
+
+def local_urls_file(tmp_path, pdf_server):
+    path = tmp_path / "local.csv"
+    path.write_text(f'"{pdf_server.base_url}test_incident_data.pdf", \n')
+    return str(path)
+
+def test_disabled_profiler():
+    '''tests that a disabled profiler records nothing'''
+    profiler = Profiler()
+    assert profiler.stage('parse_lines') is NULL_STAGE
+    with profiler.stage('parse_lines'):
+        profiler.count('lines', 10)
+    assert profiler.snapshot() == {'stages': {}, 'counters': {}}
+
+def test_stages_and_counters():
+    '''tests that stage times and counters add up, also when merged from another process'''
+    profiler = Profiler(enabled=True)
+    for _ in range(2):
+        with profiler.stage('parse_lines'):
+            profiler.count('lines', 10)
+    other = Profiler(enabled=True)
+    other.merge(profiler.snapshot())
+    other.count('pages')
+    snapshot = other.snapshot()
+    assert snapshot['stages']['parse_lines']['calls'] == 2
+    assert snapshot['counters'] == {'lines': 20, 'pages': 1}
+
+def test_process_urls_profile(pdf_server, local_downloader, offline_services, tmp_path, monkeypatch, capsys):
+    '''tests that --profile prints a json summary of the stages and counters to stderr'''
+    monkeypatch.setattr(profiling, '_profiler', Profiler(enabled=True))
+    process_urls(local_urls_file(tmp_path, pdf_server))
+    captured = capsys.readouterr()
+    summary = json.loads(captured.err)
+    for stage in ('total', 'download', 'extract', 'extract_text', 'parse_lines', 'geocode', 'weather', 'augment', 'output'):
+        assert summary['stages'][stage]['calls'] > 0
+    counters = summary['counters']
+    assert counters['incidents'] == len(captured.out.splitlines())
+    assert counters['lines'] >= counters['incidents'] + counters['skipped.not_incident']
+    assert summary['downloads']['bytes'] == os.path.getsize("test_files/test_incident_data.pdf")
+    assert summary['parse_cache'] == {'hits': 0, 'misses': 1}
+
+def test_workers_profile_and_cprofile(pdf_server, local_downloader, offline_services, tmp_path, monkeypatch, capsys):
+    '''tests that the counters of the parser processes are merged and a cProfile is dumped per url'''
+    monkeypatch.setattr(parsecache, '_parse_cache', ParseCache(read=False, write=False))
+    cprofile_dir = tmp_path / "cprofile"
+    monkeypatch.setattr(profiling, '_profiler', Profiler(enabled=True, cprofile_dir=str(cprofile_dir)))
+    process_urls(local_urls_file(tmp_path, pdf_server), workers=2)
+    summary = json.loads(capsys.readouterr().err)
+    assert summary['counters']['pages'] > 0
+    assert [name.split('.')[0] for name in os.listdir(cprofile_dir)] == ['test_incident_data']
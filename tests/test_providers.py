@@ -0,0 +1,38 @@
+import json
+import os
+import subprocess
+import sys
+import pytest
+from assignment0 import providers
+from assignment0.geocache import GeocodeStore, LocalGeocoder
+from assignment0.weather import LocalWeatherClient, WeatherService
+
+
+def test_create_registered_providers():
+    '''tests that the local providers are created by name and unknown names are rejected'''
+    assert isinstance(providers.create('geocoder', 'local', locations={'1 MAIN ST': (35.2, -97.4, 'Norman')}),
+                      LocalGeocoder)
+    assert isinstance(providers.create('weather', 'local'), LocalWeatherClient)
+    with pytest.raises(ValueError):
+        providers.create('geocoder', 'missing')
+    with pytest.raises(ValueError):
+        providers.register('traffic', 'local', dict)
+
+def test_services_create_named_provider(tmp_path, monkeypatch):
+    '''tests that the geocode store and the weather service create their provider from the registry'''
+    store = GeocodeStore(str(tmp_path / 'geocode.sqlite'), provider='local')
+    assert isinstance(store.geocoder, LocalGeocoder) and store.provider == 'local'
+    store.close()
+    service = WeatherService(provider='local')
+    assert service.client is None
+    service._fetch([(35.22, -97.44)], '2024-01-01')
+    assert isinstance(service.client, LocalWeatherClient)
+
+def test_import_loads_no_heavy_dependencies():
+    '''tests that importing the parser and the cli does not import the network, pdf or dataframe libraries'''
+    heavy = ['pandas', 'numpy', 'pypdf', 'geopy', 'requests', 'urllib3']
+    code = (f"import json, sys, assignment0.extractdata, assignment0.main, assignment2; "
+            f"print(json.dumps([name for name in {heavy!r} if name in sys.modules]))")
+    output = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, check=True,
+                            cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__)))).stdout
+    assert json.loads(output) == []
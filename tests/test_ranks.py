@@ -0,0 +1,38 @@
+import sqlite3
+from assignment0.ranks import RankEngine, cumulative_ranks
+
+
+def test_cumulative_ranks():
+    '''tests that each rank skips over the counts of the keys before it'''
+    assert cumulative_ranks({'b': 2, 'a': 2, 'c': 1}) == {'a': 1, 'b': 3, 'c': 5}
+    assert cumulative_ranks({None: 2, 3: 2, 1: 1}) == {3: 1, None: 3, 1: 5}
+
+def test_update_replaces_a_day():
+    '''tests that adding the same day twice does not double its counts'''
+    engine = RankEngine('location')
+    engine.update('2024-01-01', ['A ST', 'A ST', 'B ST'])
+    engine.update('2024-01-01', ['A ST', 'B ST', 'B ST'])
+    engine.update('2024-01-02', ['B ST', 'C ST'])
+    assert engine.counts() == {'A ST': 1, 'B ST': 3, 'C ST': 1}
+    assert engine.ranks() == {'B ST': 1, 'A ST': 4, 'C ST': 5}
+
+def test_rolling_window():
+    '''tests that window counts only include the days of the window, while it slides forward'''
+    engine = RankEngine('location')
+    for day, keys in [('2024-01-01', ['A ST'] * 3), ('2024-01-02', ['B ST'] * 2), ('2024-01-03', ['C ST'])]:
+        engine.update(day, keys)
+    assert engine.counts(window=2, end_day='2024-01-02') == {'A ST': 3, 'B ST': 2}
+    assert engine.counts(window=2, end_day='2024-01-03') == {'B ST': 2, 'C ST': 1}
+    engine.update('2024-01-03', ['C ST'] * 4)
+    assert engine.ranks(window=2, end_day='2024-01-03') == {'C ST': 1, 'B ST': 5}
+    assert engine.counts(window=2, end_day='2024-01-02') == {'A ST': 3, 'B ST': 2}
+
+def test_counts_are_persisted(tmp_path):
+    '''tests that a new engine on the same database continues from the stored counts'''
+    con = sqlite3.connect(str(tmp_path / "ranks.db"))
+    RankEngine('weather_code', con).update('2024-01-01', [3, 3, 61])
+    engine = RankEngine('weather_code', con)
+    engine.update('2024-01-02', [61])
+    assert engine.counts() == {3: 2, 61: 2}
+    assert RankEngine('location', con).counts() == {}
+    con.close()
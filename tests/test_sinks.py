@@ -0,0 +1,59 @@
+import csv
+import json
+import pytest
+from assignment0.incident import Incident
+from assignment0.sinks import create_sink
+
+FIELDS = ['incident_time', 'day_of_week', 'weather_code', 'side_of_town', 'emsstat']
+
+
+def incidents():
+    rows = [Incident('0:01', 'n1', 'A ST', 'Chest Pain', '14005', '2024-01-01', 2, 0, 'NE', 3),
+            Incident('0:02', 'n2', 'B ST', 'Alarm', '14005', '2024-01-01', 2, 0, None, None)]
+    rows[0].emsstat, rows[1].emsstat = True, False
+    return rows
+
+def test_tsv_to_stdout(capsys):
+    '''tests that the tsv sink prints the rows of every batch like the original print per row'''
+    with create_sink('tsv', FIELDS) as sink:
+        sink.write_incidents(incidents())
+        sink.write_incidents([])
+        sink.write_incidents(incidents()[:1])
+    assert capsys.readouterr().out == "0:01\t2\t3\tNE\tTrue\n0:02\t2\tNone\tNone\tFalse\n0:01\t2\t3\tNE\tTrue\n"
+    assert sink.rows == 3
+
+def test_csv_and_json_lines_files(tmp_path):
+    '''tests that the csv file has one header, even after an empty batch, and the json lines keep the types of the values'''
+    for output_format in ('csv', 'jsonl'):
+        with create_sink(output_format, FIELDS, str(tmp_path / output_format)) as sink:
+            sink.write_incidents([])
+            sink.write_incidents(incidents())
+            sink.write_incidents(incidents())
+    with open(tmp_path / 'csv', newline='') as file:
+        rows = list(csv.reader(file))
+    assert rows[0] == FIELDS and len(rows) == 5
+    assert rows[2] == ['0:02', '2', '', '', 'False']
+    with open(tmp_path / 'jsonl') as file:
+        rows = [json.loads(line) for line in file]
+    assert len(rows) == 4
+    assert rows[1] == {'incident_time': '0:02', 'day_of_week': 2, 'weather_code': None, 'side_of_town': None,
+                       'emsstat': False}
+
+def test_unknown_format():
+    '''tests that an unknown format is rejected'''
+    with pytest.raises(ValueError):
+        create_sink('xml', FIELDS)
+
+@pytest.mark.parametrize('output_format', ['parquet', 'feather'])
+def test_columnar_files(output_format, tmp_path):
+    '''tests that the columnar files are read back by pandas with typed columns'''
+    pytest.importorskip('pyarrow')
+    import pandas as pd
+    path = str(tmp_path / output_format)
+    with create_sink(output_format, FIELDS, path) as sink:
+        sink.write_incidents(incidents())
+        sink.write_incidents(incidents())
+    frame = pd.read_parquet(path) if output_format == 'parquet' else pd.read_feather(path)
+    assert len(frame) == 4
+    assert frame['day_of_week'].dtype == 'int64' and frame['emsstat'].dtype == bool
+    assert frame['weather_code'].isna().tolist() == [False, True, False, True]
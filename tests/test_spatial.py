@@ -0,0 +1,62 @@
+import json
+import random
+from assignment0 import spatial
+from assignment0.extractdata import extractdata, get_location_side
+from assignment0.spatial import PolygonLayer, SpatialIndex, quadrant_sides
+
+SAMPLE_PDF = 'test_files/test_incident_data.pdf'
+
+
+def square(west, south, east, north):
+    return [[west, south], [east, south], [east, north], [west, north], [west, south]]
+
+def write_layer(path):
+    '''Writes a GeoJSON layer with a square beat that has a hole and a beat made of two squares'''
+    features = [
+        {"type": "Feature", "properties": {"name": "BEAT 1"},
+         "geometry": {"type": "Polygon", "coordinates": [square(-97.5, 35.1, -97.4, 35.2), square(-97.46, 35.14, -97.44, 35.16)]}},
+        {"type": "Feature", "properties": {"name": "BEAT 2"},
+         "geometry": {"type": "MultiPolygon", "coordinates": [[square(-97.4, 35.1, -97.3, 35.2)], [square(-97.5, 35.2, -97.4, 35.3)]]}},
+        {"type": "Feature", "properties": {"name": "ROUTE"}, "geometry": {"type": "LineString", "coordinates": [[0, 0], [1, 1]]}},
+    ]
+    path.write_text(json.dumps({"type": "FeatureCollection", "features": features}))
+    return str(path)
+
+def test_quadrant_sides_match_get_location_side():
+    '''tests that the vectorized quadrants are the ones of get_location_side, ties included'''
+    rng = random.Random(0)
+    points = [(round(rng.uniform(35.1, 35.3), 2), round(rng.uniform(-97.5, -97.3), 2)) for _ in range(500)]
+    centers = [(35.2, -97.4)] * len(points)
+    sides = quadrant_sides(*zip(*points), *zip(*centers))
+    assert list(sides) == [get_location_side(35.2, -97.4, latitude, longitude) for latitude, longitude in points]
+
+def test_polygon_layer(tmp_path):
+    '''tests that points are found in their polygon, outside the holes, by lookup and by classify'''
+    layer = PolygonLayer.from_geojson(write_layer(tmp_path / "beats.geojson"))
+    points = [(35.12, -97.48, "BEAT 1"), (35.15, -97.45, None), (35.15, -97.35, "BEAT 2"),
+              (35.25, -97.45, "BEAT 2"), (35.25, -97.35, None), (0.5, 0.5, None)]
+    assert [layer.lookup(latitude, longitude) for latitude, longitude, name in points] == [name for *point, name in points]
+    names = layer.classify([point[0] for point in points], [point[1] for point in points])
+    assert list(names) == [name for *point, name in points]
+    assert layer.digest == PolygonLayer.from_geojson(str(tmp_path / "beats.geojson")).digest
+
+def test_town_centers_resolved_once(offline_services):
+    '''tests that a town center is geocoded once and then served from memory'''
+    store, service = offline_services
+    index = SpatialIndex()
+    index.resolve_towns(["Norman", "Norman"])
+    calls = store.geocoder.calls
+    index.resolve_towns(["Norman"])
+    assert store.geocoder.calls == calls == 1
+    assert index.center("Norman") == (35.22, -97.44)
+
+def test_extract_with_polygons(offline_services, tmp_path):
+    '''tests that incidents inside a polygon take its name as their side of town and the others keep their quadrant'''
+    quadrants = extractdata(SAMPLE_PDF)
+    spatial.set_spatial_index(SpatialIndex(PolygonLayer.from_geojson(write_layer(tmp_path / "beats.geojson"))))
+    beats = extractdata(SAMPLE_PDF)
+    assert len(beats) == len(quadrants)
+    sides = {incident.side_of_town for incident in beats}
+    assert {"BEAT 1", "BEAT 2"} <= sides and sides & {"NE", "NW", "SE", "SW"}
+    assert all(beat.side_of_town == quadrant.side_of_town for beat, quadrant in zip(beats, quadrants)
+               if beat.side_of_town not in ("BEAT 1", "BEAT 2"))
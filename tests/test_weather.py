@@ -0,0 +1,65 @@
+from assignment0.weather import LocalWeatherClient, WeatherService
+
+
+def test_snap():
+    '''tests that nearby coordinates share a grid cell'''
+    service = WeatherService(client=None, grid_size=0.01)
+    assert service.snap(35.2213, -97.4391) == service.snap(35.2187, -97.4412)
+    assert service.snap(35.2213, -97.4391) != service.snap(35.2313, -97.4391)
+
+def test_get_weather_code(fake_client):
+    '''tests that the code of the requested hour is returned'''
+    service = WeatherService(client=fake_client)
+    assert service.get_weather_code(35.22, -97.44, '2024-01-01', 0) == 0
+    assert service.get_weather_code(35.22, -97.44, '2024-01-01', 23) == 23
+    assert len(fake_client.requests) == 1
+
+def test_prefetch_requests_each_day_once(fake_client):
+    '''tests that all the cells of a day are fetched with a single multi-location request'''
+    service = WeatherService(client=fake_client)
+    service.prefetch([(35.2213, -97.4391, '2024-01-01'), (35.2187, -97.4412, '2024-01-01'),
+                      (35.3000, -97.5000, '2024-01-01'), (35.2213, -97.4391, '2024-01-02')])
+    assert len(fake_client.requests) == 2
+    # The days are requested concurrently, in any order
+    requests = {params["start_date"]: params for params in fake_client.requests}
+    assert len(requests['2024-01-01']["latitude"]) == 2
+    assert service.get_weather_code(35.3000, -97.5000, '2024-01-01', 5) == 105
+    assert service.get_weather_code(35.2187, -97.4412, '2024-01-02', 7) == 7
+    assert service.requests == 2
+
+def test_failed_request_defaults_to_zero():
+    '''tests that failing requests return 0 like the original get_weather_code'''
+    class FailingClient:
+        def weather_api(self, url, params):
+            raise ConnectionError(url)
+    service = WeatherService(client=FailingClient())
+    assert service.get_weather_code(35.22, -97.44, '2024-01-01', 5) == 0
+    assert service.get_weather_code(35.22, -97.44, '2024-01-01', 6) == 0
+    assert service.requests == 1
+
+def test_failed_request_is_retried(fake_client):
+    '''tests that every code served for a failed request counts as an error until the next prefetch succeeds'''
+    class FlakyClient:
+        def __init__(self):
+            self.failures = 1
+        def weather_api(self, url, params):
+            if self.failures:
+                self.failures -= 1
+                raise ConnectionError(url)
+            return fake_client.weather_api(url, params)
+    service = WeatherService(client=FlakyClient())
+    assert service.get_weather_code(35.22, -97.44, '2024-01-01', 5) == 0
+    assert service.get_weather_code(35.22, -97.44, '2024-01-01', 6) == 0
+    assert service.errors == 3
+    service.prefetch([(35.22, -97.44, '2024-01-01')])
+    assert service.get_weather_code(35.22, -97.44, '2024-01-01', 6) == 6
+    assert service.errors == 3 and service.requests == 2
+
+def test_local_weather_client():
+    '''tests that the offline Open-Meteo stand-in serves deterministic hourly codes'''
+    client = LocalWeatherClient()
+    service = WeatherService(client=client)
+    code = service.get_weather_code(35.2213, -97.4391, '2024-01-01', 5)
+    assert code in LocalWeatherClient.CODES
+    assert WeatherService(client=LocalWeatherClient()).get_weather_code(35.2213, -97.4391, '2024-01-01', 5) == code
+    assert len(client.requests) == 1